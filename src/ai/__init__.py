@@ -0,0 +1,22 @@
+"""Computer strategies: callables that take a GameState and return the block to shoot at."""
+
+import os
+
+from ai.endgame import Endgame
+from ai.heatmap import heatmap_shoots
+from ai.montecarlo import MonteCarlo
+from ai.opening_book import OpeningBook
+from game_logic import computer_shoots
+
+STRATEGIES = {
+    "random": computer_shoots,
+    "heatmap": heatmap_shoots,
+    # Random shots until few positions of human ships are left, then exact probabilities
+    "endgame": Endgame(computer_shoots),
+    # Precomputed shots while every shot is a miss, then random ones
+    "book": OpeningBook(computer_shoots),
+    # A fixed number of samples, so that seeded games are reproducible
+    "montecarlo": OpeningBook(Endgame(MonteCarlo(budget=None, max_samples=1000))),
+    # Samples in every core for longer: the strongest and slowest level
+    "montecarlo-hard": OpeningBook(Endgame(MonteCarlo(budget=0.2, processes=os.cpu_count() or 1))),
+}
@@ -0,0 +1,205 @@
+"""
+Exact endgame: once the human ships that are afloat have few positions left, every placement of them
+consistent with the grid is counted, which gives exact probabilities of a ship in every block. Placements are
+enumerated block by block with a transposition table of counts, which is kept between moves, since most of
+the grid does not change. A move counts a bounded number of new positions, so it never takes long.
+"""
+
+from typing import Callable, Optional
+
+from ai.montecarlo import observe
+from elements.bitboard import get_tables, index_to_block
+from elements.game_state import GameState
+from elements.rules import Rules
+
+# The endgame starts when the product of numbers of positions of all ships afloat is this or less
+# (an upper bound of the number of placements, which the time of counting them grows with)
+ENDGAME_PLACEMENTS = 10_000
+# New positions counted per move at most (about a millisecond), a move that needs more is left to the other
+# strategy. Positions counted so far stay in the transposition table, so a later move goes on from them
+ENDGAME_NODES = 200
+# Grids with more blocks not known to be empty than this are left to the other strategy
+# (the enumeration goes one block deeper for every such block)
+ENDGAME_MAX_FREE = 300
+# Positions kept in the transposition table of every rules (it is cleared once it grows bigger)
+TRANSPOSITION_TABLE_SIZE = 200_000
+# Counts of all blocks are packed into one int, this many bits per block, so that adding up counts
+# of two positions is a single addition (no count is larger than ENDGAME_PLACEMENTS).
+# The number of placements is packed above them
+COUNT_BITS = 32
+
+
+class PlacementCounter:
+    """
+    Counts placements of ships that are afloat consistent with a grid: the ships neither touch each other
+    nor cover blocks known to be empty, and together cover every hit of them. Blocks are decided one by one
+    from the lowest one: it is either empty or the first block of a ship, so every placement is counted once.
+    A position is the mask of undecided blocks, lengths of the ships left and hits they have to cover,
+    and its counts do not depend on anything else, so they are reused between moves and games.
+    Positions and their counts are packed into ints, so the garbage collector does not go through the table
+    ----------
+    Attributes:
+        rules (Rules): size of the grid and the fleet
+        table (dict): transposition table: position -> number of placements and their counts in every block
+            (packed, see COUNT_BITS)
+    ----------
+    Methods:
+        count(blocked, unsunk_hits, lengths, max_nodes): Returns the number of placements and their counts
+            in every block
+    """
+
+    def __init__(self, rules: Rules) -> None:
+        self.rules = rules
+        self.table = {}
+        tables = get_tables(rules)
+        # Ship length -> positions of such a ship starting at every block (masks of it and of blocks around it)
+        self.__starts = {}
+        block_ones = [1 << index * COUNT_BITS for index in range(rules.cells)]
+        for length in rules.ship_lengths:
+            starts = [[] for _ in range(rules.cells)]
+            for cells, mask, blocking_mask in zip(
+                tables.placement_cells[length],
+                tables.placement_masks[length],
+                tables.placement_blocking_masks[length],
+            ):
+                # A count of 1 in every block of the ship
+                ones = sum(block_ones[index] for index in cells)
+                starts[cells[0]].append((mask, blocking_mask, ones))
+            self.__starts[length] = starts
+        # Position of the number of placements in a packed result
+        self.__ways_shift = rules.cells * COUNT_BITS
+        # Lengths of ships afloat -> number of them in positions packed into ints, every length among them
+        # with the lengths left once a ship of it is placed
+        self.__choices = {}
+        # Positions not in the table that the current count may still count (None - no limit)
+        self.__nodes_left = None
+
+    def count(self, blocked: int, unsunk_hits: int, lengths: tuple, max_nodes: Optional[int] = None) -> Optional[tuple]:
+        """
+        Args:
+            blocked, unsunk_hits, lengths: what is known about the grid (see ai.montecarlo.observe)
+            max_nodes (int, optional): positions not in the table counted at most. Defaults to None (no limit).
+        Returns:
+            tuple: number of placements and the number of them with a ship in every block (a list),
+                None if counting them needs more than max_nodes new positions
+        """
+        if len(self.table) > TRANSPOSITION_TABLE_SIZE:
+            self.table.clear()
+        free = get_tables(self.rules).full_mask & ~blocked
+        self.__nodes_left = max_nodes
+        result = self.__count(free, tuple(sorted(lengths, reverse=True)), unsunk_hits)
+        if result is None:
+            return None
+        field = (1 << COUNT_BITS) - 1
+        return result >> self.__ways_shift, [result >> index * COUNT_BITS & field for index in range(self.rules.cells)]
+
+    def __count(self, free: int, lengths: tuple, uncovered: int) -> Optional[int]:
+        """
+        Returns:
+            int: number of placements of a position and their counts in every block (packed),
+                None if the count ran out of positions (see count)
+        """
+        choices = self.__choices.get(lengths)
+        if choices is None:
+            choices = self.__choices[lengths] = (
+                len(self.__choices),
+                [
+                    (length, lengths[: lengths.index(length)] + lengths[lengths.index(length) + 1 :])
+                    for length in sorted(set(lengths))
+                ],
+            )
+        lengths_number, choices = choices
+        cells = self.rules.cells
+        key = (lengths_number << cells | uncovered) << cells | free
+        result = self.table.get(key)
+        if result is not None:
+            return result
+        if self.__nodes_left is not None:
+            if not self.__nodes_left:
+                return None
+            self.__nodes_left -= 1
+        if not lengths:
+            result = 0 if uncovered else 1 << self.__ways_shift
+        elif bin(free).count("1") < sum(lengths):
+            result = 0
+        else:
+            result = 0
+            bit = free & -free
+            # The block is empty (a hit cannot be)
+            if not uncovered & bit:
+                result = self.__count(free ^ bit, lengths, uncovered)
+                if result is None:
+                    return None
+            # Or a ship starts in it: a ship of only hits would have been destroyed, hits next to it must be in it
+            for length, rest in choices:
+                for mask, blocking_mask, ones in self.__starts[length][bit.bit_length() - 1]:
+                    if mask & ~free or not mask & ~uncovered or blocking_mask & ~mask & uncovered:
+                        continue
+                    ship_result = self.__count(free & ~blocking_mask, rest, uncovered & ~mask)
+                    if ship_result is None:
+                        return None
+                    result += ship_result + (ship_result >> self.__ways_shift) * ones
+        self.table[key] = result
+        return result
+
+
+# Placement counters of every rules, built on first use
+_counters = {}
+
+
+def get_placement_counter(rules: Rules) -> PlacementCounter:
+    counter = _counters.get(rules)
+    if counter is None:
+        counter = _counters[rules] = PlacementCounter(rules)
+    return counter
+
+
+def endgame_cell(state: GameState) -> Optional[int]:
+    """
+    Returns the index of the available block of the human grid where a ship is most likely to be,
+    None if the ships afloat have too many positions (or too much of the grid is unknown) for an exact count
+    or counting them needs more than ENDGAME_NODES new positions
+    """
+    board = state.boards.get(True)
+    if board is None:
+        return None
+    blocked, unsunk_hits, lengths = observe(board)
+    if state.rules.cells - bin(blocked).count("1") > ENDGAME_MAX_FREE:
+        return None
+    placements = 1
+    tables = get_tables(state.rules)
+    for length in set(lengths):
+        positions = sum(not mask & blocked for mask in tables.placement_masks[length])
+        placements *= positions ** lengths.count(length)
+        if placements > ENDGAME_PLACEMENTS:
+            return None
+    result = get_placement_counter(state.rules).count(blocked, unsunk_hits, lengths, ENDGAME_NODES)
+    if result is None or not result[0]:
+        return None
+    counts = result[1]
+    available = board.available
+    scores = {index: counts[index] for index in range(state.rules.cells) if available >> index & 1}
+    best = max(scores.values())
+    return state.rng.choice([index for index, score in scores.items() if score == best])
+
+
+class Endgame:
+    """
+    Computer strategy (called like computer_shoots) that plays another strategy until the endgame
+    and fires at the block most likely to hold a ship after that (see endgame_cell). Moves whose count runs
+    out of positions are played by the other strategy too, so they depend on the positions counted before
+    ----------
+    Attributes:
+        strategy (callable): strategy played before the endgame
+    """
+
+    def __init__(self, strategy: Callable) -> None:
+        self.strategy = strategy
+
+    def __call__(self, *, state: GameState) -> tuple:
+        best_cell = endgame_cell(state)
+        if best_cell is None:
+            return self.strategy(state=state)
+        computer_fired_block = index_to_block(best_cell, state.rules.human_offset, state.rules.grid_size)
+        state.computer_available_to_fire_set.discard(computer_fired_block)
+        return computer_fired_block
@@ -0,0 +1,187 @@
+"""
+Probability-density targeting: the computer fires at the block covered by the largest number of
+possible positions of the human ships that are still afloat.
+"""
+
+from collections import Counter
+from copy import copy
+from typing import Optional
+
+from elements.bitboard import BitBoard, get_tables, index_to_block
+from elements.game_state import GameState
+from elements.rules import CLASSIC_RULES, Rules
+
+# Cell placements of every rules, built on first use
+_cell_placements = {}
+
+
+def get_cell_placements(rules: Rules) -> dict:
+    """
+    Returns:
+        dict: ship length -> list (indexed by cell) of indexes of placements that cover the cell
+    """
+    if rules not in _cell_placements:
+        cell_placements = {}
+        for length, cells_list in get_tables(rules).placement_cells.items():
+            cell_placements[length] = [[] for _ in range(rules.cells)]
+            for placement, cells in enumerate(cells_list):
+                for index in cells:
+                    cell_placements[length][index].append(placement)
+        _cell_placements[rules] = cell_placements
+    return _cell_placements[rules]
+
+
+class HeatMap:
+    """
+    Per-cell counts of positions of the remaining fleet, updated incrementally after every shot.
+    Choosing a cell takes time proportional to the number of blocks of a grid
+    ----------
+    Attributes:
+        rules (Rules): size of the grid and the fleet
+        remaining (Counter): number of ships afloat by length
+        valid (dict): ship length -> bytearray with 1 for every placement that is still possible
+        coverage (dict): ship length -> number of valid placements covering every cell
+        heat (list of ints): sum of coverage of every cell weighted by the number of remaining ships
+        blocked (int): mask of blocks known to be empty or occupied by destroyed ships
+        known_hits (int): mask of hits that were already taken into account
+        unsunk_hits (int): mask of hits in a ship that is not destroyed yet
+    ----------
+    Methods:
+        observe(board): Takes into account all new dots, hits and destroyed ships on a bitboard
+        best_cell(rng, available): Returns the cell to fire at
+        copy(): Returns an independent copy (e.g. for a fork of the game)
+    """
+
+    def __init__(self, rules: Rules = CLASSIC_RULES) -> None:
+        self.rules = rules
+        self.__tables = get_tables(rules)
+        self.__cell_placements = get_cell_placements(rules)
+        self.remaining = Counter(rules.fleet)
+        self.valid = {
+            length: bytearray(b"\x01") * len(cells_list) for length, cells_list in self.__tables.placement_cells.items()
+        }
+        self.coverage = {
+            length: [len(placements) for placements in cell_placements]
+            for length, cell_placements in self.__cell_placements.items()
+        }
+        self.heat = [
+            sum(self.remaining[length] * coverage[index] for length, coverage in self.coverage.items())
+            for index in range(rules.cells)
+        ]
+        self.blocked = 0
+        self.known_hits = 0
+        self.unsunk_hits = 0
+
+    def copy(self) -> "HeatMap":
+        other = copy(self)
+        other.remaining = self.remaining.copy()
+        other.valid = {length: valid.copy() for length, valid in self.valid.items()}
+        other.coverage = {length: coverage.copy() for length, coverage in self.coverage.items()}
+        other.heat = self.heat.copy()
+        return other
+
+    def observe(self, board: BitBoard) -> None:
+        """
+        Takes into account dots, hits and destroyed ships that appeared on a bitboard since the last call
+        """
+        new_blocked = board.dotted & ~self.blocked
+        if new_blocked:
+            self.__block(new_blocked)
+        new_hits = board.hits & ~self.known_hits
+        self.known_hits |= new_hits
+        self.unsunk_hits |= new_hits
+        while new_hits:
+            bit = new_hits & -new_hits
+            new_hits ^= bit
+            ship_mask = board.ship_masks[board.ship_at(bit.bit_length() - 1)]
+            # Only ships that are destroyed are revealed
+            if ship_mask & board.hits == ship_mask and ship_mask & self.unsunk_hits == ship_mask:
+                self.unsunk_hits &= ~ship_mask
+                self.__sink(ship_mask)
+
+    def best_cell(self, rng, available: Optional[int] = None) -> int:
+        """
+        Chooses a cell to fire at: among the cells next to an unfinished ship if there is one,
+        otherwise among all available cells. Ties are broken randomly.
+        Args:
+            rng (Random): random number generator to break ties
+            available (int, optional): mask of cells that can be fired at. Defaults to None (all cells)
+        Returns:
+            int: cell index
+        """
+        if available is None:
+            available = self.__tables.full_mask
+        scores = self.__target_scores(available) if self.unsunk_hits else None
+        if not scores:
+            scores = {index: self.heat[index] for index in range(self.rules.cells) if available >> index & 1}
+        best = max(scores.values())
+        return rng.choice([index for index, score in scores.items() if score == best])
+
+    def __target_scores(self, available: int) -> dict:
+        """
+        Counts placements of the remaining ships that cover all hits of an unfinished ship.
+        Returns:
+            dict: cell index -> weighted number of such placements covering it
+        """
+        scores = Counter()
+        first_hit = (self.unsunk_hits & -self.unsunk_hits).bit_length() - 1
+        for length, count in self.remaining.items():
+            if not count:
+                continue
+            valid = self.valid[length]
+            cells_list = self.__tables.placement_cells[length]
+            masks = self.__tables.placement_masks[length]
+            for placement in self.__cell_placements[length][first_hit]:
+                if valid[placement] and masks[placement] & self.unsunk_hits == self.unsunk_hits:
+                    for index in cells_list[placement]:
+                        if available >> index & 1:
+                            scores[index] += count
+        return scores
+
+    def __block(self, mask: int) -> None:
+        """
+        Invalidates every placement that covers a cell from mask
+        """
+        self.blocked |= mask
+        while mask:
+            bit = mask & -mask
+            mask ^= bit
+            index = bit.bit_length() - 1
+            for length, cell_placements in self.__cell_placements.items():
+                valid = self.valid[length]
+                coverage = self.coverage[length]
+                weight = self.remaining[length]
+                for placement in cell_placements[index]:
+                    if valid[placement]:
+                        valid[placement] = 0
+                        for cell in self.__tables.placement_cells[length][placement]:
+                            coverage[cell] -= 1
+                            self.heat[cell] -= weight
+
+    def __sink(self, ship_mask: int) -> None:
+        """
+        Removes a destroyed ship from the remaining fleet and blocks its cells
+        """
+        length = bin(ship_mask).count("1")
+        self.remaining[length] -= 1
+        coverage = self.coverage[length]
+        for index in range(self.rules.cells):
+            self.heat[index] -= coverage[index]
+        self.__block(ship_mask)
+
+
+def heatmap_shoots(*, state: GameState) -> tuple:
+    """
+    Chooses the block where the remaining human ships are most likely to be
+    """
+    if state.heat_map is None:
+        state.heat_map = HeatMap(state.rules)
+    available = None
+    board = state.boards.get(True)
+    if board is not None:
+        state.heat_map.observe(board)
+        available = board.available
+    best_cell = state.heat_map.best_cell(state.rng, available)
+    computer_fired_block = index_to_block(best_cell, state.rules.human_offset, state.rules.grid_size)
+    state.computer_available_to_fire_set.discard(computer_fired_block)
+    return computer_fired_block
@@ -0,0 +1,400 @@
+"""
+Monte Carlo targeting: the computer samples complete human fleets that agree with everything seen so far
+(hits, dots and destroyed ships) and fires at the block occupied most often across the samples.
+Sampling stops at a time budget per move and can be spread over a pool of worker processes.
+"""
+
+import atexit
+import time
+from math import factorial
+from random import Random
+from typing import Callable, Optional
+
+from ai.heatmap import get_cell_placements
+from elements.autoships import SAMPLING_ATTEMPTS
+from elements.bitboard import BitBoard, get_tables, index_to_block
+from elements.game_state import GameState
+from elements.rules import Rules
+from game_logic import computer_shoots
+
+# Moves with a smaller budget (in seconds) are left to the fallback strategy without sampling
+MIN_BUDGET = 0.001
+# Moves with fewer consistent samples are left to the fallback strategy
+MIN_SAMPLES = 20
+# Attempts to sample a fleet (most of them succeed) allowed per requested sample
+ATTEMPTS_PER_SAMPLE = 4
+
+
+def observe(board: BitBoard) -> tuple:
+    """
+    Collects what the shooter knows about a bitboard: ships are only revealed once they are destroyed.
+    Returns:
+        tuple: mask of blocks no afloat ship can occupy (dots and destroyed ships), mask of hits in ships
+            that are still afloat and lengths of those ships (longest first)
+    """
+    sunk = 0
+    lengths = []
+    for ship_mask in board.ship_masks:
+        if ship_mask & board.hits == ship_mask:
+            sunk |= ship_mask
+        else:
+            lengths.append(bin(ship_mask).count("1"))
+    lengths.sort(reverse=True)
+    return board.dotted | sunk, board.hits & ~sunk, tuple(lengths)
+
+
+def covering_placements(mask: int, covered_by: list) -> int:
+    """
+    Returns:
+        int: bitset of the placements that cover any block of a mask (covered_by - bitset for every block)
+    """
+    placements = 0
+    while mask:
+        bit = mask & -mask
+        mask ^= bit
+        placements |= covered_by[bit.bit_length() - 1]
+    return placements
+
+
+def destroyed_ships(board: BitBoard) -> tuple:
+    """
+    Returns:
+        tuple: masks of the ships of a bitboard that are destroyed
+    """
+    return tuple(ship_mask for ship_mask in board.ship_masks if ship_mask & board.hits == ship_mask)
+
+
+class AutoShipsPrior:
+    """
+    Probabilities of fleets under AutoShips.place_fleet, which places ships longest first, every one uniformly
+    among the positions that do not touch the ships placed before it: a fleet placed in some order has the
+    probability of 1 / (product of numbers of such positions), and the probability of the fleet is the sum
+    of that over the orders of its ships of the same length (backtracking of place_fleet is rare and ignored).
+    It is far from uniform over fleets: a corner of an empty grid is occupied by 18% of fleets AutoShips places
+    and by 24% of all fleets, a block in the middle by 20% and 18%
+    ----------
+    Attributes:
+        rules (Rules): size of the grid and the fleet
+    ----------
+    Methods:
+        weight(ships, rng): Returns a weight proportional to the probability of a fleet
+    """
+
+    def __init__(self, rules: Rules) -> None:
+        self.rules = rules
+        tables = get_tables(rules)
+        # Length -> number of its positions on an empty grid
+        self.__positions = {length: len(tables.placement_masks[length]) for length in rules.ship_lengths}
+        # Length -> bitset of its positions that cover every block
+        self.__covered_by = {}
+        for length in rules.ship_lengths:
+            covered_by = [0] * rules.cells
+            for placement, cells in enumerate(tables.placement_cells[length]):
+                for index in cells:
+                    covered_by[index] |= 1 << placement
+            self.__covered_by[length] = covered_by
+        # Blocking mask of a ship -> positions of every length it rules out, as bitsets (filled on first use)
+        self.__conflicts = {}
+
+    def weight(self, ships: list, rng: Random) -> float:
+        """
+        Returns the probability of a fleet placed in a random order of its ships of the same length, times
+        the number of such orders: its expected value is the probability of the fleet
+        Args:
+            ships (list of tuples): length and blocking mask (see BitTables) of every ship of the fleet
+            rng (Random): random number generator for the order
+        """
+        weight = 1.0
+        ruled_out = dict.fromkeys(self.__positions, 0)
+        for length, blocking_mask in sorted(ships, key=lambda ship: (-ship[0], rng.random())):
+            weight /= self.__positions[length] - bin(ruled_out[length]).count("1")
+            conflicts = self.__conflicts.get(blocking_mask)
+            if conflicts is None:
+                conflicts = self.__conflicts[blocking_mask] = [
+                    (other_length, covering_placements(blocking_mask, covered_by))
+                    for other_length, covered_by in self.__covered_by.items()
+                ]
+            for other_length, bitset in conflicts:
+                ruled_out[other_length] |= bitset
+        for count in self.rules.fleet_counts.values():
+            weight *= factorial(count)
+        return weight
+
+
+# AutoShips priors of every rules, built on first use
+_priors = {}
+
+
+def get_autoships_prior(rules: Rules) -> AutoShipsPrior:
+    prior = _priors.get(rules)
+    if prior is None:
+        prior = _priors[rules] = AutoShipsPrior(rules)
+    return prior
+
+
+class FleetSampler:
+    """
+    Samples placements of the ships that are afloat consistent with what is known about a grid:
+    they neither touch each other nor cover blocked blocks, and together cover every hit of them.
+    Ships covering hits are placed first (covering the lowest uncovered hit), the rest are placed one by one
+    uniformly among their valid placements. A way of sampling a fleet has the probability of 1 / (product of
+    numbers of choices), so the fleet is weighted by that product, divided by the number of ways (orders of
+    the ships of the same length not covering hits), which counts every consistent fleet once, and by
+    the probability that AutoShips places it with the destroyed ships (see AutoShipsPrior): weighted counts
+    follow the fleets the computer plays against rather than favouring fleets whose first ships have fewer
+    valid placements. Valid placements of the ships not covering hits are bitsets over their placements
+    ----------
+    Attributes:
+        rules (Rules): size of the grid and the fleet
+        blocked, unsunk_hits, lengths: what is known about the grid (see observe)
+        sunk (tuple of ints): masks of the destroyed ships (see destroyed_ships)
+    ----------
+    Methods:
+        sample(rng): Returns the mask of a sampled fleet and its weight
+    """
+
+    def __init__(self, rules: Rules, blocked: int, unsunk_hits: int, lengths: tuple, sunk: tuple = ()) -> None:
+        self.rules = rules
+        self.blocked = blocked
+        self.unsunk_hits = unsunk_hits
+        self.lengths = lengths
+        self.sunk = sunk
+        tables = get_tables(rules)
+        self.__prior = get_autoships_prior(rules)
+        # Lengths and blocking masks of the destroyed ships
+        self.__sunk_ships = [(bin(ship_mask).count("1"), ship_mask | tables.halo_mask(ship_mask)) for ship_mask in sunk]
+        # Placements of ships not covering hits: neither on blocked blocks nor next to hits
+        self.__free = {
+            length: [
+                (mask, blocking_mask)
+                for mask, blocking_mask in zip(tables.placement_masks[length], tables.placement_blocking_masks[length])
+                if not mask & blocked and not blocking_mask & unsunk_hits
+            ]
+            for length in set(lengths)
+        }
+        # Length -> bitset of the placements above that cover every block
+        self.__covered_by = {}
+        for length, placements in self.__free.items():
+            covered_by = [0] * rules.cells
+            for placement, (mask, _) in enumerate(placements):
+                while mask:
+                    bit = mask & -mask
+                    mask ^= bit
+                    covered_by[bit.bit_length() - 1] |= 1 << placement
+            self.__covered_by[length] = covered_by
+        # (length, placement) -> placements of every length it rules out, as bitsets (filled on first use)
+        self.__conflicts = {}
+        # Placements of ships covering every hit: a ship of only hits would have been destroyed
+        # and hits next to a ship must be in it
+        self.__covering = {}
+        cell_placements = get_cell_placements(rules)
+        hits = unsunk_hits
+        while hits:
+            hit = (hits & -hits).bit_length() - 1
+            hits &= hits - 1
+            self.__covering[hit] = [
+                (length, mask, blocking_mask)
+                for length in set(lengths)
+                for mask, blocking_mask in (
+                    (tables.placement_masks[length][placement], tables.placement_blocking_masks[length][placement])
+                    for placement in cell_placements[length][hit]
+                )
+                if not mask & blocked and mask & ~unsunk_hits and not blocking_mask & ~mask & unsunk_hits
+            ]
+
+    def sample(self, rng: Random) -> Optional[tuple]:
+        """
+        Returns:
+            tuple: mask of all blocks of a sampled fleet and its weight (float), None if the sample ran into
+                a dead end
+        """
+        lengths = list(self.lengths)
+        ships = list(self.__sunk_ships)
+        fleet = 0
+        blocked = 0
+        weight = 1.0
+        uncovered = self.unsunk_hits
+        while uncovered:
+            hit = (uncovered & -uncovered).bit_length() - 1
+            candidates = [
+                candidate
+                for candidate in self.__covering[hit]
+                if not candidate[1] & blocked and candidate[0] in lengths
+            ]
+            if not candidates:
+                return None
+            weight *= len(candidates)
+            length, mask, blocking_mask = candidates[int(rng.random() * len(candidates))]
+            lengths.remove(length)
+            ships.append((length, blocking_mask))
+            fleet |= mask
+            uncovered &= ~mask
+            blocked |= blocking_mask
+        # Placements of every length that do not touch the ships placed so far
+        valid = {
+            length: (1 << len(self.__free[length])) - 1 & ~covering_placements(blocked, self.__covered_by[length])
+            for length in set(lengths)
+        }
+        # Ships of the same length can be placed in any order, every such fleet is sampled in as many ways
+        for length in set(lengths):
+            weight /= factorial(lengths.count(length))
+        for length in lengths:
+            placements = self.__free[length]
+            choices = valid[length]
+            count = bin(choices).count("1")
+            if not count:
+                return None
+            weight *= count
+            for _ in range(SAMPLING_ATTEMPTS):
+                placement = int(rng.random() * len(placements))
+                if choices >> placement & 1:
+                    break
+            else:
+                for _ in range(int(rng.random() * count)):
+                    choices &= choices - 1
+                placement = (choices & -choices).bit_length() - 1
+            fleet |= placements[placement][0]
+            ships.append((length, placements[placement][1]))
+            # The ships left cannot touch this one
+            for other_length, conflicts in self.__placement_conflicts(length, placement):
+                if other_length in valid:
+                    valid[other_length] &= ~conflicts
+        return fleet, weight * self.__prior.weight(ships, rng)
+
+    def __placement_conflicts(self, length: int, placement: int) -> list:
+        """
+        Returns:
+            list of tuples: length and bitset of its placements that touch or overlap a placement
+        """
+        key = (length, placement)
+        if key not in self.__conflicts:
+            blocking_mask = self.__free[length][placement][1]
+            self.__conflicts[key] = [
+                (other_length, covering_placements(blocking_mask, covered_by))
+                for other_length, covered_by in self.__covered_by.items()
+            ]
+        return self.__conflicts[key]
+
+
+def sample_counts(args: tuple) -> tuple:
+    """
+    Samples fleets until the budget runs out or max_samples fleets are sampled (a worker's task).
+    Args:
+        args (tuple): rules, blocked, unsunk_hits, lengths (see observe), masks of the destroyed ships,
+            seed of the sampling, budget in seconds (None - no time limit) and max_samples
+    Returns:
+        tuple: number of sampled fleets and the sum of weights of those that occupy every cell (a list)
+    """
+    rules, blocked, unsunk_hits, lengths, sunk, seed, budget, max_samples = args
+    deadline = None if budget is None else time.perf_counter() + budget
+    rng = Random(seed)
+    sampler = FleetSampler(rules, blocked, unsunk_hits, lengths, sunk)
+    counts = [0.0] * rules.cells
+    samples = 0
+    for _ in range(max_samples * ATTEMPTS_PER_SAMPLE):
+        if samples == max_samples or deadline is not None and time.perf_counter() > deadline:
+            break
+        sample = sampler.sample(rng)
+        if sample is None:
+            continue
+        fleet, weight = sample
+        samples += 1
+        while fleet:
+            bit = fleet & -fleet
+            counts[bit.bit_length() - 1] += weight
+            fleet ^= bit
+    return samples, counts
+
+
+class MonteCarlo:
+    """
+    Computer strategy (called like computer_shoots) that fires at the block occupied by the largest number
+    of sampled fleets consistent with the human grid. Ties are broken with the game's random number generator.
+    With a time budget the number of samples depends on the speed of the machine, so games are only
+    reproducible with budget=None.
+    ----------
+    Attributes:
+        budget (float): seconds of sampling per move (None - only max_samples limits sampling)
+        max_samples (int): maximum number of fleets sampled per move (by all processes together)
+        processes (int): processes sampling at the same time (1 - sampling in the calling process)
+        fallback (callable): strategy used when the budget is below MIN_BUDGET or fewer than MIN_SAMPLES
+            fleets were sampled
+    ----------
+    Methods:
+        close(): Stops the worker processes
+    """
+
+    def __init__(
+        self,
+        budget: Optional[float] = 0.05,
+        max_samples: int = 20_000,
+        processes: int = 1,
+        fallback: Callable = computer_shoots,
+    ) -> None:
+        self.budget = budget
+        self.max_samples = max_samples
+        self.processes = processes
+        self.fallback = fallback
+        self.__pool = None
+
+    def __call__(self, *, state: GameState) -> tuple:
+        rules = state.rules
+        board = state.boards.get(True)
+        if self.budget is not None and self.budget < MIN_BUDGET:
+            return self.fallback(state=state)
+        if board is None:
+            # Nothing is known about the grid before the first shot, every fleet is consistent with it
+            blocked, unsunk_hits, lengths, sunk = 0, 0, tuple(sorted(rules.fleet, reverse=True)), ()
+            available = get_tables(rules).full_mask
+        else:
+            (blocked, unsunk_hits, lengths), sunk, available = observe(board), destroyed_ships(board), board.available
+        samples, counts = self.__sample(rules, blocked, unsunk_hits, lengths, sunk, state.rng)
+        if samples < MIN_SAMPLES:
+            return self.fallback(state=state)
+        scores = {index: counts[index] for index in range(rules.cells) if available >> index & 1}
+        best = max(scores.values())
+        best_cell = state.rng.choice([index for index, score in scores.items() if score == best])
+        computer_fired_block = index_to_block(best_cell, rules.human_offset, rules.grid_size)
+        state.computer_available_to_fire_set.discard(computer_fired_block)
+        return computer_fired_block
+
+    def close(self) -> None:
+        if self.__pool is not None:
+            self.__pool.terminate()
+            self.__pool = None
+
+    def __sample(self, rules: Rules, blocked: int, unsunk_hits: int, lengths: tuple, sunk: tuple, rng: Random) -> tuple:
+        """
+        Samples fleets in this process or in the pool (started on first use). Worker processes of a pool
+        (e.g. of a tournament) cannot start pools of their own, so they sample by themselves.
+        """
+        processes = self.processes
+        if processes > 1:
+            # Imported here, since it takes longer than the rest of the module and only pools need it
+            import multiprocessing
+
+            if multiprocessing.current_process().daemon:
+                processes = 1
+        tasks = [
+            (
+                rules,
+                blocked,
+                unsunk_hits,
+                lengths,
+                sunk,
+                rng.getrandbits(64),
+                self.budget,
+                self.max_samples * (part + 1) // processes - self.max_samples * part // processes,
+            )
+            for part in range(processes)
+        ]
+        if processes == 1:
+            return sample_counts(tasks[0])
+        if self.__pool is None:
+            self.__pool = multiprocessing.Pool(processes)
+            atexit.register(self.close)
+        samples, counts = 0, [0.0] * rules.cells
+        for task_samples, task_counts in self.__pool.map(sample_counts, tasks):
+            samples += task_samples
+            counts = [total + count for total, count in zip(counts, task_counts)]
+        return samples, counts
@@ -0,0 +1,240 @@
+"""
+Opening book: the best shots at a grid on which every shot so far was a miss, computed offline from
+a large sample of fleets (placed by AutoShips and, optionally, by humans in recorded games).
+For every such grid the book holds a few alternative shots, the blocks occupied by most sampled fleets
+that agree with the misses, so that the computer's opening is not always the same.
+The book is a compact binary file:
+- MAGIC, the grid size, the number of ships and their lengths, the number of alternatives and of entries
+- one entry per grid: the mask of misses (one bit per block) and the alternatives (one byte each,
+  two on grids of more than 255 blocks; unused ones are all ones)
+Build a book from the src directory: python -m ai.opening_book [--fleets 200000 --recordings games.bin]
+"""
+
+import argparse
+import os
+import struct
+import time
+from collections import Counter
+from itertools import chain
+from random import Random
+from typing import Callable, Optional
+
+from elements.autoships import AutoShips
+from elements.bitboard import get_tables, index_to_block
+from elements.constants import GRID_SIZE
+from elements.fleet_corpus import FleetCorpus
+from elements.game_record import read_games
+from elements.game_state import GameState
+from elements.rules import Rules
+
+MAGIC = b"BSBOOK01"
+# The book shipped with the game (classic rules)
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening_book.bin")
+# Misses in a row the book covers
+BOOK_DEPTH = 6
+# Alternative shots for every grid
+BOOK_ALTERNATIVES = 3
+COUNT_FORMAT = struct.Struct("<I")
+
+
+def cell_format(rules: Rules) -> str:
+    return "B" if rules.cells < 0xFF else "H"
+
+
+def entry_format(rules: Rules, alternatives: int) -> struct.Struct:
+    """
+    Returns the format of an entry without its mask of misses
+    """
+    return struct.Struct(f"<{alternatives}{cell_format(rules)}")
+
+
+def mask_size(rules: Rules) -> int:
+    return (rules.cells + 7) // 8
+
+
+def sample_fleets(rules: Rules, count: int, seed: int = 0, corpus: Optional[FleetCorpus] = None) -> list:
+    """
+    Returns placement indexes of count fleets placed by AutoShips (or the first count fleets of a corpus)
+    """
+    if corpus is not None:
+        return [corpus.placements(number) for number in range(min(count, len(corpus)))]
+    rng = Random(seed)
+    return [AutoShips.place_fleet(rng, rules) for _ in range(count)]
+
+
+def recorded_fleets(paths: list, rules: Rules) -> list:
+    """
+    Returns placement indexes of the fleets of human players in recorded games with the same rules
+    (games of computer strategies, e.g. tournaments', and recordings that do not say which players are humans
+    are skipped)
+    """
+    return [
+        game.placements[player]
+        for path in paths
+        for game in read_games(path)
+        if game.rules == rules and game.humans
+        for player in game.humans
+    ]
+
+
+def build_book(fleets: list, rules: Rules, depth: int = BOOK_DEPTH, alternatives: int = BOOK_ALTERNATIVES) -> dict:
+    """
+    Builds a book from sampled fleets: from the empty grid, the alternatives of every grid are its best shots,
+    and missing any of them leads to a grid of the next level.
+    Args:
+        fleets (list): placement indexes of sampled fleets (a fleet may be repeated to weigh it more)
+        rules (Rules): size of the grid and the fleet
+        depth (int, optional): misses in a row the book covers. Defaults to BOOK_DEPTH.
+        alternatives (int, optional): shots for every grid. Defaults to BOOK_ALTERNATIVES.
+    Returns:
+        dict: mask of misses -> tuple of the best shots (cell indexes), the best one first
+    """
+    tables = get_tables(rules)
+    samples = []
+    for placements in fleets:
+        cells = tuple(
+            chain.from_iterable(
+                tables.placement_cells[length][placement] for length, placement in zip(rules.fleet, placements)
+            )
+        )
+        mask = 0
+        for index in cells:
+            mask |= 1 << index
+        samples.append((mask, cells))
+    book = {}
+    level = {0: samples}
+    for _ in range(depth):
+        next_level = {}
+        for misses, consistent in level.items():
+            counts = Counter(chain.from_iterable(cells for _, cells in consistent))
+            for index in range(rules.cells):
+                if misses >> index & 1:
+                    counts.pop(index, None)
+                else:
+                    counts.setdefault(index, 0)
+            # Ties are broken by the lower block, so that the same fleets always give the same book
+            best = sorted(counts, key=lambda index: (-counts[index], index))[:alternatives]
+            book[misses] = tuple(best)
+            for index in best:
+                child = misses | 1 << index
+                if child not in next_level:
+                    bit = 1 << index
+                    next_level[child] = [sample for sample in consistent if not sample[0] & bit]
+        level = next_level
+    return book
+
+
+def write_book(path: str, book: dict, rules: Rules, alternatives: int = BOOK_ALTERNATIVES) -> None:
+    entry = entry_format(rules, alternatives)
+    unused = (1 << 8 * struct.calcsize(cell_format(rules))) - 1
+    with open(path, "wb") as book_file:
+        book_file.write(MAGIC + bytes((rules.grid_size, len(rules.fleet))) + bytes(rules.fleet))
+        book_file.write(bytes((alternatives,)) + COUNT_FORMAT.pack(len(book)))
+        for misses in sorted(book):
+            shots = book[misses]
+            book_file.write(misses.to_bytes(mask_size(rules), "little"))
+            book_file.write(entry.pack(*shots, *[unused] * (alternatives - len(shots))))
+
+
+def read_book(path: str) -> tuple:
+    """
+    Reads a book file.
+    Returns:
+        tuple: rules of the book and the book (see build_book)
+    Raises:
+        ValueError: if the file is not an opening book
+    """
+    with open(path, "rb") as book_file:
+        data = book_file.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not an opening book")
+    position = len(MAGIC)
+    grid_size, ships = data[position : position + 2]
+    rules = Rules(grid_size, tuple(data[position + 2 : position + 2 + ships]))
+    position += 2 + ships
+    alternatives = data[position]
+    (count,) = COUNT_FORMAT.unpack_from(data, position + 1)
+    position += 1 + COUNT_FORMAT.size
+    entry = entry_format(rules, alternatives)
+    size = mask_size(rules)
+    if position + count * (size + entry.size) != len(data):
+        raise ValueError(f"{path} has a broken opening book")
+    book = {}
+    for _ in range(count):
+        misses = int.from_bytes(data[position : position + size], "little")
+        book[misses] = tuple(index for index in entry.unpack_from(data, position + size) if index < rules.cells)
+        position += size + entry.size
+    return rules, book
+
+
+# Books read by every path, read on first use
+_books = {}
+
+
+def get_book(path: str) -> tuple:
+    if path not in _books:
+        _books[path] = read_book(path)
+    return _books[path]
+
+
+class OpeningBook:
+    """
+    Computer strategy (called like computer_shoots) that plays the book while every shot at the human grid
+    was a miss and the grid is in the book (choosing randomly among its alternatives), another strategy after that.
+    The book is read on the first shot, then every shot from it is a dictionary lookup
+    ----------
+    Attributes:
+        strategy (callable): strategy played after the opening
+        path (str): book file
+    """
+
+    def __init__(self, strategy: Callable, path: str = BOOK_PATH) -> None:
+        self.strategy = strategy
+        self.path = path
+
+    def __call__(self, *, state: GameState) -> tuple:
+        board = state.boards.get(True)
+        misses = 0
+        if board is not None:
+            if board.hits:
+                return self.strategy(state=state)
+            misses = board.misses
+        rules, book = get_book(self.path)
+        shots = book.get(misses) if rules == state.rules else None
+        if not shots:
+            return self.strategy(state=state)
+        computer_fired_block = index_to_block(state.rng.choice(shots), rules.human_offset, rules.grid_size)
+        state.computer_available_to_fire_set.discard(computer_fired_block)
+        return computer_fired_block
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Builds an opening book from sampled fleets")
+    parser.add_argument("--output", default=BOOK_PATH, help="book file (default: the one shipped with the game)")
+    parser.add_argument("--fleets", type=int, default=200_000, help="fleets placed by AutoShips")
+    parser.add_argument("--corpus", help="take the fleets from a corpus (see elements.fleet_corpus)")
+    parser.add_argument("--recordings", nargs="*", default=[], help="recorded games with human fleets")
+    parser.add_argument("--human-weight", type=int, default=10, help="sampled fleets every human fleet counts as")
+    parser.add_argument("--depth", type=int, default=BOOK_DEPTH, help="misses in a row the book covers")
+    parser.add_argument("--alternatives", type=int, default=BOOK_ALTERNATIVES, help="shots for every grid")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--grid-size", type=int, default=GRID_SIZE, help="with the classic fleet scaled to it")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rules = Rules.scaled(args.grid_size)
+    corpus = FleetCorpus(args.corpus) if args.corpus else None
+    if corpus is not None and corpus.rules != rules:
+        raise SystemExit(f"{args.corpus} has fleets of {corpus.rules}, not of {rules}")
+    fleets = sample_fleets(rules, args.fleets, args.seed, corpus)
+    human_fleets = recorded_fleets(args.recordings, rules)
+    book = build_book(fleets + human_fleets * args.human_weight, rules, args.depth, args.alternatives)
+    write_book(args.output, book, rules, args.alternatives)
+    print(
+        f"{len(book)} grids from {len(fleets)} sampled and {len(human_fleets)} human fleets written to {args.output} "
+        f"({os.path.getsize(args.output)} bytes) in {time.perf_counter() - start:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Computes computer's moves in a background thread, so that the window keeps drawing and handling events
+while a strategy thinks.
+"""
+
+import threading
+import time
+from typing import Callable, Optional
+
+from elements.game_state import GameState
+from game_logic import computer_shoots
+
+# Seconds a strategy may think about a move before its fallback's move is played instead
+MOVE_DEADLINE = 1.0
+
+
+class MoveWorker:
+    """
+    Runs a strategy on a fork of the game (see GameState.fork) in a daemon thread, one move at a time.
+    A move that is not ready by the deadline is replaced by the fallback strategy's move, chosen on the game itself,
+    and the late one is dropped (strategies with a time budget, like MonteCarlo, return the best move they found
+    within it, so they should be given a budget well below the deadline). The next move does not start thinking
+    until the late one's thread has finished, so a strategy never thinks in two threads at once (sharing
+    MonteCarlo's pool or the endgame's transposition table)
+    ----------
+    Attributes:
+        strategy (callable): how computer chooses blocks to shoot at
+        deadline (float): seconds the strategy may think about a move
+        fallback (callable): strategy played when the deadline passes
+        late_moves (int): number of moves that were replaced by the fallback's ones
+    ----------
+    Methods:
+        start(state): Starts thinking about a move unless the worker is already thinking
+        poll(state, wait): Returns the move once it is ready (or the fallback's one after the deadline)
+    """
+
+    def __init__(
+        self, strategy: Callable, deadline: float = MOVE_DEADLINE, fallback: Callable = computer_shoots
+    ) -> None:
+        self.strategy = strategy
+        self.deadline = deadline
+        self.fallback = fallback
+        self.late_moves = 0
+        self.__move = None
+        # Thread of the last move that started thinking (it may still be running after its deadline)
+        self.__thread = None
+
+    @property
+    def thinking(self) -> bool:
+        return self.__move is not None
+
+    def start(self, state: GameState) -> None:
+        """
+        Starts thinking about a move on a fork of the game (unless the worker is already thinking)
+        """
+        if self.__move is not None:
+            return
+        fork = state.fork()
+        done = threading.Event()
+        # The strategy's move or the exception it raised
+        result = []
+
+        def think() -> None:
+            try:
+                result.append(self.strategy(state=fork))
+            except Exception as error:
+                result.append(error)
+            done.set()
+
+        thread = threading.Thread(target=think, name="computer move", daemon=True)
+        self.__move = (fork, done, result, time.perf_counter() + self.deadline, thread)
+        self.__launch()
+
+    def poll(self, state: GameState, wait: float = 0.0) -> Optional[tuple]:
+        """
+        Returns the move once the strategy has chosen it or the deadline has passed, None before that
+        Args:
+            state (GameState): the game the move is played in
+            wait (float, optional): seconds to wait for the move (at most until the deadline). Defaults to 0.0.
+        Raises:
+            Exception: if the strategy raised it
+        """
+        fork, done, result, deadline, thread = self.__move
+        until = min(time.perf_counter() + wait, deadline)
+        if thread.ident is None:
+            # Waiting for a late move's thread to finish
+            self.__thread.join(max(0.0, until - time.perf_counter()))
+            self.__launch()
+        if done.wait(max(0.0, until - time.perf_counter())):
+            self.__move = None
+            if isinstance(result[0], Exception):
+                raise result[0]
+            # The game goes on as if the strategy had chosen the move on it
+            state.adopt(fork)
+            return result[0]
+        if time.perf_counter() < deadline:
+            return None
+        self.__move = None
+        self.late_moves += 1
+        return self.fallback(state=state)
+
+    def __launch(self) -> None:
+        """
+        Starts the current move's thread unless the last move's thread is still running
+        """
+        thread = self.__move[-1]
+        if self.__thread is None or not self.__thread.is_alive():
+            self.__thread = thread
+            thread.start()
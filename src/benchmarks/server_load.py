@@ -0,0 +1,91 @@
+"""
+Load test of the game server over loopback: thousands of scripted bots play at the same time.
+Reports games per second, round trips of shots measured by bots, the time the server spends handling a shot
+and its CPU time per shot. Bots run in worker processes, so that their own work does not count as the server's
+latency (on a machine with fewer cores than processes they still take turns with the server).
+Run from the src directory: python -m benchmarks.server_load --games 2000 [--connect host:port]
+"""
+
+import argparse
+import asyncio
+import time
+from multiprocessing import Pool
+
+from elements.constants import GRID_SIZE
+from elements.rules import Rules
+from instrumentation import percentile
+from network.bots import play_bot
+from network.client import parse_address
+from network.server import GameServer
+
+
+def describe_times(times) -> str:
+    return (
+        f"p50 {percentile(times, 50) * 1e6:.0f} us, p99 {percentile(times, 99) * 1e6:.0f} us, "
+        f"max {max(times, default=0.0) * 1e6:.0f} us over {len(times)} shots"
+    )
+
+
+async def play_bots(host: str, port: int, seeds: range) -> tuple:
+    """
+    Plays a game with every seed at the same time.
+    Returns:
+        tuple: results of the games (see play_bot) and round trips of all shots in seconds
+    """
+    latencies = []
+    results = await asyncio.gather(*(play_bot(host, port, seed, latencies) for seed in seeds))
+    return results, latencies
+
+
+def play_bots_process(args: tuple) -> tuple:
+    return asyncio.run(play_bots(*args))
+
+
+async def run_load(games: int, seed: int, processes: int, rules: Rules, address: str = "") -> None:
+    """
+    Starts a server in this process (unless address of another one is given) and plays games on it
+    with 2 * games bots spread across processes
+    """
+    server = None
+    if address:
+        host, port = parse_address(address)
+    else:
+        server = GameServer(rules, seed=seed)
+        listener = await server.serve("127.0.0.1", 0)
+        host, port = listener.sockets[0].getsockname()[:2]
+    bots = 2 * games
+    chunks = [
+        (host, port, range(seed + bots * part // processes, seed + bots * (part + 1) // processes))
+        for part in range(processes)
+    ]
+    start = time.perf_counter()
+    start_cpu = time.process_time()
+    with Pool(processes) as pool:
+        outcomes = await asyncio.get_running_loop().run_in_executor(None, pool.map, play_bots_process, chunks)
+    elapsed = time.perf_counter() - start
+    # Only the server runs in this process
+    elapsed_cpu = time.process_time() - start_cpu
+    results = [result for chunk_results, _ in outcomes for result in chunk_results]
+    latencies = [latency for _, chunk_latencies in outcomes for latency in chunk_latencies]
+    finished = sum(result is True for result in results)
+    print(f"{finished} games finished by {bots} bots in {elapsed:.2f}s ({finished / elapsed:.0f} games/s)")
+    print(f"shot round trip:           {describe_times(latencies)}")
+    if server is not None:
+        print(f"server handling of a shot: {describe_times(server.move_times)}")
+        print(f"server CPU time per shot:  {elapsed_cpu / max(len(latencies), 1) * 1e6:.0f} us")
+        listener.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--games", type=int, default=1000, help="games played at the same time")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=2, help="processes running bots")
+    parser.add_argument("--grid-size", type=int, default=GRID_SIZE, help="with the classic fleet scaled to it")
+    parser.add_argument("--connect", default="", help="host:port of a running server (one is started otherwise)")
+    args = parser.parse_args()
+    asyncio.run(run_load(args.games, args.seed, args.processes, Rules.scaled(args.grid_size), args.connect))
+
+
+if __name__ == "__main__":
+    main()
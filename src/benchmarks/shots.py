@@ -0,0 +1,85 @@
+"""
+Benchmarks shot resolution: shots per second through the set-based game_logic functions
+and through the raw bitboard engine.
+Run from the src directory: python -m benchmarks.shots
+"""
+
+import argparse
+import random
+import time
+from typing import Callable
+
+import game_logic
+from elements.autoships import AutoShips
+from elements.bitboard import BitBoard
+from elements.constants import GRID_SIZE
+from elements.game_state import GameState
+from elements.rules import Rules
+
+
+def bench_game_logic(fleets: list, seed: int, rules: Rules, strategy: Callable = game_logic.computer_shoots) -> tuple:
+    """
+    Plays a strategy (computer_shoots by default) against every fleet through check_hit_or_miss.
+    Returns:
+        tuple: number of shots and elapsed seconds
+    """
+    shots = 0
+    elapsed = 0.0
+    for game, fleet in enumerate(fleets):
+        state = GameState(seed + game, rules)
+        ships_set = set(fleet.ships_set)
+        start = time.perf_counter()
+        while ships_set:
+            fired_block = strategy(state=state)
+            game_logic.check_hit_or_miss(
+                state=state,
+                fired_block=fired_block,
+                computer_turn=True,
+                opponents_ships_list_original_copy=fleet.ships,
+                opponents_ships_set=ships_set,
+            )
+            shots += 1
+        elapsed += time.perf_counter() - start
+    return shots, elapsed
+
+
+def bench_bitboard(fleets: list, seed: int, rules: Rules) -> tuple:
+    """
+    Fires at every cell of every fleet's bitboard in random order until all ships are sunk.
+    Returns:
+        tuple: number of shots and elapsed seconds
+    """
+    rng = random.Random(seed)
+    orders = [rng.sample(range(rules.cells), rules.cells) for _ in fleets]
+    shots = 0
+    start = time.perf_counter()
+    for fleet, order in zip(fleets, orders):
+        board = BitBoard(fleet.ships, offset=rules.human_offset, rules=rules)
+        for index in order:
+            if board.available >> index & 1:
+                board.fire(index)
+                shots += 1
+                if board.all_sunk:
+                    break
+    return shots, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--grid-size", type=int, default=GRID_SIZE, help="with the classic fleet scaled to it")
+    args = parser.parse_args()
+
+    rules = Rules.scaled(args.grid_size)
+    rng = random.Random(args.seed)
+    fleets = [AutoShips(rules.human_offset, rng=rng, rules=rules) for _ in range(args.games)]
+    for name, (shots, elapsed) in (
+        ("game_logic.check_hit_or_miss", bench_game_logic(fleets, args.seed, rules)),
+        ("BitBoard.fire", bench_bitboard(fleets, args.seed, rules)),
+    ):
+        print(f"{name:32} {shots:9d} shots {shots / elapsed:12.0f} shots/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Soak run of a session: thousands of games played one after another in one process, headlessly and without
+a frame rate limit, with AutoPlayer clicking for human. Memory, live Python objects and frame times are sampled
+every batch of games and must stay flat: the run exits with 1 if they grow beyond the thresholds.
+Run from the src directory: python -m benchmarks.soak --games 10000 [--batch 500 --ai heatmap]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+
+from ai import STRATEGIES
+from elements.constants import GRID_SIZE
+from elements.rules import Rules
+from graphics.drawing import get_screen
+from graphics.text_cache import text_cache
+from main import AutoPlayer, play_one_game
+
+
+def memory_mb() -> float:
+    """
+    Returns the resident memory of the process in megabytes (the peak one where the current one is not known)
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+
+        # Kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def run_soak(games: int, batch: int, seed: int, strategy: str, rules: Rules) -> list:
+    """
+    Plays games in batches and prints a sample after every batch.
+    Returns:
+        list of tuples: games played, memory in megabytes, live objects and milliseconds per frame of every batch
+    """
+    get_screen(headless=True)
+    autoplayer = AutoPlayer(seed)
+    samples = []
+    played = 0
+    while played < games:
+        frames = text_cache.frames
+        start = time.perf_counter()
+        for _ in range(min(batch, games - played)):
+            play_one_game(STRATEGIES[strategy], 0, rules, None, autoplayer)
+            played += 1
+        frame_ms = (time.perf_counter() - start) / max(text_cache.frames - frames, 1) * 1e3
+        gc.collect()
+        samples.append((played, memory_mb(), len(gc.get_objects()), frame_ms))
+        print(f"{played:7} games  {samples[-1][1]:8.1f} MB  {samples[-1][2]:9} objects  {frame_ms:7.3f} ms/frame")
+    return samples
+
+
+def check_growth(samples: list, max_memory: float, max_objects: float, max_frame: float) -> list:
+    """
+    Compares the last sample with the first one (taken after the first batch, when caches are warm).
+    Returns:
+        list: descriptions of measures that grew beyond their thresholds
+    """
+    (_, memory, objects, frame_ms), (_, last_memory, last_objects, last_frame_ms) = samples[0], samples[-1]
+    failures = []
+    if last_memory - memory > max_memory:
+        failures.append(f"memory grew by {last_memory - memory:.1f} MB (more than {max_memory} MB)")
+    if (last_objects / objects - 1) * 100 > max_objects:
+        failures.append(f"live objects grew from {objects} to {last_objects} (more than {max_objects}%)")
+    if (last_frame_ms / frame_ms - 1) * 100 > max_frame:
+        failures.append(f"frame time grew from {frame_ms:.3f} to {last_frame_ms:.3f} ms (more than {max_frame}%)")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--games", type=int, default=10_000)
+    parser.add_argument("--batch", type=int, default=500, help="games between samples")
+    parser.add_argument("--seed", type=int, default=0, help="seed of AutoPlayer's shots")
+    parser.add_argument("--ai", choices=sorted(STRATEGIES), default="random", help="computer's strategy")
+    parser.add_argument("--grid-size", type=int, default=GRID_SIZE, help="with the classic fleet scaled to it")
+    parser.add_argument("--max-memory-growth", type=float, default=16.0, help="megabytes")
+    parser.add_argument("--max-objects-growth", type=float, default=5.0, help="percent")
+    parser.add_argument("--max-frame-growth", type=float, default=50.0, help="percent (frame times are noisy)")
+    args = parser.parse_args()
+
+    samples = run_soak(args.games, args.batch, args.seed, args.ai, Rules.scaled(args.grid_size))
+    failures = check_growth(samples, args.max_memory_growth, args.max_objects_growth, args.max_frame_growth)
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit(1)
+    print("memory, objects and frame times stayed flat")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Benchmarks startup: wall time of fresh interpreters importing the headless tools and the UI,
+and opening the (headless) window with its fonts.
+Run from the src directory: python -m benchmarks.startup
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+SCENARIOS = {
+    "python": "pass",
+    "headless: import tournament": "import tournament",
+    "ui: import main": "import main",
+    "ui: open window and fonts": (
+        "import main; from graphics.drawing import get_font, get_screen; get_screen(headless=True); get_font()"
+    ),
+}
+
+
+def time_scenario(code: str, runs: int) -> list:
+    """
+    Runs code in runs fresh interpreters.
+    Returns:
+        list: wall time of every run in seconds
+    """
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1")
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=SRC_DIR, env=env, check=True, capture_output=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    for name, code in SCENARIOS.items():
+        times = time_scenario(code, args.runs)
+        print(f"{name:32} median {statistics.median(times) * 1000:7.1f} ms  min {min(times) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
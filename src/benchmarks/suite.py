@@ -0,0 +1,238 @@
+"""
+Benchmark suite: ship placement, AI moves, shot resolution, whole games and every drawing phase of a frame,
+with fixed seeds and SDL's dummy video driver. Results are saved to JSON and compared with earlier results.
+Run from the src directory:
+    python -m benchmarks.suite run results.json
+    python -m benchmarks.suite compare baseline.json results.json --threshold 10
+"""
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Callable
+
+import pygame
+
+from ai import STRATEGIES
+from benchmarks.shots import bench_bitboard, bench_game_logic
+from elements.autoships import AutoShips
+from elements.constants import (
+    BLACK,
+    GRID_SIZE,
+    MESSAGE_RECT_COMPUTER,
+    WHITE,
+    X_OFFSET_FOR_HUMAN_SHIPS_COUNT,
+    Y_OFFSET_FOR_SHIPS_COUNT,
+)
+from elements.game_state import GameState
+from elements.rules import Rules
+from game_logic import check_hit_or_miss, computer_shoots
+from graphics import Grid
+from graphics.drawing import (
+    draw_from_dotted_set,
+    draw_hit_blocks,
+    draw_ships,
+    get_font,
+    get_screen,
+    print_destroyed_ships_count,
+    show_message_at_rect_center,
+)
+from main import draw_changed_blocks
+from tournament import play_game
+
+# Bump when benchmarks change so much that their results are no longer comparable
+SUITE_VERSION = 1
+
+
+def time_calls(func: Callable, calls: int) -> tuple:
+    """
+    Calls func calls times.
+    Returns:
+        tuple: number of calls and elapsed seconds
+    """
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return calls, time.perf_counter() - start
+
+
+def finished_game(rules: Rules, seed: int) -> tuple:
+    """
+    Plays computer_shoots against an AutoShips fleet until the whole fleet is destroyed.
+    Returns:
+        tuple: state of the finished game and the fleet
+    """
+    state = GameState(seed, rules)
+    fleet = AutoShips(rules.human_offset, rng=state.rng, rules=rules)
+    ships_set = set(fleet.ships_set)
+    while ships_set:
+        check_hit_or_miss(
+            state=state,
+            fired_block=computer_shoots(state=state),
+            computer_turn=True,
+            opponents_ships_list_original_copy=fleet.ships,
+            opponents_ships_set=ships_set,
+        )
+    state.blocks_to_draw.clear()
+    return state, fleet
+
+
+def get_benchmarks(rules: Rules, seed: int) -> dict:
+    """
+    Returns benchmarks of the suite: name -> function that runs the benchmark once and returns
+    the number of operations it did and elapsed seconds. Inputs are built here, outside of timing.
+    """
+    rng = random.Random(seed)
+    fleets = [AutoShips(rules.human_offset, rng=rng, rules=rules) for _ in range(100)]
+    state, fleet = finished_game(rules, seed)
+    # Blocks as computer's shots at the human grid mark them, drawn on the computer grid just as well
+    dotted_blocks = list(state.dotted_set)
+    hit_blocks = list(state.hit_blocks)
+    screen = get_screen(headless=True)
+    font = get_font()
+
+    def place_fleets() -> tuple:
+        placement_rng = random.Random(seed)
+        return time_calls(lambda: AutoShips(0, rng=placement_rng, rules=rules), 200)
+
+    def play_games() -> tuple:
+        return time_calls(lambda: play_game(("heatmap", "random"), seed, rules=rules), 20)
+
+    def new_grid() -> Grid:
+        return Grid(
+            title="HUMAN", offset=rules.human_offset, font=font, rules=rules, line_color=BLACK, text_color=BLACK
+        )
+
+    cached_grid = new_grid()
+
+    def draw_blocks_of_a_move() -> None:
+        state.blocks_to_draw.extend(hit_blocks[:1] + dotted_blocks[:4])
+        draw_changed_blocks(state)
+
+    return {
+        "placement: AutoShips": place_fleets,
+        "move: computer_shoots + check_hit_or_miss": lambda: bench_game_logic(fleets, seed, rules),
+        "move: heatmap + check_hit_or_miss": lambda: bench_game_logic(fleets[:20], seed, rules, STRATEGIES["heatmap"]),
+        "shot: BitBoard.fire": lambda: bench_bitboard(fleets, seed, rules),
+        "game: heatmap vs random": play_games,
+        "frame: Grid construction and first draw": lambda: time_calls(lambda: new_grid().draw(), 200),
+        "frame: Grid.draw": lambda: time_calls(cached_grid.draw, 2000),
+        "frame: draw_ships": lambda: time_calls(lambda: draw_ships(fleet.ships, cell_size=rules.cell_size), 2000),
+        "frame: draw_from_dotted_set": lambda: time_calls(
+            lambda: draw_from_dotted_set(dotted_blocks, cell_size=rules.cell_size), 200
+        ),
+        "frame: draw_hit_blocks": lambda: time_calls(
+            lambda: draw_hit_blocks(hit_blocks, cell_size=rules.cell_size), 200
+        ),
+        "frame: draw_changed_blocks": lambda: time_calls(draw_blocks_of_a_move, 2000),
+        "frame: print_destroyed_ships_count": lambda: time_calls(
+            lambda: print_destroyed_ships_count(
+                X_OFFSET_FOR_HUMAN_SHIPS_COUNT, Y_OFFSET_FOR_SHIPS_COUNT, state.human_destroyed_ships_count, font
+            ),
+            2000,
+        ),
+        "frame: show_message_at_rect_center": lambda: time_calls(
+            lambda: show_message_at_rect_center("Computer's last shot: J10", MESSAGE_RECT_COMPUTER), 2000
+        ),
+        "frame: full screen fill": lambda: time_calls(lambda: screen.fill(WHITE), 2000),
+    }
+
+
+def run_suite(rules: Rules, seed: int, repeat: int, only: str = "") -> dict:
+    """
+    Runs every benchmark (whose name contains only) repeat times, after one warm-up run.
+    Returns:
+        dict: metadata and microseconds per operation of every benchmark (median and min over the runs)
+    """
+    results = {}
+    for name, benchmark in get_benchmarks(rules, seed).items():
+        if only not in name:
+            continue
+        benchmark()
+        per_op = []
+        for _ in range(repeat):
+            ops, elapsed = benchmark()
+            per_op.append(elapsed / ops * 1e6)
+        results[name] = {"median_us": statistics.median(per_op), "min_us": min(per_op), "ops": ops}
+        print(f"{name:44} {results[name]['median_us']:12.2f} us/op  (min {results[name]['min_us']:.2f})")
+    return {
+        "meta": {
+            "suite_version": SUITE_VERSION,
+            "seed": seed,
+            "repeat": repeat,
+            "grid_size": rules.grid_size,
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "platform": platform.platform(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare_results(baseline: dict, current: dict, threshold: float, metric: str = "median_us") -> list:
+    """
+    Prints the change of every benchmark that both results have.
+    Returns:
+        list: names of benchmarks that got slower by more than threshold percent
+    """
+    for key in ("suite_version", "grid_size"):
+        if baseline["meta"].get(key) != current["meta"].get(key):
+            print(f"warning: {key} differs ({baseline['meta'].get(key)} vs {current['meta'].get(key)})")
+    regressions = []
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            print(f"{name:44} {'new':>12}")
+            continue
+        before, after = baseline["results"][name][metric], result[metric]
+        change = (after / before - 1) * 100
+        flag = ""
+        if change > threshold:
+            flag = "REGRESSION"
+            regressions.append(name)
+        elif change < -threshold:
+            flag = "improved"
+        print(f"{name:44} {before:12.2f} -> {after:12.2f} us/op {change:+7.1f}%  {flag}")
+    for name in baseline["results"].keys() - current["results"].keys():
+        print(f"{name:44} {'missing':>12}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run the suite and save results to a JSON file")
+    run_parser.add_argument("output", nargs="?", help="JSON file to save results to")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--repeat", type=int, default=5, help="runs of every benchmark (median is reported)")
+    run_parser.add_argument("--grid-size", type=int, default=GRID_SIZE, help="with the classic fleet scaled to it")
+    run_parser.add_argument("--only", default="", help="run only benchmarks whose names contain this")
+    compare_parser = commands.add_parser("compare", help="compare two result files, exit with 1 on regressions")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, help="percent of slowdown to flag")
+    compare_parser.add_argument("--metric", choices=("median_us", "min_us"), default="median_us")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = run_suite(Rules.scaled(args.grid_size), args.seed, args.repeat, args.only)
+        if args.output:
+            with open(args.output, "w") as file:
+                json.dump(results, file, indent=2)
+        return
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+    regressions = compare_results(baseline, current, args.threshold, args.metric)
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,16 @@
 """Creates human ships automatically."""
 
-from random import choice, randint
+import random
+from random import Random
+from typing import Optional
+
+from elements.bitboard import get_tables, index_to_block, mask_to_blocks
+from elements.rules import CLASSIC_RULES, Rules
+
+# How many random placements of a ship to try before listing all valid ones
+SAMPLING_ATTEMPTS = 8
+# Placements complete_fleet may try before giving up (a few milliseconds at most)
+COMPLETION_STEPS = 2000
 
 
 class AutoShips:
@@ -11,169 +21,211 @@ class AutoShips:
         offset (int): Where the grid starts (in number of blocks)
                 (typically 0 for computer and 15 for human)
         available_blocks (set of tuples): coordinates of all blocks
-                that are available for creating ships (updated every time a ship is created)
+                that are still available for creating ships once the whole fleet is created
         ships_set (set of tuples): all blocks that are occupied by ships
         ships (list of lists): list of all individual ships (as lists)
+        blocked (int): mask of all blocks occupied by ships and around them
+        corpus (FleetCorpus): pre-generated fleets to draw from instead of placing ships (None if not used)
+        rules (Rules): size of the grid and the fleet
     ----------
     Methods:
-        __create_start_block(available_blocks):
-            Randomly chooses a block from which to start creating a ship.
-            Randomly chooses horizontal or vertical type of a ship
-            Randomly chooses direction (from the start block) - straight or reverse
-            Returns three randomly chosen values
-        __create_ship(number_of_blocks, available_blocks):
-            Creates a ship of given length (number_of_blocks) starting from the start block
-                returned by the previous method, using type of ship and direction (changing it
-                if going outside of grid) returned by previous method.
-                Checks if the ship is valid (not adjacent to other ships and within the grid)
-                and adds it to the list of ships.
-            Returns: a list of tuples with a new ship's coordinates
-        __get_new_block_for_ship(self, coor, direction, orientation, ship_coordinates):
-            Checks if new individual blocks that are being added to a ship in the previous method
-                are within the grid, otherwise changes the direction.
-            Returns:
-                direction (int): straight or reverse
-                incremented/decremented coordinate of the last/first block in a ship under construction
-        __is_ship_valid(new_ship):
-            Check if all of a ship's coordinates are within the available blocks set.
-            Returns: True or False
-        __add_new_ship_to_set(new_ship):
-            Adds all blocks in a ship's list to the ships_set
-        __update_available_blocks_for_creating_ships(new_ship):
-            Removes all blocks occupied by a ship and around it from the available blocks set
+        place_fleet(rng, rules):
+            Chooses a placement for every ship of the fleet among the placements that are still valid.
+            Returns: a list of placement indexes (one per ship, in the fleet's order)
+        complete_fleet(rng, blocked, lengths, rules, max_steps):
+            Places the ships of lengths around ships that are already placed (bounded backtracking search).
+            Returns: a list of placement indexes (one per ship of lengths), None if they could not be placed
+        generate_many(n, offset, rng, corpus, rules):
+            Creates n fleets at once (for simulations).
+            Returns: a list of AutoShips
         __populate_grid():
-            Creates needed number of each type of ships by calling the create_ship method.
+            Creates all ships from placements chosen by place_fleet (or drawn from the corpus).
                 Adds every ship to the ships list, ships_set and updates the available blocks.
             Returns: the list of all ships
     """
 
-    def __init__(self, offset: int) -> None:
+    def __init__(self, offset: int, rng: Optional[Random] = None, corpus=None, rules: Rules = CLASSIC_RULES) -> None:
         """
         Parameters:
         offset (int): Where the grid starts (in number of blocks)
                 (typically 0 for computer and 15 for human)
+        rng (Random, optional): random number generator to place ships with
+                (typically GameState.rng). Defaults to the random module itself
+        corpus (FleetCorpus, optional): pre-generated fleets (see elements.fleet_corpus) to draw
+                a random fleet from instead of placing ships. Defaults to None
+        rules (Rules, optional): size of the grid and the fleet. Defaults to CLASSIC_RULES
         available_blocks (set of tuples): coordinates of all blocks
-                that are avaiable for creating ships (updated every time a ship is created)
+                that are avaiable for creating ships once the whole fleet is created
         ships_set (set of tuples): all blocks that are occupied by ships
         ships (list of lists): list of all individual ships (as lists)"""
 
         self.offset = offset
-        self.available_blocks = {(x, y) for x in range(1 + self.offset, 11 + self.offset) for y in range(1, 11)}
+        self.rng = rng if rng is not None else random
+        self.corpus = corpus
+        self.rules = rules
+        if corpus is not None and corpus.rules != rules:
+            raise ValueError(f"{corpus.path} has fleets of {corpus.rules}, not of {rules}")
+        self.blocked = 0
         self.ships_set = set()
         self.ships = self.__populate_grid()
-        self.orientation = None
-        self.direction = None
 
-    def __create_start_block(self, available_blocks: set[tuple]) -> tuple:
+    @property
+    def available_blocks(self) -> set:
         """
-        Randomly chooses a block from which to start creating a ship.
-        Randomly chooses horizontal or vertical type of a ship
-        Randomly chooses direction (from the start block) - straight or reverse
-        Args:
-            available_blocks (set of tuples): coordinates of all blocks
-                that are available for creating ships (updated every time a ship is created)
-        Returns:
-            int: x coordinate of a random block
-            int: y coordinate of a random block
-            int: 0=horizontal (change x), 1=vertical (change y)
-            int: 1=straight, -1=reverse
+        Blocks that are neither occupied by ships nor adjacent to them
         """
-        self.orientation = randint(0, 1)
-        # -1 is left or down, 1 is right or up
-        self.direction = choice((-1, 1))
-        x, y = choice(tuple(available_blocks))
-        return x, y, self.orientation, self.direction
+        full_mask = get_tables(self.rules).full_mask
+        return set(mask_to_blocks(full_mask & ~self.blocked, self.offset, self.rules.grid_size))
 
-    def __create_ship(self, number_of_blocks: int, available_blocks: set[tuple]) -> list:
+    @staticmethod
+    def place_fleet(rng, rules: Rules = CLASSIC_RULES) -> list:
         """
-        Creates a ship of given length (number_of_blocks) starting from the start block
-                returned by the previous method, using type of ship and direction (changing it
-                if going outside of grid) returned by previous method.
-                Checks if the ship is valid (not adjacent to other ships and within the grid)
-                and adds it to the list of ships.
+        Chooses a placement for every ship of the fleet, uniformly among the placements that neither
+        overlap nor touch the ships placed before it. A few random placements are tried first
+        (a single mask check each); if they all fail, the valid placements are listed and sampled from.
+        If some ship has no valid placement left, the previous ship is moved to another of its
+        placements (backtracking without recursion), so every placement of every ship is tried
+        at most once and the number of steps per fleet is bounded.
         Args:
-            number_of_blocks (int): length of a needed ship
-            available_blocks (set): free blocks for creating ships
+            rng (Random): random number generator (or the random module)
+            rules (Rules, optional): size of the grid and the fleet. Defaults to CLASSIC_RULES
         Returns:
-            list: a list of tuples with a new ship's coordinates
+            list: placement indexes in BitTables.placement_cells, one per ship in the fleet's order
         """
-        ship_coordinates = []
-        x, y, self.orientation, self.direction = self.__create_start_block(available_blocks)
-        for _ in range(number_of_blocks):
-            ship_coordinates.append((x, y))
-            if not self.orientation:
-                self.direction, x = self.__get_new_block_for_ship(x, self.direction, self.orientation, ship_coordinates)
-            else:
-                self.direction, y = self.__get_new_block_for_ship(y, self.direction, self.orientation, ship_coordinates)
-        if self.__is_ship_valid(ship_coordinates):
-            return ship_coordinates
-        return self.__create_ship(number_of_blocks, available_blocks)
+        fleet = rules.fleet
+        tables = get_tables(rules)
+        chosen = []
+        # For every placed ship: its remaining candidates (None if not listed yet), blocked mask before it
+        # and its placement
+        stack = []
+        blocked = 0
+        candidates = None
+        while len(chosen) < len(fleet):
+            masks = tables.placement_masks[fleet[len(chosen)]]
+            placement = None
+            if candidates is None:
+                for _ in range(SAMPLING_ATTEMPTS):
+                    guess = rng.randrange(len(masks))
+                    if not masks[guess] & blocked:
+                        placement = guess
+                        break
+                else:
+                    candidates = [placement for placement, mask in enumerate(masks) if not mask & blocked]
+            if placement is None:
+                if not candidates:
+                    if not stack:
+                        raise ValueError(f"Ships of lengths {fleet} do not fit on the grid")
+                    candidates, blocked, tried = stack.pop()
+                    chosen.pop()
+                    if candidates is None:
+                        candidates = [
+                            placement
+                            for placement, mask in enumerate(tables.placement_masks[fleet[len(chosen)]])
+                            if not mask & blocked and placement != tried
+                        ]
+                    continue
+                placement = candidates.pop(rng.randrange(len(candidates)))
+            stack.append((candidates, blocked, placement))
+            blocked |= tables.placement_blocking_masks[fleet[len(chosen)]][placement]
+            chosen.append(placement)
+            candidates = None
+        return chosen
 
-    def __get_new_block_for_ship(self, coor: int, direction: int, orientation: int, ship_coordinates: list) -> tuple:
+    @staticmethod
+    def complete_fleet(
+        rng, blocked: int, lengths, rules: Rules = CLASSIC_RULES, max_steps: int = COMPLETION_STEPS
+    ) -> Optional[list]:
         """
-        Checks if new individual blocks that are being added to a ship in the previous method
-                are within the grid, otherwise changes the direction.
+        Places ships of lengths so that they neither overlap nor touch blocked blocks or each other
+        (e.g. the rest of a fleet around ships drawn by hand). The search is a depth-first one over valid
+        placements in random order, longest ships first; ships of the same length are placed in increasing
+        order of placements, so that no set of positions is tried twice. At most max_steps placements
+        are tried, so a grid the ships do not fit on is reported in bounded time.
         Args:
-            coor (int): x or y coordinate to increment/decrement
-            direction (int): 1 or -1
-            orientation (int): 0 or 1
-            ship_coordinates (list): coordinates of unfinished ship
+            rng (Random): random number generator (or the random module)
+            blocked (int): mask of blocks occupied by placed ships and around them
+            lengths (iterable of ints): lengths of ships to place
+            rules (Rules, optional): size of the grid and the fleet. Defaults to CLASSIC_RULES
+            max_steps (int, optional): placements to try at most. Defaults to COMPLETION_STEPS
         Returns:
-            direction (int): straight or reverse
-            incremented/decremented coordinate of the last/first block in a ship under construction (int)
+            list: placement indexes in BitTables.placement_cells, one per ship in the order of lengths,
+                None if the ships do not fit (or no placement was found within max_steps)
         """
-        self.direction = direction
-        self.orientation = orientation
-        if (coor <= 1 - self.offset * (self.orientation - 1) and self.direction == -1) or (
-            coor >= 10 - self.offset * (self.orientation - 1) and self.direction == 1
-        ):
-            self.direction *= -1
-            return self.direction, ship_coordinates[0][self.orientation] + self.direction
-        return self.direction, ship_coordinates[-1][self.orientation] + self.direction
+        tables = get_tables(rules)
+        order = sorted(range(len(lengths)), key=lambda ship: -lengths[ship])
+        lengths = [lengths[ship] for ship in order]
+        free_cells = [sum(lengths[ship:]) for ship in range(len(lengths))]
 
-    def __is_ship_valid(self, new_ship: list) -> bool:
-        """
-        Check if all of a ship's coordinates are within the available blocks set.
-        Args:
-            new_ship (list): list of tuples with a newly created ship's coordinates
-        Returns:
-            bool: True or False
-        """
-        ship = set(new_ship)
-        return ship.issubset(self.available_blocks)
+        def candidates(ship: int, blocked: int, previous: int) -> list:
+            # Ships left cannot fit on fewer free blocks than they have
+            if bin(tables.full_mask & ~blocked).count("1") < free_cells[ship]:
+                return []
+            first = previous + 1 if ship and lengths[ship] == lengths[ship - 1] else 0
+            masks = tables.placement_masks[lengths[ship]]
+            found = [placement for placement in range(first, len(masks)) if not masks[placement] & blocked]
+            rng.shuffle(found)
+            return found
 
-    def __add_new_ship_to_set(self, new_ship: list) -> None:
-        """
-        Adds all blocks in a ship's list to the ships_set
-        Args:
-            new_ship (list): list of tuples with a newly created ship's coordinates
-        """
-        self.ships_set.update(new_ship)
+        if not lengths:
+            return []
+        chosen = []
+        # For every ship being placed: its remaining candidates and the blocked mask before it
+        stack = [(candidates(0, blocked, -1), blocked)]
+        for _ in range(max_steps):
+            ship_candidates, before = stack[-1]
+            if not ship_candidates:
+                stack.pop()
+                if not stack:
+                    return None
+                chosen.pop()
+                continue
+            placement = ship_candidates.pop()
+            chosen.append(placement)
+            if len(chosen) == len(lengths):
+                placements = [0] * len(lengths)
+                for ship, placement in zip(order, chosen):
+                    placements[ship] = placement
+                return placements
+            after = before | tables.placement_blocking_masks[lengths[len(chosen) - 1]][placement]
+            stack.append((candidates(len(chosen), after, placement), after))
+        return None
 
-    def __update_available_blocks_for_creating_ships(self, new_ship: list) -> None:
+    @classmethod
+    def generate_many(
+        cls, n: int, offset: int = 0, rng: Optional[Random] = None, corpus=None, rules: Rules = CLASSIC_RULES
+    ) -> list:
         """
-        Removes all blocks occupied by a ship and around it from the available blocks set
+        Creates n fleets at once (for simulations)
         Args:
-            new_ship ([type]): list of tuples with a newly created ship's coordinates
+            n (int): number of fleets
+            offset (int): Where the grid starts (in number of blocks)
+            rng (Random, optional): random number generator shared by all fleets
+            corpus (FleetCorpus, optional): pre-generated fleets to draw from
+            rules (Rules, optional): size of the grid and the fleet
+        Returns:
+            list: n AutoShips
         """
-        for elem in new_ship:
-            for k in range(-1, 2):
-                for m in range(-1, 2):
-                    if self.offset < (elem[0] + k) < 11 + self.offset and 0 < (elem[1] + m) < 11:
-                        self.available_blocks.discard((elem[0] + k, elem[1] + m))
+        return [cls(offset, rng, corpus, rules) for _ in range(n)]
 
     def __populate_grid(self) -> list:
         """
-        Creates needed number of each type of ships by calling the create_ship method.
+        Creates all ships from placements chosen by place_fleet.
                 Adds every ship to the ships list, ships_set and updates the available blocks.
         Returns:
             list: the 2d list of all ships
         """
+        tables = get_tables(self.rules)
         ships_coordinates_list = []
-        for number_of_blocks in range(4, 0, -1):
-            for _ in range(5 - number_of_blocks):
-                new_ship = self.__create_ship(number_of_blocks, self.available_blocks)
-                ships_coordinates_list.append(new_ship)
-                self.__add_new_ship_to_set(new_ship)
-                self.__update_available_blocks_for_creating_ships(new_ship)
+        if self.corpus is not None:
+            placements = self.corpus.random_placements(self.rng)
+        else:
+            placements = self.place_fleet(self.rng, self.rules)
+        for length, placement in zip(self.rules.fleet, placements):
+            new_ship = [
+                index_to_block(index, self.offset, self.rules.grid_size)
+                for index in tables.placement_cells[length][placement]
+            ]
+            ships_coordinates_list.append(new_ship)
+            self.ships_set.update(new_ship)
+            self.blocked |= tables.placement_blocking_masks[length][placement]
         return ships_coordinates_list
@@ -0,0 +1,334 @@
+"""Bitboard representation of a grid: every block of a grid is a single bit of an int."""
+
+import copy
+from typing import Callable, Optional
+
+from elements.constants import GRID_SIZE
+from elements.rules import CLASSIC_RULES, Rules
+
+# Results of a shot
+MISS = 0
+HIT = 1
+SUNK = 2
+
+# Masks of grids with up to this many blocks are stored in lists, masks of larger grids are computed on access
+# (a 100x100 grid has 10000 blocks and 20000 positions of a ship of every length, each a 10000-bit mask)
+TABLE_CELLS_LIMIT = 32 * 32
+
+
+class LazyTable:
+    """
+    Read-only sequence whose items are computed on access instead of being stored
+    """
+
+    def __init__(self, length: int, item: Callable) -> None:
+        self.__length = length
+        self.__item = item
+
+    def __len__(self) -> int:
+        return self.__length
+
+    def __getitem__(self, index: int):
+        if index < 0:
+            index += self.__length
+        if not 0 <= index < self.__length:
+            raise IndexError(index)
+        return self.__item(index)
+
+
+class BitTables:
+    """
+    Masks of blocks around every cell and of every position of every ship on a grid of some rules
+    ----------
+    Attributes:
+        grid_size (int): number of blocks along each side of a grid
+        cells (int): number of blocks in a grid
+        full_mask (int): all blocks of a grid
+        around_masks, diagonal_masks, cross_masks (sequences of ints): all-around (8 neighbours),
+            diagonal and cross (orthogonal) neighbours of every cell
+        placement_cells (dict): ship length -> cell indexes of every position of such a ship on an empty grid
+            (horizontal ships first, row by row, then vertical ones)
+        placement_masks (dict): ship length -> mask of every position of such a ship
+        placement_blocking_masks (dict): ship length -> mask of every position of such a ship and all blocks
+            around it (no other ship can be placed on them once this one is)
+    ----------
+    Methods:
+        halo_mask(ship_mask): Returns all blocks around a ship
+        placement_index(cells): Returns the index of a ship's position in placement_cells
+    """
+
+    def __init__(self, rules: Rules) -> None:
+        self.grid_size = rules.grid_size
+        self.cells = rules.cells
+        self.full_mask = (1 << self.cells) - 1
+        self.around_masks = self.__table(self.cells, self.__around_mask)
+        self.diagonal_masks = self.__table(self.cells, self.__diagonal_mask)
+        self.cross_masks = self.__table(self.cells, self.__cross_mask)
+        self.placement_cells = {}
+        self.placement_masks = {}
+        self.placement_blocking_masks = {}
+        for length in rules.ship_lengths:
+            count = self.__placement_count(length)
+            self.placement_cells[length] = self.__table(count, lambda p, length=length: self.__cells(length, p))
+            self.placement_masks[length] = self.__table(count, lambda p, length=length: self.__mask(length, p))
+            self.placement_blocking_masks[length] = self.__table(
+                count, lambda p, length=length: self.__blocking_mask(length, p)
+            )
+
+    def halo_mask(self, ship_mask: int) -> int:
+        """
+        Returns all blocks around a ship (not including the ship itself).
+        """
+        halo = 0
+        mask = ship_mask
+        while mask:
+            lowest = mask & -mask
+            halo |= self.around_masks[lowest.bit_length() - 1]
+            mask ^= lowest
+        return halo & ~ship_mask
+
+    def placement_index(self, cells) -> int:
+        """
+        Returns the index of a ship's position in placement_cells (of its length) given its cell indexes.
+        Raises ValueError if the cells are not a straight line of consecutive blocks.
+        """
+        cells = tuple(sorted(cells))
+        length = len(cells)
+        row, col = divmod(cells[0], self.grid_size)
+        if length == 1 or cells[1] - cells[0] == 1:
+            placement = row * (self.grid_size - length + 1) + col
+        else:
+            placement = self.grid_size * (self.grid_size - length + 1) + row * self.grid_size + col
+        if length not in self.placement_cells or not 0 <= placement < len(self.placement_cells[length]):
+            raise ValueError(f"No ship of length {length} in these rules")
+        if self.placement_cells[length][placement] != cells:
+            raise ValueError(f"Cells {cells} are not a ship")
+        return placement
+
+    def __table(self, length: int, item: Callable):
+        """
+        Returns a list of items for small grids and a LazyTable for large ones
+        """
+        if self.cells <= TABLE_CELLS_LIMIT:
+            return [item(index) for index in range(length)]
+        return LazyTable(length, item)
+
+    def __rect_mask(self, first_row: int, last_row: int, first_col: int, last_col: int) -> int:
+        """
+        Returns the mask of a rectangle of blocks, clipped to the grid
+        """
+        first_row, first_col = max(first_row, 0), max(first_col, 0)
+        last_row, last_col = min(last_row, self.grid_size - 1), min(last_col, self.grid_size - 1)
+        row_mask = (1 << (last_col - first_col + 1)) - 1
+        mask = 0
+        for row in range(first_row, last_row + 1):
+            mask |= row_mask << (row * self.grid_size + first_col)
+        return mask
+
+    def __around_mask(self, index: int) -> int:
+        row, col = divmod(index, self.grid_size)
+        return self.__rect_mask(row - 1, row + 1, col - 1, col + 1) & ~(1 << index)
+
+    def __diagonal_mask(self, index: int) -> int:
+        return self.__around_mask(index) & ~self.__cross_mask(index)
+
+    def __cross_mask(self, index: int) -> int:
+        row, col = divmod(index, self.grid_size)
+        return (self.__rect_mask(row - 1, row + 1, col, col) | self.__rect_mask(row, row, col - 1, col + 1)) & ~(
+            1 << index
+        )
+
+    def __placement_count(self, length: int) -> int:
+        horizontal = self.grid_size * (self.grid_size - length + 1)
+        return 2 * horizontal if length > 1 else horizontal
+
+    def __start(self, length: int, placement: int) -> tuple:
+        """
+        Returns the row and the column of the first block of a ship's position and whether it is vertical
+        """
+        horizontal = self.grid_size * (self.grid_size - length + 1)
+        if placement < horizontal:
+            row, col = divmod(placement, self.grid_size - length + 1)
+            return row, col, False
+        row, col = divmod(placement - horizontal, self.grid_size)
+        return row, col, True
+
+    def __cells(self, length: int, placement: int) -> tuple:
+        row, col, vertical = self.__start(length, placement)
+        start = row * self.grid_size + col
+        step = self.grid_size if vertical else 1
+        return tuple(range(start, start + length * step, step))
+
+    def __mask(self, length: int, placement: int) -> int:
+        row, col, vertical = self.__start(length, placement)
+        if vertical:
+            return self.__rect_mask(row, row + length - 1, col, col)
+        return self.__rect_mask(row, row, col, col + length - 1)
+
+    def __blocking_mask(self, length: int, placement: int) -> int:
+        row, col, vertical = self.__start(length, placement)
+        if vertical:
+            return self.__rect_mask(row - 1, row + length, col - 1, col + 1)
+        return self.__rect_mask(row - 1, row + 1, col - 1, col + length)
+
+
+# Tables are built once per rules
+_tables = {}
+
+
+def get_tables(rules: Rules) -> BitTables:
+    """
+    Returns masks of a grid of rules, building them on the first call
+    """
+    tables = _tables.get(rules)
+    if tables is None:
+        tables = _tables[rules] = BitTables(rules)
+    return tables
+
+
+def block_to_index(block: tuple, offset: int, grid_size: int = GRID_SIZE) -> int:
+    """
+    Converts (x, y) coordinates of a block on a grid starting at offset to a cell index (0-99 on a 10x10 grid).
+    """
+    return (block[1] - 1) * grid_size + block[0] - offset - 1
+
+
+def index_to_block(index: int, offset: int, grid_size: int = GRID_SIZE) -> tuple:
+    """
+    Converts a cell index (0-99 on a 10x10 grid) to (x, y) coordinates of a block on a grid starting at offset.
+    """
+    row, col = divmod(index, grid_size)
+    return col + offset + 1, row + 1
+
+
+def blocks_to_mask(blocks, offset: int, grid_size: int = GRID_SIZE) -> int:
+    """
+    Packs an iterable of (x, y) blocks into a bitmask.
+    """
+    mask = 0
+    for block in blocks:
+        mask |= 1 << block_to_index(block, offset, grid_size)
+    return mask
+
+
+def mask_to_blocks(mask: int, offset: int, grid_size: int = GRID_SIZE) -> list:
+    """
+    Unpacks a bitmask into a list of (x, y) blocks.
+    """
+    blocks = []
+    while mask:
+        lowest = mask & -mask
+        blocks.append(index_to_block(lowest.bit_length() - 1, offset, grid_size))
+        mask ^= lowest
+    return blocks
+
+
+class BitBoard:
+    """
+    One player's grid stored as integer bitmasks
+    ----------
+    Attributes:
+        offset (int): Where the grid starts (in number of blocks)
+                (typically 0 for computer and 15 for human)
+        rules (Rules): size of the grid and the fleet
+        tables (BitTables): masks of the grid
+        ship_masks (list of ints): a mask for every individual ship
+        ship_halos (list of ints): blocks around every individual ship
+        cell_ships (dict): cell index -> index of the ship that occupies it
+        ship_blocks_left (list of ints): number of blocks of every individual ship that are not hit yet
+        ships (int): all blocks occupied by ships
+        hits (int): blocks with ships that were hit
+        misses (int): blocks that were shot at but had no ship
+        dotted (int): blocks that are known to be empty (misses and blocks around hits)
+        available (int): blocks that are still worth shooting at
+    ----------
+    Methods:
+        fire(index): Resolves a shot at a cell and returns MISS, HIT or SUNK
+        ship_at(index): Returns the index of a ship that occupies a cell
+        snapshot(): Returns the shots on the board in constant time
+        restore(snapshot): Returns the board to a snapshot
+        fork(): Returns an independent copy of the board for look-ahead
+    """
+
+    def __init__(self, ships: list, offset: int, rules: Rules = CLASSIC_RULES) -> None:
+        self.offset = offset
+        self.rules = rules
+        self.tables = get_tables(rules)
+        self.ship_masks = [blocks_to_mask(ship, offset, rules.grid_size) for ship in ships]
+        self.ship_halos = [self.tables.halo_mask(ship_mask) for ship_mask in self.ship_masks]
+        self.ships = 0
+        for ship_mask in self.ship_masks:
+            self.ships |= ship_mask
+        self.cell_ships = {
+            block_to_index(block, offset, rules.grid_size): ind for ind, ship in enumerate(ships) for block in ship
+        }
+        self.ship_blocks_left = [len(ship) for ship in ships]
+        self.hits = 0
+        self.misses = 0
+        self.dotted = 0
+        self.available = self.tables.full_mask
+
+    def ship_at(self, index: int) -> int:
+        """
+        Returns the index of a ship that occupies a cell, -1 if there is no ship
+        """
+        return self.cell_ships.get(index, -1)
+
+    def snapshot(self) -> tuple:
+        """
+        Returns the shots on the board in constant time: masks are immutable ints, so they are shared, not copied
+        """
+        return self.hits, self.misses, self.dotted, self.available
+
+    def restore(self, snapshot: Optional[tuple] = None) -> None:
+        """
+        Returns the board to a snapshot (to no shots at all if it is None)
+        """
+        if snapshot is None:
+            snapshot = (0, 0, 0, self.tables.full_mask)
+        self.hits, self.misses, self.dotted, self.available = snapshot
+        self.ship_blocks_left = [bin(ship_mask & ~self.hits).count("1") for ship_mask in self.ship_masks]
+
+    def fork(self) -> "BitBoard":
+        """
+        Returns a board with the same ships and shots that can be fired at without changing this one
+        (masks of the ships are shared, only the counters of blocks left are copied)
+        """
+        board = copy.copy(self)
+        board.ship_blocks_left = list(self.ship_blocks_left)
+        return board
+
+    def fire(self, index: int) -> int:
+        """
+        Resolves a shot at a cell: marks a hit (with dots on its diagonals) or a miss,
+        and dots all blocks around a ship once it is destroyed.
+        Args:
+            index (int): cell index (0-99 on a 10x10 grid)
+        Returns:
+            int: MISS, HIT or SUNK
+        """
+        bit = 1 << index
+        self.available &= ~bit
+        if not self.ships & bit & ~self.hits:
+            if not self.hits & bit:
+                self.misses |= bit
+                self.dotted |= bit
+            return MISS
+        self.hits |= bit
+        self.dotted |= self.tables.diagonal_masks[index]
+        result = HIT
+        ind = self.cell_ships[index]
+        self.ship_blocks_left[ind] -= 1
+        if not self.ship_blocks_left[ind]:
+            self.dotted |= self.ship_halos[ind]
+            result = SUNK
+        self.dotted &= ~self.hits
+        self.available &= ~self.dotted
+        return result
+
+    @property
+    def all_sunk(self) -> bool:
+        """
+        True if every ship on the board is destroyed
+        """
+        return not self.ships & ~self.hits
@@ -13,7 +13,13 @@ LEFT_MARGIN = 5 * BLOCK_SIZE
 UPPER_MARGIN = 2 * BLOCK_SIZE
 # 30 = 2x10 blocks width in two grids + hard-coded 5*blocks gap after each grid!
 SIZE = (LEFT_MARGIN + 30 * BLOCK_SIZE, UPPER_MARGIN + 15 * BLOCK_SIZE)
-LETTERS = "ABCDEFGHIJ"
+# Maximum frames per second (while computer shoots or the mouse moves; idle loops wait for events)
+FPS = 60
+# Classic rules (see elements.rules for other sizes of grids and fleets):
+# number of blocks along each side of a grid
+GRID_SIZE = 10
+# Lengths of all ships in a fleet (one 4-block, two 3-block, three 2-block and four 1-block ships)
+FLEET = (4, 3, 3, 2, 2, 2, 1, 1, 1, 1)
 
 # This ratio is purely for scaling the font according to the block size
 FONT_SIZE = int(BLOCK_SIZE / 1.5)
@@ -25,8 +31,11 @@ AUTO_BUTTON_PLACE = LEFT_MARGIN + 17 * BLOCK_SIZE
 MANUAL_BUTTON_PLACE = LEFT_MARGIN + 20 * BLOCK_SIZE
 HOW_TO_CREATE_SHIPS_MESSAGE = "How do you want to create your ships? Click the button"
 UNDO_BUTTON_PLACE = LEFT_MARGIN + 19 * BLOCK_SIZE
+AUTO_COMPLETE_BUTTON_PLACE = LEFT_MARGIN + 13 * BLOCK_SIZE
 PLAY_AGAIN_MESSAGE = "Do you want to play again or quit?"
 PLAY_AGAIN_BUTTON_PLACE = LEFT_MARGIN + 15 * BLOCK_SIZE
+# Right of the message about computer's last shot
+TAKE_BACK_BUTTON_PLACE = LEFT_MARGIN + 25 * BLOCK_SIZE + BLOCK_SIZE // 5
 
 # Rectangular areas for grids, messages, buttons and ship counts
 RECT_FOR_GRIDS = (0, 0, SIZE[0], UPPER_MARGIN + 12 * BLOCK_SIZE)
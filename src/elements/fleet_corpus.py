@@ -0,0 +1,176 @@
+"""
+Corpus of pre-generated fleets in a compact fixed-width binary file.
+The header holds the grid size and the fleet. Every fleet is one record with the index of every ship's
+placement in BitTables.placement_cells (in the fleet's order), so a fleet is stored independently
+of the grid's offset. Indexes take one byte per ship (two on grids with more positions of a ship).
+Write a corpus from the src directory: python -m elements.fleet_corpus fleets.bin --count 10000000
+"""
+
+import argparse
+import mmap
+import struct
+import time
+from multiprocessing import Pool
+from random import Random
+from typing import Optional
+
+from elements.autoships import AutoShips
+from elements.bitboard import block_to_index, get_tables, index_to_block
+from elements.constants import GRID_SIZE
+from elements.rules import CLASSIC_RULES, Rules
+
+MAGIC = b"BSFLEET1"
+# Fleets generated per task when writing a corpus
+BATCH_SIZE = 100_000
+
+
+def header(rules: Rules) -> bytes:
+    """
+    Returns the header of a corpus of fleets of rules
+    """
+    if len(rules.fleet) > 255:
+        raise ValueError(f"A corpus can not store fleets of more than 255 ships, not {len(rules.fleet)}")
+    return MAGIC + bytes((rules.grid_size, len(rules.fleet))) + bytes(rules.fleet)
+
+
+def record_format(rules: Rules) -> struct.Struct:
+    """
+    Returns the format of a record: one byte per ship if every placement index fits in it, two otherwise
+    """
+    max_placements = max(len(masks) for masks in get_tables(rules).placement_masks.values())
+    return struct.Struct(f"<{len(rules.fleet)}{'B' if max_placements <= 256 else 'H'}")
+
+
+def pack_fleet(placements: list, rules: Rules = CLASSIC_RULES) -> bytes:
+    """
+    Packs placement indexes of a fleet (as returned by AutoShips.place_fleet) into a record
+    """
+    return record_format(rules).pack(*placements)
+
+
+def unpack_fleet(placements, offset: int, rules: Rules = CLASSIC_RULES) -> list:
+    """
+    Turns placement indexes of a fleet into a list of ships (lists of blocks) on a grid starting at offset
+    """
+    placement_cells = get_tables(rules).placement_cells
+    return [
+        [index_to_block(index, offset, rules.grid_size) for index in placement_cells[length][placement]]
+        for length, placement in zip(rules.fleet, placements)
+    ]
+
+
+def fleet_placements(ships: list, offset: int, rules: Rules = CLASSIC_RULES) -> list:
+    """
+    Turns a fleet (a list of ships on a grid starting at offset, in any order) into placement indexes
+    in the fleet's order (longest ships first), the reverse of unpack_fleet
+    """
+    ships = sorted(ships, key=len, reverse=True)
+    if tuple(len(ship) for ship in ships) != rules.fleet:
+        raise ValueError(f"Ships of lengths {[len(ship) for ship in ships]} are not a fleet of {rules}")
+    tables = get_tables(rules)
+    return [tables.placement_index(block_to_index(block, offset, rules.grid_size) for block in ship) for ship in ships]
+
+
+def generate_batch(args: tuple) -> bytes:
+    """
+    Generates a batch of packed fleets.
+    Args:
+        args (tuple): seed of the batch (str), number of fleets and grid size (the fleet is scaled to it)
+    Returns:
+        bytes: concatenated records
+    """
+    seed, count, grid_size = args
+    rules = Rules.scaled(grid_size)
+    pack = record_format(rules).pack
+    rng = Random(seed)
+    batch = bytearray()
+    for _ in range(count):
+        batch += pack(*AutoShips.place_fleet(rng, rules))
+    return bytes(batch)
+
+
+def write_corpus(
+    path: str, count: int, seed: int = 0, workers: Optional[int] = None, grid_size: int = GRID_SIZE
+) -> None:
+    """
+    Writes count fleets to a corpus file. Batches are generated in a process pool
+    but written in order, so the same seed always gives the same file.
+    Fleets are placed on a grid of grid_size with the classic fleet scaled to it (see Rules.scaled).
+    """
+    batches = [
+        (f"{seed}:{batch}", min(BATCH_SIZE, count - batch * BATCH_SIZE), grid_size)
+        for batch in range((count + BATCH_SIZE - 1) // BATCH_SIZE)
+    ]
+    with open(path, "wb") as corpus_file, Pool(workers) as pool:
+        corpus_file.write(header(Rules.scaled(grid_size)))
+        for records in pool.imap(generate_batch, batches):
+            corpus_file.write(records)
+
+
+class FleetCorpus:
+    """
+    Read-only memory-mapped corpus of fleets
+    ----------
+    Attributes:
+        path (str): corpus file
+        rules (Rules): size of the grid and the fleet (read from the header)
+    ----------
+    Methods:
+        placements(number): Placement indexes of a fleet
+        fleet(number, offset): List of ships of a fleet on a grid starting at offset
+        random_placements(rng): Placement indexes of a random fleet
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as corpus_file:
+            self.__map = mmap.mmap(corpus_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.__map[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a corpus of fleets")
+        grid_size, ships = self.__map[len(MAGIC) : len(MAGIC) + 2]
+        self.rules = Rules(grid_size, tuple(self.__map[len(MAGIC) + 2 : len(MAGIC) + 2 + ships]))
+        self.__start = len(header(self.rules))
+        self.__record = record_format(self.rules)
+        self.__count = (len(self.__map) - self.__start) // self.__record.size
+
+    def __len__(self) -> int:
+        return self.__count
+
+    def placements(self, number: int) -> tuple:
+        """
+        Returns placement indexes of a fleet number (one per ship in the fleet's order)
+        """
+        return self.__record.unpack_from(self.__map, self.__start + number * self.__record.size)
+
+    def fleet(self, number: int, offset: int) -> list:
+        """
+        Returns a fleet number as a list of ships on a grid starting at offset
+        """
+        return unpack_fleet(self.placements(number), offset, self.rules)
+
+    def random_placements(self, rng) -> tuple:
+        """
+        Returns placement indexes of a random fleet
+        """
+        return self.placements(rng.randrange(self.__count))
+
+    def close(self) -> None:
+        self.__map.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Writes a corpus of pre-generated fleets")
+    parser.add_argument("path")
+    parser.add_argument("--count", type=int, default=10_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="number of processes (default: all cores)")
+    parser.add_argument("--grid-size", type=int, default=GRID_SIZE, help="with the classic fleet scaled to it")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    write_corpus(args.path, args.count, args.seed, args.workers, args.grid_size)
+    print(f"{args.count} fleets written to {args.path} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Compact binary recordings of games. A recording file starts with MAGIC and holds any number of games
+appended one after another, each of them:
+- the grid size (one byte, the fleet is the classic one scaled to it, see Rules.scaled), which players are humans
+  (one byte, HUMAN_PLAYERS bits) and the seed of the game
+- fleets of the first and of the second player as fleet_corpus records
+- one byte per shot (two on grids of more than 254 blocks): the index of the block shot at on the opponent's grid.
+  Who shoots is not stored: the first player starts and a player keeps shooting after every hit
+- the end marker (all ones) and the winner (0 or 1, UNFINISHED if the game was not played to the end)
+A classic game takes about 150 bytes. Recordings of the first version (OLD_MAGIC) do not say which players are humans.
+"""
+
+import os
+import struct
+from typing import Iterator, Optional
+
+from elements.fleet_corpus import pack_fleet, record_format
+from elements.rules import CLASSIC_RULES, Rules
+
+MAGIC = b"BSGAMES2"
+OLD_MAGIC = b"BSGAMES1"
+# Bits of the players who are humans (the rest are computer strategies)
+HUMAN_PLAYERS = (1, 2)
+UNFINISHED = 255
+SEED_FORMAT = struct.Struct("<Q")
+# Bytes buffered in memory before they are appended to a recording file
+RECORD_BUFFER_SIZE = 64 * 1024
+
+
+def shot_format(rules: Rules) -> struct.Struct:
+    """
+    Returns the format of a shot: one byte if every block index and the end marker fit in it, two otherwise
+    """
+    return struct.Struct("<B" if rules.cells < 0xFF else "<H")
+
+
+def end_marker(rules: Rules) -> bytes:
+    return b"\xff" * shot_format(rules).size
+
+
+def pack_game_start(rules: Rules, seed: int, placements: tuple, humans: tuple = ()) -> bytes:
+    """
+    Packs everything a game starts with: its grid size, players who are humans, seed and fleets
+    Args:
+        rules (Rules): size of the grid and the fleet (must be Rules.scaled(rules.grid_size))
+        seed (int): seed of the game (0 to 2**64 - 1)
+        placements (tuple): placement indexes of the first and of the second player's fleets
+        humans (tuple, optional): players (0 or 1) who are humans. Defaults to () (computer against computer).
+    """
+    if rules != Rules.scaled(rules.grid_size):
+        raise ValueError(f"Only fleets scaled from the classic one can be recorded, not {rules}")
+    first, second = placements
+    human_bits = sum(HUMAN_PLAYERS[player] for player in set(humans))
+    return (
+        bytes((rules.grid_size, human_bits))
+        + SEED_FORMAT.pack(seed)
+        + pack_fleet(first, rules)
+        + pack_fleet(second, rules)
+    )
+
+
+def pack_game_end(rules: Rules, winner: Optional[int]) -> bytes:
+    """
+    Packs the end of a game: the end marker and the winner (None if the game was not finished)
+    """
+    return end_marker(rules) + bytes((UNFINISHED if winner is None else winner,))
+
+
+class RecordedGame:
+    """
+    One game read from a recording
+    ----------
+    Attributes:
+        rules (Rules): size of the grids and the fleet
+        seed (int): seed of the game
+        placements (tuple): placement indexes of the first and of the second player's fleets
+        shots (list of ints): indexes of blocks shot at on the opponent's grid, in order
+        winner (int): 0 or 1, UNFINISHED if the game was not played to the end
+        humans (tuple of ints): players who are humans, None if the recording does not say (OLD_MAGIC)
+    """
+
+    def __init__(
+        self, rules: Rules, seed: int, placements: tuple, shots: list, winner: int, humans: Optional[tuple] = ()
+    ) -> None:
+        self.rules = rules
+        self.seed = seed
+        self.placements = placements
+        self.shots = shots
+        self.winner = winner
+        self.humans = humans
+
+
+def read_games(path: str) -> Iterator[RecordedGame]:
+    """
+    Reads games from a recording file one by one.
+    Raises ValueError if the file is not a recording or its last game is cut off.
+    """
+    with open(path, "rb") as record_file:
+        data = record_file.read()
+    if not data.startswith((MAGIC, OLD_MAGIC)):
+        raise ValueError(f"{path} is not a recording of games")
+    old = data.startswith(OLD_MAGIC)
+    position = len(MAGIC)
+    while position < len(data):
+        try:
+            rules = Rules.scaled(data[position])
+            humans = None
+            if not old:
+                position += 1
+                humans = tuple(player for player, bit in enumerate(HUMAN_PLAYERS) if data[position] & bit)
+            seed = SEED_FORMAT.unpack_from(data, position + 1)[0]
+            fleet = record_format(rules)
+            position += 1 + SEED_FORMAT.size
+            placements = (fleet.unpack_from(data, position), fleet.unpack_from(data, position + fleet.size))
+            position += 2 * fleet.size
+        except (ValueError, IndexError, struct.error) as error:
+            raise ValueError(f"{path} has a broken game at byte {position}: {error}") from None
+        shot, end = shot_format(rules), end_marker(rules)
+        shots_end = data.find(end, position)
+        # A two-byte marker can start in the middle of a shot
+        while shots_end >= 0 and (shots_end - position) % shot.size:
+            shots_end = data.find(end, shots_end + 1)
+        if shots_end < 0 or shots_end + len(end) >= len(data):
+            raise ValueError(f"{path} ends in the middle of a game")
+        shots = [value for (value,) in shot.iter_unpack(data[position:shots_end])]
+        position = shots_end + len(end) + 1
+        yield RecordedGame(rules, seed, placements, shots, data[position - 1], humans)
+
+
+class GameRecorder:
+    """
+    Appends games to a recording file through a memory buffer, so that recording a shot
+    never waits for the disk (the buffer is written out once it holds RECORD_BUFFER_SIZE bytes and on close).
+    The game being recorded is kept apart until it ends, so that its last shots can be taken back
+    ----------
+    Attributes:
+        path (str): recording file
+        games (int): number of games recorded by this recorder
+    ----------
+    Methods:
+        start_game(seed, placements, rules, humans): Starts recording a game
+        add_shot(index): Records a shot of the game being recorded
+        take_back(shots): Removes the last shots of the game being recorded
+        end_game(winner): Finishes the game being recorded
+        add_games(data): Appends packed games (e.g. recorded in another process)
+        flush(): Writes out the buffer
+        close(): Writes out the buffer and closes the file
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.games = 0
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not new_file:
+            with open(path, "rb") as record_file:
+                if record_file.read(len(MAGIC)) != MAGIC:
+                    raise ValueError(f"{path} is not a recording of this version, games cannot be appended to it")
+        self.__file = open(path, "ab", buffering=RECORD_BUFFER_SIZE)
+        if new_file:
+            self.__file.write(MAGIC)
+        self.__rules = None
+        self.__pack_shot = None
+        self.__game = bytearray()
+        self.__game_start = 0
+
+    def start_game(self, seed: int, placements: tuple, rules: Rules = CLASSIC_RULES, humans: tuple = ()) -> None:
+        """
+        Starts recording a game (a game that was started but not ended is recorded as unfinished)
+        Args:
+            seed (int): seed of the game
+            placements (tuple): placement indexes of the first and of the second player's fleets
+            rules (Rules, optional): size of the grids and the fleet. Defaults to CLASSIC_RULES.
+            humans (tuple, optional): players (0 or 1) who are humans. Defaults to ().
+        """
+        if self.__rules is not None:
+            self.end_game(None)
+        self.__game[:] = pack_game_start(rules, seed, placements, humans)
+        self.__game_start = len(self.__game)
+        self.__rules = rules
+        self.__pack_shot = shot_format(rules).pack
+
+    def add_shot(self, index: int) -> None:
+        self.__game += self.__pack_shot(index)
+
+    def take_back(self, shots: int) -> None:
+        """
+        Removes the last shots of the game being recorded (e.g. moves taken back by human)
+        """
+        end = max(self.__game_start, len(self.__game) - shots * shot_format(self.__rules).size)
+        del self.__game[end:]
+
+    def end_game(self, winner: Optional[int]) -> None:
+        """
+        Finishes the game being recorded
+        Args:
+            winner (int): 0 or 1, None if the game was not played to the end
+        """
+        if self.__rules is None:
+            return
+        self.__game += pack_game_end(self.__rules, winner)
+        self.__file.write(self.__game)
+        self.__game.clear()
+        self.__rules = None
+        self.games += 1
+
+    def add_games(self, data: bytes) -> None:
+        """
+        Appends packed games (each one pack_game_start + shots + pack_game_end)
+        """
+        self.__file.write(data)
+
+    def flush(self) -> None:
+        self.__file.flush()
+
+    def close(self) -> None:
+        if not self.__file.closed:
+            self.end_game(None)
+            self.__file.close()
@@ -0,0 +1,174 @@
+"""Stores everything that changes during one game."""
+
+from copy import copy
+from random import Random
+from typing import Optional
+
+from elements.bitboard import get_tables, index_to_block, mask_to_blocks
+from elements.indexed_set import IndexedSet
+from elements.rules import CLASSIC_RULES, Rules
+
+
+class GameSnapshot:
+    """
+    Everything a game's state can be restored from, taken in constant time: snapshots of bitboards
+    share their immutable masks with the state and computer's memory of its last hits holds a few blocks
+    ----------
+    Attributes:
+        boards (dict): snapshots of the bitboards, keyed as GameState.boards (see BitBoard.snapshot)
+        last_hits (tuple of tuples): computer's hits in a ship that is not destroyed yet
+        around_last_hit (frozenset of tuples): blocks around computer's last hit to shoot from first
+        rng_state (tuple): state of the game's random number generator (of a fixed size)
+    """
+
+    def __init__(self, boards: dict, last_hits: tuple, around_last_hit: frozenset, rng_state: tuple) -> None:
+        self.boards = boards
+        self.last_hits = last_hits
+        self.around_last_hit = around_last_hit
+        self.rng_state = rng_state
+
+
+class GameState:
+    """
+    State of a single game, so that many independent games can live in one process
+    ----------
+    Attributes:
+        rules (Rules): size of the grids and the fleet
+        rng (Random): random number generator used by computer's shots (and by fleets created for this game)
+        computer_available_to_fire_set (IndexedSet of tuples): blocks computer can still shoot at
+        around_last_computer_hit_set (set of tuples): blocks around computer's last hit to shoot from first
+        dotted_set_for_computer_not_to_shoot (set of tuples): dotted blocks computer should not shoot at
+        hit_blocks_for_computer_not_to_shoot (set of tuples): hit blocks computer should not shoot at
+        last_hits_list (list of tuples): computer's hits in a ship that is not destroyed yet
+        hit_blocks (set of tuples): blocks with 'X's on both grids
+        dotted_set (set of tuples): blocks with dots on both grids
+        destroyed_computer_ships (list of lists): computer's ships to draw (they are hidden until destroyed)
+        blocks_to_draw (list of tuples): blocks that got a dot or an 'X' since they were last drawn
+        human_destroyed_ships_count (dict): numbers of destroyed human ships by length and in total ("#")
+        computer_destroyed_ships_count (dict): numbers of destroyed computer ships by length and in total ("#")
+        boards (dict): bitboards of both grids, keyed by computer_turn (True - human grid, False - computer grid)
+        heat_map (HeatMap): placement counts of human ships used by ai.heatmap (created on its first shot)
+    ----------
+    Methods:
+        snapshot(): Returns a GameSnapshot of the game in constant time
+        restore(snapshot): Returns the game to a snapshot
+        fork(): Returns an independent copy of the game
+        adopt(fork): Takes over what a strategy changed while choosing a move on a fork
+    """
+
+    def __init__(self, seed: Optional[int] = None, rules: Rules = CLASSIC_RULES) -> None:
+        """
+        Parameters:
+        seed (int, optional): seed for the game's random number generator. Defaults to None (random seed).
+        rules (Rules, optional): size of the grids and the fleet. Defaults to CLASSIC_RULES.
+        """
+        self.seed = seed
+        self.rules = rules
+        self.rng = Random(seed)
+        # ---COMPUTER DATA-----
+        human_offset = rules.human_offset
+        self.computer_available_to_fire_set = IndexedSet(
+            (x, y)
+            for x in range(human_offset + 1, human_offset + rules.grid_size + 1)
+            for y in range(1, rules.grid_size + 1)
+        )
+        self.around_last_computer_hit_set = set()
+        self.dotted_set_for_computer_not_to_shoot = set()
+        self.hit_blocks_for_computer_not_to_shoot = set()
+        self.last_hits_list = []
+        # --------------------
+        self.hit_blocks = set()
+        self.dotted_set = set()
+        self.destroyed_computer_ships = []
+        self.blocks_to_draw = []
+        self.human_destroyed_ships_count = rules.new_destroyed_ships_count()
+        self.computer_destroyed_ships_count = rules.new_destroyed_ships_count()
+        self.boards = {}
+        self.heat_map = None
+
+    def snapshot(self) -> GameSnapshot:
+        """
+        Returns a snapshot of the game, e.g. to take back moves. Everything else is derived from it on restore.
+        """
+        return GameSnapshot(
+            {key: board.snapshot() for key, board in self.boards.items()},
+            tuple(self.last_hits_list),
+            frozenset(self.around_last_computer_hit_set),
+            self.rng.getstate(),
+        )
+
+    def restore(self, snapshot: GameSnapshot) -> None:
+        """
+        Returns the game to a snapshot: restores the bitboards and rebuilds the sets of blocks,
+        destroyed ships and their counters from them (in time proportional to the number of blocks).
+        Every block has to be drawn again afterwards.
+        """
+        rules = self.rules
+        self.rng.setstate(snapshot.rng_state)
+        self.last_hits_list = list(snapshot.last_hits)
+        self.around_last_computer_hit_set = set(snapshot.around_last_hit)
+        self.hit_blocks = set()
+        self.dotted_set = set()
+        self.destroyed_computer_ships = []
+        self.blocks_to_draw = []
+        self.human_destroyed_ships_count = rules.new_destroyed_ships_count()
+        self.computer_destroyed_ships_count = rules.new_destroyed_ships_count()
+        # Built again from the bitboard on the next shot
+        self.heat_map = None
+        for computer_turn, board in self.boards.items():
+            board.restore(snapshot.boards.get(computer_turn))
+            self.hit_blocks.update(mask_to_blocks(board.hits, board.offset, rules.grid_size))
+            self.dotted_set.update(mask_to_blocks(board.dotted, board.offset, rules.grid_size))
+            count_dict = self.human_destroyed_ships_count if computer_turn else self.computer_destroyed_ships_count
+            for ship_mask, blocks_left in zip(board.ship_masks, board.ship_blocks_left):
+                if blocks_left:
+                    continue
+                ship_length = bin(ship_mask).count("1")
+                count_dict[ship_length] += 1
+                count_dict["#"] += 1
+                if not computer_turn:
+                    self.destroyed_computer_ships.append(mask_to_blocks(ship_mask, board.offset, rules.grid_size))
+        human_board = self.boards.get(True)
+        available = get_tables(rules).full_mask if human_board is None else human_board.available
+        self.computer_available_to_fire_set = IndexedSet(
+            index_to_block(index, rules.human_offset, rules.grid_size)
+            for index in range(rules.cells)
+            if available >> index & 1
+        )
+        self.computer_available_to_fire_set.difference_update(sorted(self.around_last_computer_hit_set))
+        self.dotted_set_for_computer_not_to_shoot = set(self.dotted_set)
+        self.hit_blocks_for_computer_not_to_shoot = set(self.hit_blocks)
+
+    def fork(self) -> "GameState":
+        """
+        Returns an independent copy of the game for a computer strategy to think on (e.g. in another thread):
+        bitboards are forked and everything else is copied as it is, so that a strategy makes the same choices
+        on the fork as on the game (available blocks keep their order, the heat map is not built again)
+        """
+        state = copy(self)
+        state.rng = Random()
+        state.rng.setstate(self.rng.getstate())
+        state.computer_available_to_fire_set = self.computer_available_to_fire_set.copy()
+        state.around_last_computer_hit_set = set(self.around_last_computer_hit_set)
+        state.dotted_set_for_computer_not_to_shoot = set(self.dotted_set_for_computer_not_to_shoot)
+        state.hit_blocks_for_computer_not_to_shoot = set(self.hit_blocks_for_computer_not_to_shoot)
+        state.last_hits_list = list(self.last_hits_list)
+        state.hit_blocks = set(self.hit_blocks)
+        state.dotted_set = set(self.dotted_set)
+        state.destroyed_computer_ships = list(self.destroyed_computer_ships)
+        state.blocks_to_draw = list(self.blocks_to_draw)
+        state.human_destroyed_ships_count = dict(self.human_destroyed_ships_count)
+        state.computer_destroyed_ships_count = dict(self.computer_destroyed_ships_count)
+        state.boards = {key: board.fork() for key, board in self.boards.items()}
+        state.heat_map = None if self.heat_map is None else self.heat_map.copy()
+        return state
+
+    def adopt(self, fork: "GameState") -> None:
+        """
+        Takes over what a strategy changes while choosing a move (the random number generator, the available
+        blocks and the heat map) from a fork it chose the move on, as if it had chosen the move on the game.
+        The game must not have changed since the fork
+        """
+        self.rng.setstate(fork.rng.getstate())
+        self.computer_available_to_fire_set = fork.computer_available_to_fire_set
+        self.heat_map = fork.heat_map
@@ -0,0 +1,64 @@
+"""Set that can also pick a random element in constant time."""
+
+from typing import Iterable
+
+
+class IndexedSet:
+    """
+    Set of hashable items kept in a list with every item's position in a dict, so that
+    membership, add, discard and picking a random item (random.choice works on it) all take O(1)
+    instead of copying the whole set into a tuple for every random choice
+    ----------
+    Methods:
+        add(item), discard(item), difference_update(items)
+        copy(): Returns a copy with the items in the same order (so random choices pick the same items)
+    """
+
+    def __init__(self, items: Iterable = ()) -> None:
+        self.__items = []
+        self.__positions = {}
+        for item in items:
+            self.add(item)
+
+    def add(self, item) -> None:
+        if item not in self.__positions:
+            self.__positions[item] = len(self.__items)
+            self.__items.append(item)
+
+    def discard(self, item) -> None:
+        """
+        Removes an item if it is present by moving the last item into its place
+        """
+        position = self.__positions.pop(item, None)
+        if position is None:
+            return
+        last = self.__items.pop()
+        if position < len(self.__items):
+            self.__items[position] = last
+            self.__positions[last] = position
+
+    def copy(self) -> "IndexedSet":
+        other = IndexedSet()
+        other.__items = self.__items.copy()
+        other.__positions = self.__positions.copy()
+        return other
+
+    def difference_update(self, items: Iterable) -> None:
+        for item in items:
+            self.discard(item)
+
+    def __isub__(self, items: Iterable) -> "IndexedSet":
+        self.difference_update(items)
+        return self
+
+    def __contains__(self, item) -> bool:
+        return item in self.__positions
+
+    def __len__(self) -> int:
+        return len(self.__items)
+
+    def __iter__(self):
+        return iter(self.__items)
+
+    def __getitem__(self, position: int):
+        return self.__items[position]
@@ -0,0 +1,102 @@
+"""Rules of a game: size of the grids and lengths of the ships."""
+
+from collections import Counter
+from string import ascii_uppercase
+
+from elements.constants import BLOCK_SIZE, FLEET, GRID_SIZE
+
+MAX_GRID_SIZE = 100
+
+
+class Rules:
+    """
+    Size of the grids and composition of the fleet that every module reads them from
+    ----------
+    Attributes:
+        grid_size (int): number of blocks along each side of a grid
+        fleet (tuple of ints): lengths of all ships of a fleet, longest first
+        cells (int): number of blocks in a grid
+        human_offset (int): Where the human grid starts (in number of blocks), the computer grid starts at 0
+        ship_lengths (tuple of ints): distinct lengths of ships, longest first
+        fleet_counts (dict): ship length -> number of such ships in a fleet
+        cell_size (int): size of a block on the screen in pixels (grids of any size take about the same space)
+    ----------
+    Methods:
+        scaled(grid_size): Rules for a grid with the classic fleet scaled to it
+        column_label(column): Name of a column (A-Z, then AA, AB, ...)
+        block_name(block, offset): Name of a block on a grid starting at offset, e.g. "B7"
+        on_grid(block, offset): Whether a block lies on a grid starting at offset
+        new_destroyed_ships_count(): Counters of destroyed ships by length and in total ("#")
+    """
+
+    def __init__(self, grid_size: int = GRID_SIZE, fleet: tuple = FLEET) -> None:
+        if not 1 <= grid_size <= MAX_GRID_SIZE:
+            raise ValueError(f"Grid size must be between 1 and {MAX_GRID_SIZE}, not {grid_size}")
+        if not fleet or not all(1 <= length <= grid_size for length in fleet):
+            raise ValueError(f"Ships of lengths {fleet} do not fit on a {grid_size}x{grid_size} grid")
+        self.grid_size = grid_size
+        self.fleet = tuple(sorted(fleet, reverse=True))
+        self.cells = grid_size * grid_size
+        self.human_offset = grid_size + grid_size // 2
+        self.ship_lengths = tuple(sorted(set(self.fleet), reverse=True))
+        self.fleet_counts = {length: self.fleet.count(length) for length in self.ship_lengths}
+        self.cell_size = max(1, GRID_SIZE * BLOCK_SIZE // grid_size)
+        self.__key = (self.grid_size, self.fleet)
+
+    @classmethod
+    def scaled(cls, grid_size: int) -> "Rules":
+        """
+        Rules for a grid of grid_size with as many ships of every classic length as on a classic grid
+        times grid_size / 10 (at least one), e.g. 10 times as many on a 100x100 grid.
+        Ships that are longer than the grid are left out.
+        """
+        fleet = tuple(
+            length
+            for length, count in Counter(FLEET).items()
+            if length <= grid_size
+            for _ in range(max(1, count * grid_size // GRID_SIZE))
+        )
+        return cls(grid_size, fleet)
+
+    def column_label(self, column: int) -> str:
+        """
+        Returns the name of a column (0-based): A-Z, then AA, AB, ...
+        """
+        label = ""
+        column += 1
+        while column:
+            column, letter = divmod(column - 1, len(ascii_uppercase))
+            label = ascii_uppercase[letter] + label
+        return label
+
+    def block_name(self, block: tuple, offset: int) -> str:
+        """
+        Returns the name of a block on a grid starting at offset, e.g. "B7"
+        """
+        return self.column_label(block[0] - offset - 1) + str(block[1])
+
+    def on_grid(self, block: tuple, offset: int) -> bool:
+        """
+        Checks whether a block lies on a grid starting at offset
+        """
+        return offset < block[0] <= offset + self.grid_size and 0 < block[1] <= self.grid_size
+
+    def new_destroyed_ships_count(self) -> dict:
+        """
+        Returns counters of destroyed ships by length (longest first) and in total ("#"), all zeros
+        """
+        count_dict = dict.fromkeys(self.ship_lengths, 0)
+        count_dict["#"] = 0
+        return count_dict
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Rules) and self.__key == other.__key
+
+    def __hash__(self) -> int:
+        return hash(self.__key)
+
+    def __repr__(self) -> str:
+        return f"Rules(grid_size={self.grid_size}, fleet={self.fleet})"
+
+
+CLASSIC_RULES = Rules()
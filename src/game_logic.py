@@ -1,135 +1,127 @@
 """Module for the logic behind the game."""
 
-from random import choice
 from typing import Callable
 
-from elements.autoships import AutoShips
+from elements.bitboard import (
+    MISS,
+    SUNK,
+    BitBoard,
+    block_to_index,
+    get_tables,
+    mask_to_blocks,
+)
+from elements.game_state import GameState
+from elements.rules import CLASSIC_RULES, Rules
+from instrumentation import profiler
 
-# ---COMPUTER DATA-----
-computer_available_to_fire_set = {(x, y) for x in range(16, 26) for y in range(1, 11)}
-around_last_computer_hit_set = set()
 
-dotted_set_for_computer_not_to_shoot = set()
-hit_blocks_for_computer_not_to_shoot = set()
-last_hits_list = []
-# --------------------
-
-hit_blocks = set()
-dotted_set = set()
-destroyed_computer_ships = []
-
-human_destroyed_ships_count = {4: 0, 3: 0, 2: 0, 1: 0, "#": 0}
-computer_destroyed_ships_count = {4: 0, 3: 0, 2: 0, 1: 0, "#": 0}
-
-
-def computer_shoots() -> tuple:
+def computer_shoots(*, state: GameState) -> tuple:
     """
     Randomly chooses a block from available to shoot from set
     """
-    # This global keyword and check for len(computer_available_to_fire_set) is solely for the play again option
-    # when all the ships and blocks variables are re-initialized but computer_available_to_fire_set is not.
-    global computer_available_to_fire_set
-    if not computer_available_to_fire_set:
-        computer_available_to_fire_set = {(x, y) for x in range(16, 26) for y in range(1, 11)}
-
-    set_to_shoot_from = computer_available_to_fire_set
-    if around_last_computer_hit_set:
-        set_to_shoot_from = around_last_computer_hit_set
+    # An IndexedSet, so a random block is chosen without copying all available blocks
+    set_to_shoot_from = state.computer_available_to_fire_set
+    if state.around_last_computer_hit_set:
+        # Sorted, so that the choice depends on the blocks only, not on the layout of the set in memory
+        # (which differs between Python versions and after GameState.restore)
+        set_to_shoot_from = sorted(state.around_last_computer_hit_set)
     # pygame.time.delay(500)
-    computer_fired_block = choice(tuple(set_to_shoot_from))
-    computer_available_to_fire_set.discard(computer_fired_block)
+    computer_fired_block = state.rng.choice(set_to_shoot_from)
+    state.computer_available_to_fire_set.discard(computer_fired_block)
     return computer_fired_block
 
 
 def check_hit_or_miss(
     *,
+    state: GameState,
     fired_block: tuple,
-    opponents_ships_list: list[list],
     computer_turn: bool,
     opponents_ships_list_original_copy: list,
     opponents_ships_set: set,
-    computer: AutoShips,
 ) -> bool:
     """
     Checks whether the block that was shot at either by computer or by human is a hit or a miss.
-    Updates sets with dots (in missed blocks or in diagonal blocks around hit block) and 'X's
-    (in hit blocks).
-    Removes destroyed ships from the list of ships.
-    """
-    for elem in opponents_ships_list:
-        diagonal_only = True
-        if fired_block in elem:
-            # This is to put dots before and after a destroyed ship
-            # and to draw computer's destroyed ships (which are hidden until destroyed)
-            ind = opponents_ships_list.index(elem)
-            if len(elem) == 1:
-                diagonal_only = False
-            update_dotted_and_hit_sets(
+    The shot is resolved on the opponent's bitboard, then sets with dots (in missed blocks or in
+    diagonal blocks around hit block) and 'X's (in hit blocks) are updated from it.
+    The bitboard finds the hit ship and counts its remaining blocks, so the lists of ships are not changed.
+    Removes hit blocks from the set of opponent's ships.
+    """
+    board = get_board(
+        state=state,
+        computer_turn=computer_turn,
+        opponents_ships_list_original_copy=opponents_ships_list_original_copy,
+    )
+    grid_size = state.rules.grid_size
+    dotted_before = board.dotted
+    index = block_to_index(fired_block, board.offset, grid_size)
+    result = board.fire(index)
+    new_dotted_blocks = mask_to_blocks(board.dotted & ~dotted_before, board.offset, grid_size)
+    state.dotted_set.update(new_dotted_blocks)
+    state.dotted_set_for_computer_not_to_shoot.update(new_dotted_blocks)
+    state.blocks_to_draw.extend(new_dotted_blocks)
+    if computer_turn:
+        state.computer_available_to_fire_set.difference_update(new_dotted_blocks)
+    if result == MISS:
+        if computer_turn:
+            update_around_last_computer_hit(
+                state=state,
                 fired_block=fired_block,
-                computer_turn=computer_turn,
-                diagonal_only=diagonal_only,
+                computer_hits=False,
             )
-            elem.remove(fired_block)
-            # This is to check who lost - if ships_set is empty
-            opponents_ships_set.discard(fired_block)
-            if computer_turn:
-                last_hits_list.append(fired_block)
-                update_around_last_computer_hit(
-                    fired_block=fired_block,
-                    computer_hits=True,
-                )
-            # If the ship is destroyed
-            if not elem:
-                update_destroyed_ships(
-                    ind=ind,
-                    computer_turn=computer_turn,
-                    opponents_ships_list_original_copy=opponents_ships_list_original_copy,
-                )
-                if computer_turn:
-                    last_hits_list.clear()
-                    around_last_computer_hit_set.clear()
-                else:
-                    # Add computer's destroyed ship to the list to draw it (computer ships are hidden)
-                    destroyed_computer_ships.append(computer.ships[ind])
-            return True
-    add_missed_block_to_dotted_set(
-        fired_block=fired_block,
-    )
+        return False
+
+    state.hit_blocks.add(fired_block)
+    state.hit_blocks_for_computer_not_to_shoot.add(fired_block)
+    state.blocks_to_draw.append(fired_block)
+    ind = board.ship_at(index)
+    # This is to check who lost - if ships_set is empty
+    opponents_ships_set.discard(fired_block)
     if computer_turn:
+        state.last_hits_list.append(fired_block)
         update_around_last_computer_hit(
+            state=state,
             fired_block=fired_block,
-            computer_hits=False,
+            computer_hits=True,
         )
-    return False
+    if result == SUNK:
+        count_destroyed_ship(
+            state=state,
+            ship_length=len(opponents_ships_list_original_copy[ind]),
+            computer_turn=computer_turn,
+        )
+        if computer_turn:
+            state.last_hits_list.clear()
+            state.around_last_computer_hit_set.clear()
+        else:
+            # Add computer's destroyed ship to the list to draw it (computer ships are hidden)
+            state.destroyed_computer_ships.append(opponents_ships_list_original_copy[ind])
+    return True
 
 
-def update_destroyed_ships(
-    *,
-    ind: int,
-    computer_turn: bool,
-    opponents_ships_list_original_copy: list,
-) -> None:
+def get_board(*, state: GameState, computer_turn: bool, opponents_ships_list_original_copy: list) -> BitBoard:
     """
-    Adds blocks before and after a ship to dotted_set to draw dots on them.
-    Adds all blocks in a ship to hit_blocks set to draw 'X's within a destroyed ship.
+    Returns the bitboard of the grid that is being shot at, creating it on the first shot.
     """
-    ship = sorted(opponents_ships_list_original_copy[ind])
-    for i in range(-1, 1):
-        update_dotted_and_hit_sets(
-            fired_block=ship[i],
-            computer_turn=computer_turn,
-            diagonal_only=False,
+    board = state.boards.get(computer_turn)
+    if board is None:
+        board = state.boards[computer_turn] = BitBoard(
+            opponents_ships_list_original_copy, offset=state.rules.human_offset * computer_turn, rules=state.rules
         )
-    if computer_turn:
-        human_destroyed_ships_count[len(ship)] += 1
-        human_destroyed_ships_count["#"] += 1
-    else:
-        computer_destroyed_ships_count[len(ship)] += 1
-        computer_destroyed_ships_count["#"] += 1
+    return board
+
+
+def count_destroyed_ship(*, state: GameState, ship_length: int, computer_turn: bool) -> None:
+    """
+    Increments the counters of destroyed ships of the player who has just lost a ship.
+    """
+    count_dict = state.human_destroyed_ships_count if computer_turn else state.computer_destroyed_ships_count
+    count_dict[ship_length] += 1
+    count_dict["#"] += 1
 
 
 def update_around_last_computer_hit(
     *,
+    state: GameState,
     fired_block: tuple,
     computer_hits: bool,
 ) -> None:
@@ -140,39 +132,39 @@ def update_around_last_computer_hit(
     around_last_computer_hit_set makes computer choose the right blocks to quickly destroy the ship
     instead of just randomly shooting at completely random blocks.
     """
-    global around_last_computer_hit_set, computer_available_to_fire_set
-    if computer_hits and fired_block in around_last_computer_hit_set:
-        around_last_computer_hit_set = computer_hits_twice()
-    elif computer_hits and fired_block not in around_last_computer_hit_set:
-        computer_first_hit(fired_block=fired_block)
+    if computer_hits and fired_block in state.around_last_computer_hit_set:
+        state.around_last_computer_hit_set = computer_hits_twice(state=state)
+    elif computer_hits and fired_block not in state.around_last_computer_hit_set:
+        computer_first_hit(state=state, fired_block=fired_block)
     elif not computer_hits:
-        around_last_computer_hit_set.discard(fired_block)
+        state.around_last_computer_hit_set.discard(fired_block)
 
-    around_last_computer_hit_set -= dotted_set_for_computer_not_to_shoot
-    around_last_computer_hit_set -= hit_blocks_for_computer_not_to_shoot
-    computer_available_to_fire_set -= around_last_computer_hit_set
-    computer_available_to_fire_set -= dotted_set_for_computer_not_to_shoot
+    # Only the few blocks around the hit are checked: subtracting the sets of all dotted and hit blocks
+    # would take longer with every shot. Dotted blocks are removed from available ones as they appear
+    state.around_last_computer_hit_set = {
+        block
+        for block in state.around_last_computer_hit_set
+        if block not in state.dotted_set_for_computer_not_to_shoot
+        and block not in state.hit_blocks_for_computer_not_to_shoot
+    }
+    # In sorted order too, since the order of removals decides the order of the blocks left
+    state.computer_available_to_fire_set -= sorted(state.around_last_computer_hit_set)
 
 
-def computer_first_hit(*, fired_block: tuple) -> None:
+def computer_first_hit(*, state: GameState, fired_block: tuple) -> None:
     """
     Adds blocks above, below, to the right and to the left from the block hit
     by computer to a temporary set for computer to choose its next shot from.
     Args:
         fired_block (tuple): coordinates of a block hit by computer
     """
-    x_hit, y_hit = fired_block
-    if x_hit > 16:
-        around_last_computer_hit_set.add((x_hit - 1, y_hit))
-    if x_hit < 25:
-        around_last_computer_hit_set.add((x_hit + 1, y_hit))
-    if y_hit > 1:
-        around_last_computer_hit_set.add((x_hit, y_hit - 1))
-    if y_hit < 10:
-        around_last_computer_hit_set.add((x_hit, y_hit + 1))
+    rules = state.rules
+    index = block_to_index(fired_block, rules.human_offset, rules.grid_size)
+    cross_mask = get_tables(rules).cross_masks[index]
+    state.around_last_computer_hit_set.update(mask_to_blocks(cross_mask, rules.human_offset, rules.grid_size))
 
 
-def computer_hits_twice() -> set:
+def computer_hits_twice(*, state: GameState) -> set:
     """
     Adds blocks before and after two or more blocks of a ship to a temporary list
     for computer to finish the ship faster.
@@ -180,63 +172,28 @@ def computer_hits_twice() -> set:
         set: temporary set of blocks where potentially a human ship should be
         for computer to shoot from
     """
-    last_hits_list.sort()
+    state.last_hits_list.sort()
+    first_x = state.rules.human_offset + 1
+    last = state.rules.grid_size
     new_around_last_hit_set = set()
-    for i in range(len(last_hits_list) - 1):
-        x1 = last_hits_list[i][0]
-        x2 = last_hits_list[i + 1][0]
-        y1 = last_hits_list[i][1]
-        y2 = last_hits_list[i + 1][1]
+    for i in range(len(state.last_hits_list) - 1):
+        x1 = state.last_hits_list[i][0]
+        x2 = state.last_hits_list[i + 1][0]
+        y1 = state.last_hits_list[i][1]
+        y2 = state.last_hits_list[i + 1][1]
         if x1 == x2:
             if y1 > 1:
                 new_around_last_hit_set.add((x1, y1 - 1))
-            if y2 < 10:
+            if y2 < last:
                 new_around_last_hit_set.add((x1, y2 + 1))
         elif y1 == y2:
-            if x1 > 16:
+            if x1 > first_x:
                 new_around_last_hit_set.add((x1 - 1, y1))
-            if x2 < 25:
+            if x2 < first_x + last - 1:
                 new_around_last_hit_set.add((x2 + 1, y1))
     return new_around_last_hit_set
 
 
-def update_dotted_and_hit_sets(
-    *,
-    fired_block: tuple,
-    computer_turn: bool,
-    diagonal_only: bool = True,
-) -> None:
-    """
-    Puts dots in center of diagonal or all around a block that was hit (either by human or
-    by computer). Adds all diagonal blocks or all-around chosen block to a separate set
-    block: hit block (tuple)
-    """
-    global dotted_set, hit_blocks
-    x, y = fired_block
-    a = 15 * computer_turn
-    b = 11 + 15 * computer_turn
-    # Adds a block hit by computer to the set of his hits to later remove
-    # them from the set of blocks available for it to shoot from
-    hit_blocks_for_computer_not_to_shoot.add(fired_block)
-    # Adds hit blocks on either grid1 (x:1-10) or grid2 (x:16-25)
-    hit_blocks.add(fired_block)
-    # Adds blocks in diagonal or all-around a block to respective sets
-    for i in range(-1, 2):
-        for j in range(-1, 2):
-            if (not diagonal_only or i != 0 and j != 0) and a < x + i < b and 0 < y + j < 11:
-                add_missed_block_to_dotted_set(fired_block=(x + i, y + j))
-    dotted_set -= hit_blocks
-
-
-def add_missed_block_to_dotted_set(*, fired_block: tuple) -> None:
-    """
-    Adds a fired_block to the set of missed shots (if fired_block is a miss then) to then draw dots on them.
-    Also needed for computer to remove these dotted blocks from the set of available blocks for it to shoot from.
-    """
-    dotted_set.add(fired_block)
-    dotted_set_for_computer_not_to_shoot.add(fired_block)
-
-
 def is_ship_valid(*, ship_set: set, blocks_for_manual_drawing: set) -> bool:
     """
     Checks if ship is not touching other ships
@@ -250,19 +207,20 @@ def is_ship_valid(*, ship_set: set, blocks_for_manual_drawing: set) -> bool:
     return ship_set.isdisjoint(blocks_for_manual_drawing)
 
 
-def validate_ships_numbers(*, ship: list, num_ships_list: list) -> bool:
+def validate_ships_numbers(*, ship: list, num_ships_list: list, rules: Rules = CLASSIC_RULES) -> bool:
     """
     Checks if a ship of particular length (1-4) does not exceed necessary quantity (4-1).
 
     Args:
         ship (list): List with new ships' coordinates
         num_ships_list (list): List with numbers of particular ships on respective indexes.
+        rules (Rules, optional): the fleet to compare with. Defaults to CLASSIC_RULES.
 
     Returns:
         Bool: True if the number of ships of particular length is not greater than needed,
             False if there are enough of such ships.
     """
-    return (5 - len(ship)) > num_ships_list[len(ship) - 1]
+    return rules.fleet_counts.get(len(ship), 0) > num_ships_list[len(ship) - 1]
 
 
 def update_used_blocks(*, ship: list, method: Callable) -> None:
@@ -273,3 +231,7 @@ def update_used_blocks(*, ship: list, method: Callable) -> None:
         for i in range(-1, 2):
             for j in range(-1, 2):
                 method((block[0] + i, block[1] + j))
+
+
+# Counts calls into the module if instrumentation is on
+profiler.count_calls(globals(), __name__)
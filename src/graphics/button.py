@@ -5,9 +5,8 @@ from typing import Optional
 import pygame
 
 from elements.constants import BLACK, BLOCK_SIZE, GREEN_BLUE, UPPER_MARGIN, WHITE
-from graphics.drawing import screen
-
-pygame.init()
+from graphics.drawing import get_screen
+from graphics.text_cache import text_cache
 
 
 class Button:
@@ -57,8 +56,9 @@ class Button:
         """
         if not color:
             color = self.__color
+        screen = get_screen()
         pygame.draw.rect(screen, color, self.__rect_for_draw)
-        text_to_blit = self.__font.render(self.__title, True, text_color)
+        text_to_blit = text_cache.render(self.__font, self.__title, text_color)
         screen.blit(text_to_blit, self.__rect_for_button_title)
 
     def change_color_on_hover(self, hover_color: tuple = GREEN_BLUE) -> None:
@@ -78,5 +78,5 @@ class Button:
             self.__x_start / 2 - message_width / 2,
             self.__y_start + self.__button_height / 2 - message_height / 2,
         )
-        text = self.__font.render(self.__message, True, text_color)
-        screen.blit(text, rect_for_message)
+        text = text_cache.render(self.__font, self.__message, text_color)
+        get_screen().blit(text, rect_for_message)
@@ -1,111 +1,186 @@
 """Module for drawing."""
 
+import os
+from pathlib import Path
+from typing import Optional
+
 import pygame
 
 from elements.constants import (
     BLACK,
     BLOCK_SIZE,
     FONT_SIZE,
-    GAME_OVER_FONT_SIZE,
     LEFT_MARGIN,
     RED,
     SIZE,
     UPPER_MARGIN,
     WHITE,
 )
+from graphics.text_cache import text_cache
+from instrumentation import profiler
+
+ICON_PATH = Path(__file__).resolve().parent.parent / "media" / "BattleShip.png"
+# Set this environment variable to any non-empty value to play without a window (e.g. from scripts)
+HEADLESS_ENV_VAR = "BATTLESHIP_HEADLESS"
+
+# The window and fonts are created on first use, so importing the graphics package has no side effects
+_screen = None
+_fonts = {}
+
+
+def get_screen(headless: Optional[bool] = None) -> pygame.Surface:
+    """
+    Returns the window's surface, opening the window on the first call
+    Args:
+        headless (bool, optional): use SDL's dummy video driver, so that no window is shown.
+            Defaults to None (headless if HEADLESS_ENV_VAR is set)
+    """
+    global _screen
+    if _screen is None:
+        if headless is None:
+            headless = bool(os.environ.get(HEADLESS_ENV_VAR))
+        if headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+        pygame.display.init()
+        _screen = pygame.display.set_mode(SIZE)
+        pygame.display.set_caption("BattleShip")
+        pygame.display.set_icon(pygame.image.load(ICON_PATH))
+    return _screen
 
-pygame.init()
-screen = pygame.display.set_mode(SIZE)
-pygame.display.set_caption("BattleShip")
-icon = pygame.image.load("media/BattleShip.png")
-pygame.display.set_icon(icon)
 
-font = pygame.font.SysFont("notosans", FONT_SIZE)
-game_over_font = pygame.font.SysFont("notosans", GAME_OVER_FONT_SIZE)
+def get_font(size: int = FONT_SIZE) -> pygame.font.Font:
+    """
+    Returns the game's font of a size, loading it on the first call
+    """
+    if size not in _fonts:
+        pygame.font.init()
+        _fonts[size] = pygame.font.SysFont("notosans", size)
+    return _fonts[size]
 
 
-def draw_ships(ships_coordinates_list: list, ships_color: tuple = BLACK) -> None:
+def draw_ships(ships_coordinates_list: list, ships_color: tuple = BLACK, cell_size: int = BLOCK_SIZE) -> list:
     """
     Draws rectangles around the blocks that are occupied by a ship
     Args:
         ships_coordinates_list (list of tuples): a list of ships's coordinates
+        cell_size (int, optional): size of a block in pixels (Rules.cell_size). Defaults to BLOCK_SIZE.
+    Returns:
+        list: rectangles of the screen that were drawn on
     """
+    screen = get_screen()
+    rects = []
     for elem in ships_coordinates_list:
         ship = sorted(elem)
         x_start = ship[0][0]
         y_start = ship[0][1]
         # Horizontal and 1block ships
-        ship_width = BLOCK_SIZE * len(ship)
-        ship_height = BLOCK_SIZE
+        ship_width = cell_size * len(ship)
+        ship_height = cell_size
         # Vertical ships
         if len(ship) > 1 and ship[0][0] == ship[1][0]:
             ship_width, ship_height = ship_height, ship_width
-        x = BLOCK_SIZE * (x_start - 1) + LEFT_MARGIN
-        y = BLOCK_SIZE * (y_start - 1) + UPPER_MARGIN
-        pygame.draw.rect(screen, ships_color, ((x, y), (ship_width, ship_height)), width=BLOCK_SIZE // 10)
+        x = cell_size * (x_start - 1) + LEFT_MARGIN
+        y = cell_size * (y_start - 1) + UPPER_MARGIN
+        rects.append(
+            pygame.draw.rect(screen, ships_color, ((x, y), (ship_width, ship_height)), width=max(1, cell_size // 10))
+        )
+    return rects
 
 
-def draw_from_dotted_set(dotted_set_to_draw_from: set, dots_color: tuple = BLACK) -> None:
+def draw_from_dotted_set(dotted_set_to_draw_from, dots_color: tuple = BLACK, cell_size: int = BLOCK_SIZE) -> list:
     """
     Draws dots in the center of all blocks in the dotted_set
+    Args:
+        cell_size (int, optional): size of a block in pixels (Rules.cell_size). Defaults to BLOCK_SIZE.
+    Returns:
+        list: rectangles of the screen that were drawn on
     """
-    for elem in dotted_set_to_draw_from:
+    screen = get_screen()
+    return [
         pygame.draw.circle(
             screen,
             dots_color,
-            (BLOCK_SIZE * (elem[0] - 0.5) + LEFT_MARGIN, BLOCK_SIZE * (elem[1] - 0.5) + UPPER_MARGIN),
-            BLOCK_SIZE // 6,
+            (cell_size * (elem[0] - 0.5) + LEFT_MARGIN, cell_size * (elem[1] - 0.5) + UPPER_MARGIN),
+            max(1, cell_size // 6),
         )
+        for elem in dotted_set_to_draw_from
+    ]
 
 
-def draw_hit_blocks(hit_blocks_to_draw_from: set, hit_blocks_color: tuple = BLACK) -> None:
+def draw_hit_blocks(hit_blocks_to_draw_from, hit_blocks_color: tuple = BLACK, cell_size: int = BLOCK_SIZE) -> list:
     """
     Draws 'X' in the blocks that were successfully hit either by computer or by human
+    Args:
+        cell_size (int, optional): size of a block in pixels (Rules.cell_size). Defaults to BLOCK_SIZE.
+    Returns:
+        list: rectangles of the screen that were drawn on
     """
+    screen = get_screen()
+    line_width = max(1, cell_size // 6)
+    rects = []
     for block in hit_blocks_to_draw_from:
-        x1 = BLOCK_SIZE * (block[0] - 1) + LEFT_MARGIN
-        y1 = BLOCK_SIZE * (block[1] - 1) + UPPER_MARGIN
-        pygame.draw.line(screen, hit_blocks_color, (x1, y1), (x1 + BLOCK_SIZE, y1 + BLOCK_SIZE), BLOCK_SIZE // 6)
-        pygame.draw.line(screen, hit_blocks_color, (x1, y1 + BLOCK_SIZE), (x1 + BLOCK_SIZE, y1), BLOCK_SIZE // 6)
+        x1 = cell_size * (block[0] - 1) + LEFT_MARGIN
+        y1 = cell_size * (block[1] - 1) + UPPER_MARGIN
+        line_rect = pygame.draw.line(screen, hit_blocks_color, (x1, y1), (x1 + cell_size, y1 + cell_size), line_width)
+        rects.append(
+            line_rect.union(
+                pygame.draw.line(screen, hit_blocks_color, (x1, y1 + cell_size), (x1 + cell_size, y1), line_width)
+            )
+        )
+    return rects
 
 
 def show_message_at_rect_center(
     message: str,
     rect: tuple,
-    font: pygame.font.Font = font,
+    font: Optional[pygame.font.Font] = None,
     message_color: tuple = RED,
     background_color: tuple = WHITE,
-) -> None:
+) -> pygame.Rect:
     """
     Prints message to screen at a given rect's center.
     Args:
         message (str): Message to print
         rect (tuple): rectangle in (x_start, y_start, width, height) format
-        font (pygame font object, optional): What font to use to print message. Defaults to font.
+        font (pygame font object, optional): What font to use to print message. Defaults to get_font().
         message_color (tuple, optional): Color of the message. Defaults to RED.
+    Returns:
+        pygame.Rect: rectangle of the screen that was drawn on
     """
+    screen = get_screen()
+    if font is None:
+        font = get_font()
     message_width, message_height = font.size(message)
     message_rect = pygame.Rect(rect)
     x_start = message_rect.centerx - message_width / 2
     y_start = message_rect.centery - message_height / 2
     background_rect = pygame.Rect(x_start - BLOCK_SIZE / 2, y_start, message_width + BLOCK_SIZE, message_height)
-    message_to_blit = font.render(message, True, message_color)
+    message_to_blit = text_cache.render(font, message, message_color)
     screen.fill(background_color, background_rect)
-    screen.blit(message_to_blit, (x_start, y_start))
+    return background_rect.union(screen.blit(message_to_blit, (x_start, y_start)))
 
 
 def print_destroyed_ships_count(
     x_offset: int, y_offset: int, count_dict: dict, font: pygame.font.Font, color: tuple = RED
-) -> None:
+) -> list:
     """
-    Prints numbers of destroyed ships at the grid's side.
+    Prints numbers of destroyed ships at the grid's side: one line per ship length, shortest first,
+    and the total ("#") below them.
     Args:
         font (pygame font object, optional): What font to use to print message.
         color (tuple, optional): Color of the message. Defaults to RED.
+    Returns:
+        list: rectangles of the screen that were drawn on
     """
+    screen = get_screen()
+    rects = [screen.blit(text_cache.render(font, "Ships", color), (x_offset, y_offset))]
+    lengths = sorted(ship for ship in count_dict if isinstance(ship, int))
     for ship, count in count_dict.items():
-        title = font.render("Ships", True, color)
-        text = font.render(f"{ship}: {count}", True, color)
-        screen.blit(title, (x_offset, y_offset))
-        num = ship if isinstance(ship, int) else 5
-        screen.blit(text, (x_offset, y_offset + num * BLOCK_SIZE))
+        text = text_cache.render(font, f"{ship}: {count}", color)
+        num = lengths.index(ship) + 1 if isinstance(ship, int) else len(lengths) + 1
+        rects.append(screen.blit(text, (x_offset, y_offset + num * BLOCK_SIZE)))
+    return rects
+
+
+# Counts calls into the module if instrumentation is on
+profiler.count_calls(globals(), __name__)
@@ -8,24 +8,36 @@ from elements.constants import (
     LEFT_MARGIN,
     LINE_WIDTH,
     UPPER_MARGIN,
+    WHITE,
 )
-from graphics.drawing import screen
+from elements.rules import CLASSIC_RULES, Rules
+from graphics.drawing import get_screen
+from graphics.text_cache import text_cache
 
 
 class Grid:
     """
-    Class to draw the grids and add title, numbers and letters to them
+    Class to draw the grids and add title, numbers and letters to them.
+    The grid is rendered once into an off-screen surface that is blitted to the screen on every draw
     ----------
     Attributes:
         title (str): Players' name to be displayed on the top of his grid
         offset (int): Where the grid starts (in number of blocks)
                 (typically 0 for computer and 15 for human)
+        font (pygame font object): font of the title, numbers and letters
+        rules (Rules): size of the grid (and of its blocks on the screen)
+        line_color (tuple): color of the lines
+        text_color (tuple): color of the title, numbers and letters
+        background_color (tuple): color of the grid's background
+        rect (pygame Rect): area of the screen covered by the grid with its title, numbers and letters
     ----------
     Methods:
-    __draw_grid(): Draws two grids for both players
-    __add_nums_letters_to_grid(): Draws numbers 1-10 along vertical and adds letters below horizontal
-        lines for both grids
-    __sign_grid(): Puts players' names (titles) in the center above the grids
+    draw(): Blits the grid to the screen (rendering it first if any of the attributes changed)
+    __render(): Renders the grid into an off-screen surface
+    __draw_lines(): Draws the grid's lines
+    __add_numbers_and_letters(): Draws numbers along vertical and adds letters below horizontal lines
+        (only every few rows and columns if blocks are smaller than the labels)
+    __sign_grid(): Puts player's name (title) in the center above the grid
     """
 
     def __init__(
@@ -34,9 +46,10 @@ class Grid:
         title: str,
         offset: int,
         font: pygame.font.Font,
-        letters: list,
+        rules: Rules = CLASSIC_RULES,
         line_color: tuple,
         text_color: tuple,
+        background_color: tuple = WHITE,
     ) -> None:
         """
         title(str): Players' name to be displayed on the top of his grid
@@ -46,26 +59,67 @@ class Grid:
         self.title = title
         self.offset = offset
         self.font = font
-        self.letters = letters
+        self.rules = rules
         self.line_color = line_color
         self.text_color = text_color
-        self.__draw()
-        self.__add_numbers_and_letters()
-        self.__sign_grid()
+        self.background_color = background_color
+        self.__surface = None
+        self.__rendered_with = None
 
-    def __draw(self) -> None:
+    @property
+    def rect(self) -> pygame.Rect:
+        # BLOCK_SIZE to the left for numbers and below for letters, the title is above the grid
+        grid_width = self.rules.grid_size * self.rules.cell_size
+        return pygame.Rect(
+            LEFT_MARGIN + self.offset * self.rules.cell_size - BLOCK_SIZE,
+            0,
+            grid_width + BLOCK_SIZE + LINE_WIDTH,
+            UPPER_MARGIN + grid_width + BLOCK_SIZE,
+        )
+
+    def draw(self) -> pygame.Rect:
         """
-        Draws two grids for both players
+        Blits the grid to the screen, rendering it first if its look or layout changed
+        Returns:
+            pygame.Rect: rectangle of the screen that was drawn on
         """
-        for i in range(11):
-            hor_line_start_pos = (LEFT_MARGIN + self.offset * BLOCK_SIZE, UPPER_MARGIN + i * BLOCK_SIZE)
-            hor_line_end_pos = (LEFT_MARGIN + (10 + self.offset) * BLOCK_SIZE, UPPER_MARGIN + i * BLOCK_SIZE)
-            ver_line_start_pos = (LEFT_MARGIN + (i + self.offset) * BLOCK_SIZE, UPPER_MARGIN)
-            ver_line_end_pos = (LEFT_MARGIN + (i + self.offset) * BLOCK_SIZE, UPPER_MARGIN + 10 * BLOCK_SIZE)
+        rect = self.rect
+        look = (self.title, self.font, self.rules, self.line_color, self.text_color, self.background_color)
+        if self.__rendered_with != (look, tuple(rect)):
+            self.__render(rect)
+            self.__rendered_with = (look, tuple(rect))
+        return get_screen().blit(self.__surface, rect)
+
+    def __render(self, rect: pygame.Rect) -> None:
+        """
+        Renders the grid into an off-screen surface of the size of rect
+        """
+        self.__surface = pygame.Surface(rect.size)
+        self.__surface.fill(self.background_color)
+        self.__draw_lines(rect.x, rect.y)
+        self.__add_numbers_and_letters(rect.x, rect.y)
+        self.__sign_grid(rect.x, rect.y)
+
+    def __draw_lines(self, x: int, y: int) -> None:
+        """
+        Draws the grid's lines (screen coordinates are shifted by x and y to the surface's ones)
+        """
+        grid_size, cell_size = self.rules.grid_size, self.rules.cell_size
+        for i in range(grid_size + 1):
+            hor_line_start_pos = (LEFT_MARGIN + self.offset * cell_size - x, UPPER_MARGIN + i * cell_size - y)
+            hor_line_end_pos = (
+                LEFT_MARGIN + (grid_size + self.offset) * cell_size - x,
+                UPPER_MARGIN + i * cell_size - y,
+            )
+            ver_line_start_pos = (LEFT_MARGIN + (i + self.offset) * cell_size - x, UPPER_MARGIN - y)
+            ver_line_end_pos = (
+                LEFT_MARGIN + (i + self.offset) * cell_size - x,
+                UPPER_MARGIN + grid_size * cell_size - y,
+            )
 
             # Horizontal lines
             pygame.draw.line(
-                screen,
+                self.__surface,
                 self.line_color,
                 hor_line_start_pos,
                 hor_line_end_pos,
@@ -73,48 +127,55 @@ class Grid:
             )
             # Vertical lines
             pygame.draw.line(
-                screen,
+                self.__surface,
                 self.line_color,
                 ver_line_start_pos,
                 ver_line_end_pos,
                 LINE_WIDTH,
             )
 
-    def __add_numbers_and_letters(self) -> None:
+    def __add_numbers_and_letters(self, x: int, y: int) -> None:
         """
-        Draws numbers 1-10 along vertical and adds letters below horizontal
-        lines for both grids
+        Draws numbers along vertical and adds letters below horizontal
+        lines (screen coordinates are shifted by x and y to the surface's ones)
         """
-        for i in range(10):
-            num_ver = self.font.render(str(i + 1), True, self.text_color)
-            letters_hor = self.font.render(self.letters[i], True, self.text_color)
-            num_ver_width = num_ver.get_width()
-            num_ver_height = num_ver.get_height()
-            letters_hor_width = letters_hor.get_width()
-            numbers_blit_destination = (
-                LEFT_MARGIN - (BLOCK_SIZE // 2 + num_ver_width // 2) + self.offset * BLOCK_SIZE,
-                UPPER_MARGIN + i * BLOCK_SIZE + (BLOCK_SIZE // 2 - num_ver_height // 2),
-            )
-            letters_blit_destination = (
-                LEFT_MARGIN + i * BLOCK_SIZE + (BLOCK_SIZE // 2 - letters_hor_width // 2) + self.offset * BLOCK_SIZE,
-                UPPER_MARGIN + 10 * BLOCK_SIZE,
-            )
-
-            # Numbers (vertical)
-            screen.blit(num_ver, numbers_blit_destination)
-            # Letters (horizontal)
-            screen.blit(letters_hor, letters_blit_destination)
+        grid_size, cell_size = self.rules.grid_size, self.rules.cell_size
+        # Label every row and column, or only every few of them if the labels do not fit into blocks
+        widest_label = max(self.font.size(self.rules.column_label(grid_size - 1))[0], self.font.size(str(grid_size))[0])
+        column_step = -(-widest_label // cell_size)
+        row_step = -(-self.font.get_height() // cell_size)
+        for i in range(grid_size):
+            if i % row_step == 0:
+                num_ver = text_cache.render(self.font, str(i + 1), self.text_color)
+                numbers_blit_destination = (
+                    LEFT_MARGIN - (BLOCK_SIZE // 2 + num_ver.get_width() // 2) + self.offset * cell_size - x,
+                    UPPER_MARGIN + i * cell_size + (cell_size // 2 - num_ver.get_height() // 2) - y,
+                )
+                # Numbers (vertical)
+                self.__surface.blit(num_ver, numbers_blit_destination)
+            if i % column_step == 0:
+                letters_hor = text_cache.render(self.font, self.rules.column_label(i), self.text_color)
+                letters_blit_destination = (
+                    LEFT_MARGIN + (i + self.offset) * cell_size + (cell_size // 2 - letters_hor.get_width() // 2) - x,
+                    UPPER_MARGIN + grid_size * cell_size - y,
+                )
+                # Letters (horizontal)
+                self.__surface.blit(letters_hor, letters_blit_destination)
 
-    def __sign_grid(self) -> None:
+    def __sign_grid(self, x: int, y: int) -> None:
         """
-        Puts players' names (titles) in the center above the grids
+        Puts player's name (title) in the center above the grid
+        (screen coordinates are shifted by x and y to the surface's ones)
         """
-        player = self.font.render(self.title, True, self.text_color)
+        player = text_cache.render(self.font, self.title, self.text_color)
         sign_width = player.get_width()
-        screen.blit(
+        self.__surface.blit(
             player,
             (
-                LEFT_MARGIN + 5 * BLOCK_SIZE - sign_width // 2 + self.offset * BLOCK_SIZE,
-                UPPER_MARGIN - BLOCK_SIZE // 2 - FONT_SIZE,
+                LEFT_MARGIN
+                + (self.offset * 2 + self.rules.grid_size) * self.rules.cell_size // 2
+                - sign_width // 2
+                - x,
+                UPPER_MARGIN - BLOCK_SIZE // 2 - FONT_SIZE - y,
             ),
         )
@@ -1,18 +1,18 @@
 """Create ships manually."""
 
-import pygame
+from random import Random
 
+from elements.autoships import AutoShips
+from elements.bitboard import blocks_to_mask, get_tables, index_to_block
 from elements.constants import (
-    BLOCK_SIZE,
     LEFT_MARGIN,
     RECT_FOR_MESSAGES_AND_BUTTONS,
     UPPER_MARGIN,
     WHITE,
 )
+from elements.rules import CLASSIC_RULES, Rules
 from game_logic import is_ship_valid, update_used_blocks, validate_ships_numbers
-from graphics.drawing import screen, show_message_at_rect_center
-
-pygame.init()
+from graphics.drawing import get_screen, show_message_at_rect_center
 
 
 def manually_create_new_ship(
@@ -25,31 +25,70 @@ def manually_create_new_ship(
     y_start,
     x_end,
     y_end,
+    rules: Rules = CLASSIC_RULES,
 ) -> None:
     """
     Validate each manually created ship and add it to the list of ships.
     """
-    start_block = ((x_start - LEFT_MARGIN) // BLOCK_SIZE + 1, (y_start - UPPER_MARGIN) // BLOCK_SIZE + 1)
-    end_block = ((x_end - LEFT_MARGIN) // BLOCK_SIZE + 1, (y_end - UPPER_MARGIN) // BLOCK_SIZE + 1)
+    cell_size = rules.cell_size
+    start_block = ((x_start - LEFT_MARGIN) // cell_size + 1, (y_start - UPPER_MARGIN) // cell_size + 1)
+    end_block = ((x_end - LEFT_MARGIN) // cell_size + 1, (y_end - UPPER_MARGIN) // cell_size + 1)
     if start_block > end_block:
         start_block, end_block = end_block, start_block
     temp_ship = []
-    if 15 < start_block[0] < 26 and 0 < start_block[1] < 11 and 15 < end_block[0] < 26 and 0 < end_block[1] < 11:
-        temp_ship = create_new_ship(start_block, end_block)
+    if rules.on_grid(start_block, rules.human_offset) and rules.on_grid(end_block, rules.human_offset):
+        temp_ship = create_new_ship(start_block, end_block, rules.fleet[0])
     else:
         show_message_at_rect_center("SHIP IS BEYOND YOUR GRID! Try again!", RECT_FOR_MESSAGES_AND_BUTTONS)
     if temp_ship:
         validate_and_save_new_ship(
-            human_ships_to_draw, human_ships_set, used_blocks_for_manual_drawing, num_ships_list, temp_ship
+            human_ships_to_draw, human_ships_set, used_blocks_for_manual_drawing, num_ships_list, temp_ship, rules
+        )
+
+
+def auto_complete_ships(
+    *,
+    human_ships_to_draw,
+    human_ships_set,
+    used_blocks_for_manual_drawing,
+    num_ships_list,
+    rng: Random,
+    rules: Rules = CLASSIC_RULES,
+) -> None:
+    """
+    Places the ships that are not drawn yet around the drawn ones (see AutoShips.complete_fleet)
+    or shows a message if they do not fit.
+    """
+    get_screen().fill(WHITE, RECT_FOR_MESSAGES_AND_BUTTONS)
+    offset = rules.human_offset
+    drawn = list(num_ships_list)
+    lengths = []
+    for length in rules.fleet:
+        if drawn[length - 1]:
+            drawn[length - 1] -= 1
+        else:
+            lengths.append(length)
+    used_blocks = (block for block in used_blocks_for_manual_drawing if rules.on_grid(block, offset))
+    placements = AutoShips.complete_fleet(rng, blocks_to_mask(used_blocks, offset, rules.grid_size), lengths, rules)
+    if placements is None:
+        show_message_at_rect_center("REMAINING SHIPS DO NOT FIT! Undo a ship", RECT_FOR_MESSAGES_AND_BUTTONS)
+        return
+    tables = get_tables(rules)
+    for length, placement in zip(lengths, placements):
+        temp_ship = [
+            index_to_block(index, offset, rules.grid_size) for index in tables.placement_cells[length][placement]
+        ]
+        validate_and_save_new_ship(
+            human_ships_to_draw, human_ships_set, used_blocks_for_manual_drawing, num_ships_list, temp_ship, rules
         )
 
 
 def validate_and_save_new_ship(
-    human_ships_to_draw, human_ships_set, used_blocks_for_manual_drawing, num_ships_list, temp_ship
+    human_ships_to_draw, human_ships_set, used_blocks_for_manual_drawing, num_ships_list, temp_ship, rules
 ):
     temp_ship_set = set(temp_ship)
     if is_ship_valid(ship_set=temp_ship_set, blocks_for_manual_drawing=used_blocks_for_manual_drawing):
-        if validate_ships_numbers(ship=temp_ship, num_ships_list=num_ships_list):
+        if validate_ships_numbers(ship=temp_ship, num_ships_list=num_ships_list, rules=rules):
             num_ships_list[len(temp_ship) - 1] += 1
             human_ships_to_draw.append(temp_ship)
             human_ships_set |= temp_ship_set
@@ -62,13 +101,13 @@ def validate_and_save_new_ship(
         show_message_at_rect_center("SHIPS ARE TOUCHING! Try again", RECT_FOR_MESSAGES_AND_BUTTONS)
 
 
-def create_new_ship(start_block, end_block):
-    screen.fill(WHITE, RECT_FOR_MESSAGES_AND_BUTTONS)
+def create_new_ship(start_block, end_block, max_ship_length):
+    get_screen().fill(WHITE, RECT_FOR_MESSAGES_AND_BUTTONS)
     temp_ship = []
-    if start_block[0] == end_block[0] and (end_block[1] - start_block[1]) < 4:
+    if start_block[0] == end_block[0] and (end_block[1] - start_block[1]) < max_ship_length:
         for block in range(start_block[1], end_block[1] + 1):
             temp_ship.append((start_block[0], block))
-    elif start_block[1] == end_block[1] and (end_block[0] - start_block[0]) < 4:
+    elif start_block[1] == end_block[1] and (end_block[0] - start_block[0]) < max_ship_length:
         for block in range(start_block[0], end_block[0] + 1):
             temp_ship.append((block, start_block[1]))
     else:
@@ -0,0 +1,89 @@
+"""Cache of rendered text surfaces shared by all drawing helpers and buttons."""
+
+from collections import OrderedDict
+
+import pygame
+
+# Maximum number of rendered texts to keep (the least recently used ones are dropped first)
+TEXT_CACHE_SIZE = 256
+
+
+class TextCache:
+    """
+    LRU cache of text surfaces keyed by (font, text, color)
+    ----------
+    Attributes:
+        max_size (int): maximum number of surfaces to keep
+        hits (int): renders that were served from the cache
+        misses (int): renders that had to call font.render
+        evictions (int): surfaces dropped to keep the cache within max_size
+        frames (int): number of frames counted by new_frame()
+        last_frame_hits (int): renders saved by the cache during the last finished frame
+    ----------
+    Methods:
+    render(font, text, color): Returns a surface with the antialiased text
+    new_frame(): Starts counting renders of the next frame
+    hit_rate(): Share of renders served from the cache
+    summary(): One line with all counters
+    clear(): Drops all surfaces and resets counters
+    """
+
+    def __init__(self, max_size: int = TEXT_CACHE_SIZE) -> None:
+        self.max_size = max_size
+        self.__surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.frames = 0
+        self.last_frame_hits = 0
+        self.__frame_hits = 0
+
+    def render(self, font: pygame.font.Font, text: str, color: tuple) -> pygame.Surface:
+        """
+        Returns a surface with the antialiased text, rendering it only if it is not in the cache.
+        The surface is shared, so it must only be blitted, never drawn on.
+        """
+        key = (font, text, color)
+        surface = self.__surfaces.get(key)
+        if surface is not None:
+            self.__surfaces.move_to_end(key)
+            self.hits += 1
+            self.__frame_hits += 1
+            return surface
+        self.misses += 1
+        surface = font.render(text, True, color)
+        self.__surfaces[key] = surface
+        if len(self.__surfaces) > self.max_size:
+            self.__surfaces.popitem(last=False)
+            self.evictions += 1
+        return surface
+
+    def new_frame(self) -> None:
+        """
+        Finishes counting renders saved during the current frame
+        """
+        self.frames += 1
+        self.last_frame_hits = self.__frame_hits
+        self.__frame_hits = 0
+
+    def hit_rate(self) -> float:
+        """
+        Share of renders served from the cache
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self) -> str:
+        saved_per_frame = self.hits / self.frames if self.frames else 0.0
+        return (
+            f"text cache: {len(self.__surfaces)}/{self.max_size} surfaces, hit rate {self.hit_rate():.1%} "
+            f"({self.hits} hits, {self.misses} misses, {self.evictions} evictions), "
+            f"{saved_per_frame:.1f} renders saved per frame ({self.last_frame_hits} in the last one)"
+        )
+
+    def clear(self) -> None:
+        self.__surfaces.clear()
+        self.hits = self.misses = self.evictions = self.frames = self.last_frame_hits = self.__frame_hits = 0
+
+
+text_cache = TextCache()
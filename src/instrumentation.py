@@ -0,0 +1,239 @@
+"""
+Opt-in instrumentation of the game: time spent in every phase of a frame, rolling frame times
+and numbers of calls into game_logic and graphics.drawing.
+Switched on by setting BATTLESHIP_PROFILE to a JSON file that statistics are exported to (every few
+seconds and at exit), BATTLESHIP_PROFILE_OVERLAY=1 also draws frame times in the corner of the screen.
+When it is off, phases are one shared no-op context manager and functions are not wrapped at all.
+"""
+
+import atexit
+import inspect
+import json
+import os
+import time
+from collections import Counter, deque
+from contextlib import nullcontext
+from functools import wraps
+from typing import TYPE_CHECKING, Optional
+
+from elements.constants import BLACK, BLOCK_SIZE, WHITE
+
+if TYPE_CHECKING:
+    # Only for annotations: the headless tools that import game_logic never import pygame
+    import pygame
+
+PROFILE_ENV_VAR = "BATTLESHIP_PROFILE"
+OVERLAY_ENV_VAR = "BATTLESHIP_PROFILE_OVERLAY"
+# Rolling percentiles are computed over this many last frames (10 seconds at 60 FPS)
+FRAME_WINDOW = 600
+# Seconds between exports while the game runs and between updates of the overlay
+EXPORT_INTERVAL = 10.0
+OVERLAY_INTERVAL = 0.5
+# Top left corner of the screen is free during the game
+OVERLAY_POSITION = (BLOCK_SIZE // 5, BLOCK_SIZE // 5)
+# Time outside of other phases is event handling, time in WAIT_PHASE (frame rate limit and
+# waiting for events in idle loops) is not a part of frame time
+BASE_PHASE = "events"
+WAIT_PHASE = "wait"
+
+
+def percentile(values, percent: float) -> float:
+    """
+    Returns the nearest-rank percentile of values (0.0 if there are none)
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+class Phase:
+    """
+    Context manager that charges time spent in it to a phase of the current frame.
+    Phases can be nested: time of an inner phase is not charged to the outer one.
+    """
+
+    def __init__(self, profiler: "Profiler", name: str) -> None:
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.profiler.enter_phase(self.name)
+
+    def __exit__(self, *exc_info) -> None:
+        self.profiler.exit_phase()
+
+
+class Profiler:
+    """
+    Statistics of frames and calls
+    ----------
+    Attributes:
+        path (str): JSON file to export statistics to
+        overlay (bool): whether frame times are drawn on the screen
+        frames (int): number of finished frames
+        frame_times (deque of floats): seconds of work (without waiting) of the last FRAME_WINDOW frames
+        phase_times (dict): phase name -> deque of seconds spent in it in the last frames it appeared in
+        calls (Counter): "module.function" -> number of calls
+    ----------
+    Methods:
+        phase(name): Context manager that times a phase of a frame
+        end_frame(): Finishes a frame (called once per iteration of the game's loops)
+        count_calls(namespace, module): Makes functions of a module count their calls
+        summary(): Statistics as a dict
+        export(): Writes statistics to the JSON file
+        draw_overlay(screen, font, position): Draws frame times on the screen every OVERLAY_INTERVAL seconds
+    """
+
+    def __init__(self, path: str, overlay: bool = False, window: int = FRAME_WINDOW) -> None:
+        self.path = path
+        self.overlay = overlay
+        self.frames = 0
+        self.frame_times = deque(maxlen=window)
+        self.phase_times = {}
+        self.calls = Counter()
+        self.__window = window
+        self.__phases = {}
+        self.__stack = [BASE_PHASE]
+        self.__frame_phases = Counter()
+        self.__since = time.perf_counter()
+        self.__last_export = self.__since
+        self.__last_overlay = 0.0
+        self.__overlay_rect = None
+
+    def phase(self, name: str) -> Phase:
+        phase = self.__phases.get(name)
+        if phase is None:
+            phase = self.__phases[name] = Phase(self, name)
+        return phase
+
+    def enter_phase(self, name: str) -> None:
+        self.__charge()
+        self.__stack.append(name)
+
+    def exit_phase(self) -> None:
+        self.__charge()
+        self.__stack.pop()
+
+    def end_frame(self) -> None:
+        """
+        Records times of the phases of the frame that has just finished and starts a new one
+        """
+        self.__charge()
+        for name, seconds in self.__frame_phases.items():
+            if name not in self.phase_times:
+                self.phase_times[name] = deque(maxlen=self.__window)
+            self.phase_times[name].append(seconds)
+        self.frame_times.append(sum(seconds for name, seconds in self.__frame_phases.items() if name != WAIT_PHASE))
+        self.__frame_phases.clear()
+        self.frames += 1
+        if self.__since - self.__last_export > EXPORT_INTERVAL:
+            self.export()
+
+    def count_calls(self, namespace: dict, module: str) -> None:
+        """
+        Replaces functions defined in a module (given its globals) with wrappers that count their calls.
+        Called at the end of the module, so that other modules import the wrappers.
+        """
+        for name, func in list(namespace.items()):
+            if inspect.isfunction(func) and func.__module__ == module:
+                namespace[name] = self.__counted(func, f"{module}.{name}")
+
+    def summary(self) -> dict:
+        def milliseconds(values) -> dict:
+            return {
+                "p50": percentile(values, 50) * 1000,
+                "p99": percentile(values, 99) * 1000,
+                "max": max(values, default=0.0) * 1000,
+            }
+
+        return {
+            "frames": self.frames,
+            "window": len(self.frame_times),
+            "frame_ms": milliseconds(self.frame_times),
+            "phases_ms": {name: milliseconds(times) for name, times in sorted(self.phase_times.items())},
+            "calls": dict(self.calls.most_common()),
+        }
+
+    def export(self) -> None:
+        self.__last_export = time.perf_counter()
+        with open(self.path, "w") as file:
+            json.dump(self.summary(), file, indent=2)
+
+    def draw_overlay(
+        self, screen: "pygame.Surface", font: "pygame.font.Font", position: tuple = OVERLAY_POSITION
+    ) -> Optional["pygame.Rect"]:
+        """
+        Draws rolling p50/p99 frame times at position, at most every OVERLAY_INTERVAL seconds
+        Returns:
+            pygame.Rect: rectangle of the screen that was drawn on, None if nothing was drawn
+        """
+        now = time.perf_counter()
+        if not self.overlay or now - self.__last_overlay < OVERLAY_INTERVAL:
+            return None
+        self.__last_overlay = now
+        text = (
+            f"frame p50 {percentile(self.frame_times, 50) * 1000:.1f} ms"
+            f"  p99 {percentile(self.frame_times, 99) * 1000:.1f} ms"
+        )
+        previous_rect = self.__overlay_rect
+        if previous_rect is not None:
+            screen.fill(WHITE, previous_rect)
+        # Not through text_cache: the text changes every time
+        self.__overlay_rect = screen.blit(font.render(text, True, BLACK, WHITE), position)
+        return self.__overlay_rect if previous_rect is None else self.__overlay_rect.union(previous_rect)
+
+    def __charge(self) -> None:
+        now = time.perf_counter()
+        self.__frame_phases[self.__stack[-1]] += now - self.__since
+        self.__since = now
+
+    def __counted(self, func, name: str):
+        calls = self.calls
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            calls[name] += 1
+            return func(*args, **kwargs)
+
+        return wrapper
+
+
+class NullProfiler:
+    """
+    Profiler that does nothing (instrumentation is off)
+    """
+
+    overlay = False
+
+    def __init__(self) -> None:
+        self.__phase = nullcontext()
+
+    def phase(self, name: str) -> nullcontext:
+        return self.__phase
+
+    def end_frame(self) -> None:
+        pass
+
+    def count_calls(self, namespace: dict, module: str) -> None:
+        pass
+
+    def draw_overlay(
+        self, screen: "pygame.Surface", font: "pygame.font.Font", position: tuple = OVERLAY_POSITION
+    ) -> None:
+        return None
+
+
+def create_profiler():
+    """
+    Returns a Profiler if BATTLESHIP_PROFILE is set (exporting statistics at exit), a NullProfiler otherwise
+    """
+    path = os.environ.get(PROFILE_ENV_VAR)
+    if not path:
+        return NullProfiler()
+    profiler = Profiler(path, overlay=bool(os.environ.get(OVERLAY_ENV_VAR)))
+    atexit.register(profiler.export)
+    return profiler
+
+
+profiler = create_profiler()
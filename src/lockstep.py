@@ -0,0 +1,634 @@
+"""
+Lockstep simulation: advances thousands of games at once with NumPy instead of looping over Python objects.
+Every game is computer shooting at an AutoShips fleet on the human grid (one side of a tournament game,
+see tournament.sink_fleet). Boards of all games are arrays and every step resolves one shot in every game
+that is not finished. Random numbers come from the games' own generators advanced together, so every game
+ends exactly as it does through game_logic with the same seed.
+Run from the src directory: python lockstep.py --games 100000 [--policy uniform --check 1000]
+"""
+
+import argparse
+import sys
+import time
+from random import Random
+from typing import Optional
+
+import numpy as np
+
+from elements.autoships import SAMPLING_ATTEMPTS, AutoShips
+from elements.bitboard import block_to_index, get_tables, mask_to_blocks
+from elements.constants import GRID_SIZE
+from elements.fleet_corpus import FleetCorpus
+from elements.game_state import GameState
+from elements.rules import CLASSIC_RULES, Rules
+from game_logic import computer_shoots
+
+# States of blocks in LockstepGames.shots
+UNKNOWN = 0
+# Misses and blocks known to be empty (around hits and destroyed ships)
+DOTTED = 1
+HIT = 2
+# How computer chooses blocks: "hunt_target" as computer_shoots does (the "random" strategy: at random blocks
+# until it hits a ship, then around the hits), "uniform" always at a random block that is not known to be empty
+POLICIES = ("hunt_target", "uniform")
+# Games simulate keeps in memory at once (a game takes about 3 KB, most of it for its random number generator)
+BATCH_SIZE = 10_000
+
+# Mersenne Twister (the generator of the random module): words of its state, the shift of its recurrence
+# and its masks, the seed its state is initialised with before a key is mixed into it
+MT_SIZE = 624
+MT_SHIFT = 397
+MT_MATRIX = np.uint32(0x9908B0DF)
+MT_UPPER = np.uint32(0x80000000)
+MT_LOWER = np.uint32(0x7FFFFFFF)
+MT_SEED = 19650218
+# Blocks on the diagonals of a block and next to it (x, y steps)
+DIAGONAL_STEPS = ((-1, -1), (1, -1), (-1, 1), (1, 1))
+CROSS_STEPS = ((0, -1), (-1, 0), (1, 0), (0, 1))
+
+
+def twist(state: np.ndarray) -> np.ndarray:
+    """
+    Generates the next words of Mersenne Twisters (as genrand_uint32 of CPython's random module does)
+    in place. Word i depends on the new word i + MT_SHIFT - MT_SIZE, so the words are generated in blocks
+    that only depend on blocks generated before them.
+    Args:
+        state (ndarray): words of every generator, (generators, MT_SIZE) uint32
+    Returns:
+        ndarray: the same array
+    """
+
+    def mix(first: int, last: int, source: np.ndarray) -> None:
+        y = (state[:, first:last] & MT_UPPER) | (state[:, first + 1 : last + 1] & MT_LOWER)
+        state[:, first:last] = source ^ (y >> 1) ^ ((y & 1) * MT_MATRIX)
+
+    gap = MT_SIZE - MT_SHIFT
+    mix(0, gap, state[:, MT_SHIFT:])
+    mix(gap, 2 * gap, state[:, :gap])
+    mix(2 * gap, MT_SIZE - 1, state[:, gap : MT_SHIFT - 1])
+    y = (state[:, MT_SIZE - 1] & MT_UPPER) | (state[:, 0] & MT_LOWER)
+    state[:, MT_SIZE - 1] = state[:, MT_SHIFT - 1] ^ (y >> 1) ^ ((y & 1) * MT_MATRIX)
+    return state
+
+
+def seed_by_array(keys: np.ndarray) -> np.ndarray:
+    """
+    Initialises Mersenne Twisters with keys of the same length (as init_by_array of CPython's random module does).
+    Every word depends on the one before it, so the words are mixed one at a time for all generators at once.
+    Args:
+        keys (ndarray): words of every key, (generators, key length) uint32
+    Returns:
+        ndarray: words of every generator, (MT_SIZE, generators) uint32
+    """
+    word, words = MT_SEED, [MT_SEED]
+    for i in range(1, MT_SIZE):
+        word = (1812433253 * (word ^ (word >> 30)) + i) & 0xFFFFFFFF
+        words.append(word)
+    state = np.repeat(np.array(words, dtype=np.uint32)[:, None], len(keys), axis=1)
+    keys = keys.T
+    i = j = 0
+    for _ in range(max(MT_SIZE, len(keys))):
+        i += 1
+        previous = state[i - 1]
+        state[i] = (state[i] ^ ((previous ^ (previous >> 30)) * np.uint32(1664525))) + keys[j] + np.uint32(j)
+        j = (j + 1) % len(keys)
+        if i == MT_SIZE - 1:
+            state[0], i = state[i], 0
+    for _ in range(MT_SIZE - 1):
+        i += 1
+        previous = state[i - 1]
+        state[i] = (state[i] ^ ((previous ^ (previous >> 30)) * np.uint32(1566083941))) - np.uint32(i)
+        if i == MT_SIZE - 1:
+            state[0], i = state[i], 0
+    state[0] = MT_UPPER
+    return state
+
+
+def placement_tables(rules: Rules, length: int) -> tuple:
+    """
+    Returns cell indexes of every placement of a ship of a length (in the order of BitTables.placement_cells)
+    and of the blocks around it, (placements, length) and (placements, 2 * length + 6) arrays.
+    Blocks around a ship that are off the grid are rules.cells
+    """
+    grid_size = rules.grid_size
+    cells = np.array(list(get_tables(rules).placement_cells[length]), dtype=np.int64).reshape(-1, length)
+    rows, columns = np.divmod(cells[:, :1], grid_size)
+    # Steps from the first block of a horizontal ship to the blocks around it (vertical ships swap them)
+    y_steps, x_steps = np.array(
+        [(y, x) for y in (-1, 0, 1) for x in range(-1, length + 1) if y or not 0 <= x < length]
+    ).T
+    vertical = (cells[:, -1:] - cells[:, :1]) > length - 1
+    y = rows + np.where(vertical, x_steps, y_steps)
+    x = columns + np.where(vertical, y_steps, x_steps)
+    on_grid = (x >= 0) & (x < grid_size) & (y >= 0) & (y < grid_size)
+    return cells, np.where(on_grid, y * grid_size + x, rules.cells)
+
+
+class LockstepRandom:
+    """
+    Random number generators of many games advanced with array operations: every game gets exactly
+    the numbers its random.Random would give it
+    ----------
+    Attributes:
+        state (ndarray): words of every generator, (games, MT_SIZE) uint32
+        index (ndarray): position of the next word of every generator
+    ----------
+    Methods:
+        below(games, n): Returns a random int below n for every game, as Random.randrange(n) does
+        getstate(game): Returns the state of a game's generator as Random.getstate() does
+        setstate(game, state): Restores the state of a game's generator from Random.getstate()
+    """
+
+    def __init__(self, seeds: list) -> None:
+        """
+        Seeds every generator as Random(seed) does with an int seed: with the 32-bit words of abs(seed)
+        as the key (generators with keys of the same length are seeded together)
+        """
+        keys = [
+            [(abs(seed) >> shift) & 0xFFFFFFFF for shift in range(0, max(abs(seed).bit_length(), 1), 32)]
+            for seed in seeds
+        ]
+        self.state = np.empty((len(keys), MT_SIZE), dtype=np.uint32)
+        self.index = np.full(len(keys), MT_SIZE, dtype=np.int64)
+        for key_length in set(map(len, keys)):
+            games = [game for game, key in enumerate(keys) if len(key) == key_length]
+            self.state[games] = seed_by_array(np.array([keys[game] for game in games], dtype=np.uint32)).T
+
+    def below(self, games: np.ndarray, n: np.ndarray) -> np.ndarray:
+        """
+        Returns a random int below n for every game (each game once at most): the top bits of the next words,
+        as many as n has, until they are below n
+        """
+        bits = np.frexp(n)[1]
+        shifts = (32 - bits).astype(np.uint32)
+        result = np.empty(games.size, dtype=np.int64)
+        pending = np.arange(games.size)
+        while pending.size:
+            numbers = self.__words(games[pending]) >> shifts[pending]
+            accepted = numbers < n[pending]
+            result[pending[accepted]] = numbers[accepted]
+            pending = pending[~accepted]
+        return result
+
+    def getstate(self, game: int) -> tuple:
+        return Random.VERSION, tuple(int(word) for word in self.state[game]) + (int(self.index[game]),), None
+
+    def setstate(self, game: int, state: tuple) -> None:
+        self.state[game] = state[1][:MT_SIZE]
+        self.index[game] = state[1][MT_SIZE]
+
+    def __words(self, games: np.ndarray) -> np.ndarray:
+        """
+        Returns the next tempered word of every game's generator
+        """
+        used_up = games[self.index[games] >= MT_SIZE]
+        if used_up.size:
+            self.state[used_up] = twist(self.state[used_up])
+            self.index[used_up] = 0
+        words = self.state[games, self.index[games]]
+        self.index[games] += 1
+        words ^= words >> 11
+        words ^= (words << 7) & 0x9D2C5680
+        words ^= (words << 15) & 0xEFC60000
+        words ^= words >> 18
+        return words
+
+
+class LockstepGames:
+    """
+    Games of computer shooting at fleets on the human grid, advanced in lockstep: every step fires one shot
+    in every game that is not finished and resolves hits, destroyed ships and dots (as BitBoard.fire and
+    check_hit_or_miss do) for all of them with array operations.
+    Blocks are numbered in sorted order of their (x, y) coordinates in flat arrays of (games, cells), which is
+    the order of GameState.computer_available_to_fire_set before the first shot and of the blocks computer_shoots
+    chooses from around its last hits. ship_ids and shots are (games, rows, columns) views of them.
+    The available blocks are kept in the same order as in GameState.computer_available_to_fire_set,
+    so that random choices pick the same blocks
+    ----------
+    Attributes:
+        rules (Rules): size of the grid and the fleet
+        policy (str): how computer chooses blocks (one of POLICIES)
+        seeds (list of ints): seed of every game (as in GameState)
+        random (LockstepRandom): random number generators of the games
+        ship_ids (ndarray): index of the ship in every block, -1 in empty blocks
+        shots (ndarray): UNKNOWN, DOTTED or HIT in every block
+        blocks_left (ndarray): blocks of every ship that are not hit yet, (games, ships)
+        shots_fired (ndarray): number of shots in every game
+        misses (ndarray): number of misses in every game
+        finished (ndarray): whether every ship of a game is destroyed
+    ----------
+    Methods:
+        step(): Fires one shot in every game that is not finished
+        run(): Steps until every game is finished
+    """
+
+    def __init__(
+        self,
+        seeds: list,
+        policy: str = "hunt_target",
+        rules: Rules = CLASSIC_RULES,
+        corpus: Optional[FleetCorpus] = None,
+    ) -> None:
+        """
+        Places the fleet of every game with its generator (as tournament.play_game does)
+        Args:
+            seeds (list of ints): seed of every game
+            policy (str, optional): one of POLICIES. Defaults to "hunt_target".
+            rules (Rules, optional): size of the grid and the fleet. Defaults to CLASSIC_RULES.
+            corpus (FleetCorpus, optional): pre-generated fleets to draw from. Defaults to None.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy {policy}, expected one of {POLICIES}")
+        self.rules = rules
+        self.policy = policy
+        self.seeds = list(seeds)
+        games, grid_size, cells = len(self.seeds), rules.grid_size, rules.cells
+        # Block of every cell index (see elements.bitboard) and the other way round
+        rows, columns = np.divmod(np.arange(cells), grid_size)
+        self.__cell_blocks = columns * grid_size + rows
+        self.__block_cells = np.argsort(self.__cell_blocks)
+        self.random = LockstepRandom(self.seeds)
+        self.__placements = {length: placement_tables(rules, length) for length in set(rules.fleet)}
+        placements = self.__place_fleets(corpus)
+        # Cells of every ship of every game and blocks around it (padded with cells, which stands for no block)
+        ship_cells = []
+        self.__halos = np.full((games, len(rules.fleet), 2 * max(rules.fleet) + 6), cells, dtype=np.int64)
+        padded_cell_blocks = np.append(self.__cell_blocks, cells)
+        for ship, length in enumerate(rules.fleet):
+            cells_table, halos_table = self.__placements[length]
+            ship_cells.append(cells_table[placements[:, ship]])
+            self.__halos[:, ship, : 2 * length + 6] = padded_cell_blocks[halos_table[placements[:, ship]]]
+        ship_cells = np.concatenate(ship_cells, axis=1)
+        self.__ship_ids = np.full((games, cells), -1, dtype=np.int16)
+        self.__ship_ids[np.arange(games)[:, None], self.__cell_blocks[ship_cells]] = np.repeat(
+            np.arange(len(rules.fleet), dtype=np.int16), rules.fleet
+        )
+        self.__shots = np.zeros((games, cells), dtype=np.int8)
+        self.ship_ids = self.__ship_ids.reshape(games, grid_size, grid_size).transpose(0, 2, 1)
+        self.shots = self.__shots.reshape(games, grid_size, grid_size).transpose(0, 2, 1)
+        self.blocks_left = np.tile(np.array(rules.fleet, dtype=np.int16), (games, 1))
+        self.shots_fired = np.zeros(games, dtype=np.int64)
+        self.misses = np.zeros(games, dtype=np.int64)
+        self.__blocks_afloat = self.blocks_left.sum(axis=1, dtype=np.int64)
+        self.finished = self.__blocks_afloat == 0
+        # The available blocks as IndexedSet keeps them: in a list, with the position of every block (-1 if removed)
+        self.__available = np.tile(np.arange(cells, dtype=np.int16), (games, 1))
+        self.__positions = self.__available.copy()
+        self.__available_count = np.full(games, cells, dtype=np.int64)
+        if policy == "hunt_target":
+            self.__around_last_hit = np.zeros((games, cells), dtype=bool)
+            self.__around_count = np.zeros(games, dtype=np.int64)
+            self.__last_hits = np.zeros((games, cells), dtype=bool)
+
+    def step(self) -> None:
+        games = np.flatnonzero(~self.finished)
+        if not games.size:
+            return
+        blocks, targeting = self.__choose(games)
+        self.__discard(games, blocks)
+        ids = self.__ship_ids[games, blocks]
+        hit = ids >= 0
+        self.shots_fired[games] += 1
+        self.misses[games[~hit]] += 1
+        self.__shots[games[~hit], blocks[~hit]] = DOTTED
+        hit_games, hit_blocks, hit_ids = games[hit], blocks[hit], ids[hit]
+        self.__shots[hit_games, hit_blocks] = HIT
+        self.__blocks_afloat[hit_games] -= 1
+        self.blocks_left[hit_games, hit_ids] -= 1
+        sunk = self.blocks_left[hit_games, hit_ids] == 0
+        # Dots appear on the diagonals of hits first, then around destroyed ships (on blocks not dotted yet)
+        dotted_games, dotted_blocks = self.__dot_neighbours(hit_games, hit_blocks, DIAGONAL_STEPS)
+        halo_games, halo_blocks = self.__dot_halos(hit_games[sunk], hit_ids[sunk])
+        new_games = np.concatenate((dotted_games, halo_games))
+        new_blocks = np.concatenate((dotted_blocks, halo_blocks))
+        # New dots are removed from the available blocks in the order of their cells (as check_hit_or_miss does)
+        order = np.lexsort((self.__block_cells[new_blocks], new_games))
+        self.__discard_in_order(new_games[order], new_blocks[order])
+        if self.policy == "hunt_target":
+            # Blocks around the last hits only change in games that shot at them or hit a ship
+            changed = targeting | hit
+            self.__update_around_last_hit(games[changed], blocks[changed], hit[changed], sunk)
+        self.finished[hit_games] = self.__blocks_afloat[hit_games] == 0
+
+    def run(self) -> None:
+        while not self.finished.all():
+            self.step()
+
+    def __place_fleets(self, corpus: Optional[FleetCorpus]) -> np.ndarray:
+        """
+        Places the fleet of every game as AutoShips.place_fleet does (or draws it as FleetCorpus.random_placements
+        does), ship after ship in all games at once. Games where some ship has no valid placement left
+        (place_fleet backtracks there) are placed again with their own Random, one at a time
+        Returns:
+            ndarray: placement index of every ship of every game, (games, ships)
+        """
+        fleet = self.rules.fleet
+        all_games = np.arange(len(self.seeds))
+        if corpus is not None:
+            numbers = self.random.below(all_games, np.full(all_games.size, len(corpus)))
+            return np.array([corpus.placements(int(number)) for number in numbers], dtype=np.int64).reshape(
+                all_games.size, len(fleet)
+            )
+        placements = np.zeros((all_games.size, len(fleet)), dtype=np.int64)
+        # Cells taken by the ships placed so far and cells next to them (the last column stands for no cell)
+        blocked = np.zeros((all_games.size, self.rules.cells + 1), dtype=bool)
+        backtracking = np.zeros(all_games.size, dtype=bool)
+        for ship, length in enumerate(fleet):
+            cells, halos = self.__placements[length]
+            pending = all_games[~backtracking]
+            for _ in range(SAMPLING_ATTEMPTS):
+                if not pending.size:
+                    break
+                guesses = self.random.below(pending, np.full(pending.size, len(cells)))
+                free = ~blocked[pending[:, None], cells[guesses]].any(axis=1)
+                placements[pending[free], ship] = guesses[free]
+                pending = pending[~free]
+            if pending.size:
+                # The valid placements are listed and one of them is chosen
+                valid = ~blocked[pending[:, None, None], cells].any(axis=2)
+                counts = valid.sum(axis=1)
+                backtracking[pending[counts == 0]] = True
+                pending, valid, counts = pending[counts > 0], valid[counts > 0], counts[counts > 0]
+                choices = self.random.below(pending, counts)
+                placements[pending, ship] = np.argmax(np.cumsum(valid, axis=1) > choices[:, None], axis=1)
+            placed = all_games[~backtracking]
+            chosen = placements[placed, ship]
+            blocked[placed[:, None], np.concatenate((cells[chosen], halos[chosen]), axis=1)] = True
+        for game in np.flatnonzero(backtracking):
+            generator = Random(self.seeds[game])
+            placements[game] = AutoShips.place_fleet(generator, self.rules)
+            self.random.setstate(game, generator.getstate())
+        return placements
+
+    def __choose(self, games: np.ndarray) -> tuple:
+        """
+        Chooses a block for every game as rng.choice does in computer_shoots: around the last hit
+        (among those blocks in sorted order) if there are such blocks, among the available ones otherwise
+        Returns:
+            tuple: block of every game and whether it was chosen around the last hit
+        """
+        blocks = np.empty(games.size, dtype=np.int64)
+        targeting = np.zeros(games.size, dtype=bool)
+        if self.policy == "hunt_target":
+            targeting = self.__around_count[games] > 0
+        hunting_games, targeting_games = games[~targeting], games[targeting]
+        choices = self.random.below(hunting_games, self.__available_count[hunting_games])
+        blocks[~targeting] = self.__available[hunting_games, choices]
+        if targeting_games.size:
+            choices = self.random.below(targeting_games, self.__around_count[targeting_games])
+            around = self.__around_last_hit[targeting_games]
+            blocks[targeting] = np.argmax(np.cumsum(around, axis=1) > choices[:, None], axis=1)
+        return blocks, targeting
+
+    def __discard(self, games: np.ndarray, blocks: np.ndarray) -> None:
+        """
+        Removes a block from the available ones of every game (each game once at most) as IndexedSet.discard does:
+        the last block takes the place of the removed one
+        """
+        positions = self.__positions[games, blocks].astype(np.int64)
+        present = positions >= 0
+        games, blocks, positions = games[present], blocks[present], positions[present]
+        self.__positions[games, blocks] = -1
+        self.__available_count[games] -= 1
+        last = self.__available[games, self.__available_count[games]]
+        moved = positions < self.__available_count[games]
+        self.__available[games[moved], positions[moved]] = last[moved]
+        self.__positions[games[moved], last[moved]] = positions[moved]
+
+    def __discard_in_order(self, games: np.ndarray, blocks: np.ndarray) -> None:
+        """
+        Removes blocks from the available ones, every game's blocks in the order they are given in
+        (pairs of games and blocks sorted by games)
+        """
+        if not games.size:
+            return
+        starts = np.flatnonzero(np.concatenate(([True], games[1:] != games[:-1])))
+        ranks = np.arange(games.size) - np.repeat(starts, np.diff(np.append(starts, games.size)))
+        for rank in range(ranks.max() + 1):
+            same_rank = ranks == rank
+            self.__discard(games[same_rank], blocks[same_rank])
+
+    def __neighbours(self, blocks: np.ndarray, steps: tuple) -> tuple:
+        """
+        Returns the indexes of blocks (in the given array) and their neighbours on the grid, one step after another
+        """
+        grid_size = self.rules.grid_size
+        columns, rows = np.divmod(blocks, grid_size)
+        indexes, neighbours = [], []
+        for x_step, y_step in steps:
+            x, y = columns + x_step, rows + y_step
+            on_grid = (x >= 0) & (x < grid_size) & (y >= 0) & (y < grid_size)
+            indexes.append(np.flatnonzero(on_grid))
+            neighbours.append(x[on_grid] * grid_size + y[on_grid])
+        return np.concatenate(indexes), np.concatenate(neighbours)
+
+    def __dot_neighbours(self, games: np.ndarray, blocks: np.ndarray, steps: tuple) -> tuple:
+        """
+        Dots unknown neighbours of a block in every game
+        Returns:
+            tuple: games and blocks of the new dots
+        """
+        indexes, neighbours = self.__neighbours(blocks, steps)
+        games = games[indexes]
+        unknown = self.__shots[games, neighbours] == UNKNOWN
+        games, neighbours = games[unknown], neighbours[unknown]
+        self.__shots[games, neighbours] = DOTTED
+        return games, neighbours
+
+    def __dot_halos(self, games: np.ndarray, ids: np.ndarray) -> tuple:
+        """
+        Dots unknown blocks around a destroyed ship in every game
+        Returns:
+            tuple: games and blocks of the new dots
+        """
+        halos = self.__halos[games, ids]
+        indexes, columns = np.nonzero(halos < self.rules.cells)
+        games, blocks = games[indexes], halos[indexes, columns]
+        unknown = self.__shots[games, blocks] == UNKNOWN
+        games, blocks = games[unknown], blocks[unknown]
+        self.__shots[games, blocks] = DOTTED
+        return games, blocks
+
+    def __update_around_last_hit(
+        self, games: np.ndarray, blocks: np.ndarray, hit: np.ndarray, sunk: np.ndarray
+    ) -> None:
+        """
+        Updates the blocks to shoot at around the last hits as update_around_last_computer_hit does
+        Args:
+            games, blocks (ndarray): games and the blocks they shot at
+            hit (ndarray): whether every shot was a hit
+            sunk (ndarray): whether every hit destroyed a ship
+        """
+        around, last_hits = self.__around_last_hit, self.__last_hits
+        around[games[~hit], blocks[~hit]] = False
+        hit_games, hit_blocks = games[hit], blocks[hit]
+        last_hits[hit_games, hit_blocks] = True
+        in_around = around[hit_games, hit_blocks]
+        first_games, first_blocks = hit_games[~in_around], hit_blocks[~in_around]
+        indexes, neighbours = self.__neighbours(first_blocks, CROSS_STEPS)
+        around[first_games[indexes], neighbours] = True
+        twice_games = hit_games[in_around]
+        around[twice_games] = self.__around_hits(last_hits[twice_games])
+        # Only unknown blocks are kept, they are not available any more (removed in sorted order)
+        indexes, around_blocks = np.nonzero(around[games])
+        around_games = games[indexes]
+        known = self.__shots[around_games, around_blocks] != UNKNOWN
+        around[around_games[known], around_blocks[known]] = False
+        self.__discard_in_order(around_games[~known], around_blocks[~known])
+        self.__around_count[games] = np.bincount(indexes[~known], minlength=games.size)
+        sunk_games = hit_games[sunk]
+        around[sunk_games] = False
+        self.__around_count[sunk_games] = 0
+        last_hits[sunk_games] = False
+
+    def __around_hits(self, last_hits: np.ndarray) -> np.ndarray:
+        """
+        Returns the blocks before and after every two hits that follow each other in sorted order and are
+        in the same column or row (as computer_hits_twice does)
+        """
+        grid_size, cells = self.rules.grid_size, self.rules.cells
+        games = last_hits.shape[0]
+        around = np.zeros((games, cells), dtype=bool)
+        positions = np.where(last_hits, np.arange(cells), cells)
+        # The next hit after every block (cells if there is none)
+        next_hits = np.minimum.accumulate(positions[:, ::-1], axis=1)[:, ::-1]
+        next_hits = np.concatenate((next_hits[:, 1:], np.full((games, 1), cells)), axis=1)
+        indexes, first = np.nonzero(last_hits & (next_hits < cells))
+        second = next_hits[indexes, first]
+        x1, y1 = np.divmod(first, grid_size)
+        x2, y2 = np.divmod(second, grid_size)
+        column = x1 == x2
+        row = ~column & (y1 == y2)
+        last = grid_size - 1
+        for condition, x, y in (
+            (column & (y1 > 0), x1, y1 - 1),
+            (column & (y2 < last), x1, y2 + 1),
+            (row & (x1 > 0), x1 - 1, y1),
+            (row & (x2 < last), x2 + 1, y1),
+        ):
+            around[indexes[condition], x[condition] * grid_size + y[condition]] = True
+        return around
+
+
+def simulate(
+    seeds: list,
+    policy: str = "hunt_target",
+    rules: Rules = CLASSIC_RULES,
+    corpus: Optional[FleetCorpus] = None,
+    batch: int = BATCH_SIZE,
+) -> tuple:
+    """
+    Plays games in batches of LockstepGames
+    Returns:
+        tuple: shots and misses of every game (arrays)
+    """
+    shots, misses = [], []
+    for start in range(0, len(seeds), batch):
+        games = LockstepGames(seeds[start : start + batch], policy, rules, corpus)
+        games.run()
+        shots.append(games.shots_fired)
+        misses.append(games.misses)
+    return np.concatenate(shots), np.concatenate(misses)
+
+
+def uniform_shoots(*, state: GameState) -> tuple:
+    """
+    The uniform policy of a single game (called like computer_shoots): a random available block
+    """
+    computer_fired_block = state.rng.choice(state.computer_available_to_fire_set)
+    state.computer_available_to_fire_set.discard(computer_fired_block)
+    return computer_fired_block
+
+
+def sink_fleet(state: GameState, fleet: AutoShips, policy: str = "hunt_target") -> tuple:
+    """
+    Plays a game of LockstepGames one shot at a time: through check_hit_or_miss with computer_shoots
+    (as tournament.sink_fleet does) or, with the uniform policy, on the bitboard with only dots removed
+    from the available blocks (blocks around hits are not set aside for later shots)
+    Returns:
+        tuple: number of shots and number of misses it took
+    """
+    # Imported here, since the tournament's pool and strategies are only needed to check games
+    from game_logic import get_board
+    from tournament import sink_fleet as sink_fleet_through_game_logic
+
+    if policy == "hunt_target":
+        return sink_fleet_through_game_logic(computer_shoots, state, fleet)
+    rules = state.rules
+    board = get_board(state=state, computer_turn=True, opponents_ships_list_original_copy=fleet.ships)
+    shots = misses = 0
+    while not board.all_sunk:
+        fired_block = uniform_shoots(state=state)
+        dotted_before = board.dotted
+        if not board.fire(block_to_index(fired_block, rules.human_offset, rules.grid_size)):
+            misses += 1
+        shots += 1
+        new_dotted_blocks = mask_to_blocks(board.dotted & ~dotted_before, rules.human_offset, rules.grid_size)
+        state.computer_available_to_fire_set.difference_update(new_dotted_blocks)
+    return shots, misses
+
+
+def check(
+    seeds: list, policy: str = "hunt_target", rules: Rules = CLASSIC_RULES, corpus: Optional[FleetCorpus] = None
+) -> list:
+    """
+    Plays games in lockstep and one at a time (see sink_fleet) and compares their shots, misses, grids
+    and the states of their random number generators at the end
+    Returns:
+        list: seeds of the games that differ
+    """
+    games = LockstepGames(seeds, policy, rules, corpus)
+    games.run()
+    hits = games.shots.reshape(len(seeds), -1) == HIT
+    dotted = games.shots.reshape(len(seeds), -1) == DOTTED
+    different = []
+    for game, seed in enumerate(seeds):
+        state = GameState(seed, rules)
+        fleet = AutoShips(rules.human_offset, rng=state.rng, corpus=corpus, rules=rules)
+        shots, misses = sink_fleet(state, fleet, policy)
+        board = state.boards[True]
+        if (
+            (shots, misses) != (games.shots_fired[game], games.misses[game])
+            or board.hits != int.from_bytes(np.packbits(hits[game], bitorder="little").tobytes(), "little")
+            or board.dotted != int.from_bytes(np.packbits(dotted[game], bitorder="little").tobytes(), "little")
+            or state.rng.getstate() != games.random.getstate(game)
+        ):
+            different.append(seed)
+    return different
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--games", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game (the next ones get the next seeds)")
+    parser.add_argument("--policy", choices=POLICIES, default="hunt_target")
+    parser.add_argument("--grid-size", type=int, default=GRID_SIZE, help="with the classic fleet scaled to it")
+    parser.add_argument("--corpus", help="file with pre-generated fleets (see elements.fleet_corpus)")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE, help="games kept in memory at once")
+    parser.add_argument("--check", type=int, default=0, help="games to compare with game_logic (0 - none)")
+    args = parser.parse_args()
+
+    rules = Rules.scaled(args.grid_size)
+    corpus = FleetCorpus(args.corpus) if args.corpus else None
+    if corpus is not None and corpus.rules != rules:
+        raise SystemExit(f"{args.corpus} has fleets of {corpus.rules}, not of {rules}")
+    seeds = list(range(args.seed, args.seed + args.games))
+    start = time.perf_counter()
+    shots, misses = simulate(seeds, args.policy, rules, corpus, args.batch)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{args.games} games in {elapsed:.2f}s ({args.games / elapsed:.0f} games/s): "
+        f"mean shots {shots.mean():.2f}, mean misses {misses.mean():.2f}, "
+        f"p50={int(np.percentile(shots, 50))} p95={int(np.percentile(shots, 95))}"
+    )
+    if args.check:
+        start = time.perf_counter()
+        different = check(seeds[: args.check], args.policy, rules, corpus)
+        elapsed = time.perf_counter() - start
+        if different:
+            sys.exit(f"{len(different)} of {args.check} games differ from game_logic, seeds {different[:10]}")
+        print(f"{args.check} games are the same as through game_logic (checked in {elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
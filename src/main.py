@@ -1,16 +1,25 @@
-import copy
+import argparse
+import atexit
+import os
+import random
 import sys
+from typing import Callable, Optional
 
 import pygame
 
+from ai import STRATEGIES
+from ai.worker import MOVE_DEADLINE, MoveWorker
 from elements.autoships import AutoShips
+from elements.bitboard import block_to_index
 from elements.constants import (
     AUTO_BUTTON_PLACE,
+    AUTO_COMPLETE_BUTTON_PLACE,
     BLACK,
-    BLOCK_SIZE,
+    FPS,
+    GAME_OVER_FONT_SIZE,
+    GRID_SIZE,
     HOW_TO_CREATE_SHIPS_MESSAGE,
     LEFT_MARGIN,
-    LETTERS,
     LIGHT_GRAY,
     MANUAL_BUTTON_PLACE,
     MESSAGE_RECT_COMPUTER,
@@ -22,6 +31,7 @@ from elements.constants import (
     RECT_FOR_HUMAN_SHIPS_COUNT,
     RECT_FOR_MESSAGES_AND_BUTTONS,
     SIZE,
+    TAKE_BACK_BUTTON_PLACE,
     UNDO_BUTTON_PLACE,
     UPPER_MARGIN,
     WHITE,
@@ -29,57 +39,180 @@ from elements.constants import (
     X_OFFSET_FOR_HUMAN_SHIPS_COUNT,
     Y_OFFSET_FOR_SHIPS_COUNT,
 )
-from game_logic import (
-    around_last_computer_hit_set,
-    check_hit_or_miss,
-    computer_destroyed_ships_count,
-    computer_shoots,
-    destroyed_computer_ships,
-    dotted_set,
-    dotted_set_for_computer_not_to_shoot,
-    hit_blocks,
-    hit_blocks_for_computer_not_to_shoot,
-    human_destroyed_ships_count,
-    last_hits_list,
-    update_used_blocks,
-)
+from elements.fleet_corpus import fleet_placements
+from elements.game_record import GameRecorder
+from elements.game_state import GameState
+from elements.rules import CLASSIC_RULES, Rules
+from game_logic import check_hit_or_miss, computer_shoots, update_used_blocks
 from graphics import Grid
 from graphics.button import Button
 from graphics.drawing import (
+    HEADLESS_ENV_VAR,
     draw_from_dotted_set,
     draw_hit_blocks,
     draw_ships,
-    font,
-    game_over_font,
+    get_font,
+    get_screen,
     print_destroyed_ships_count,
-    screen,
     show_message_at_rect_center,
 )
-from graphics.manual_ships import manually_create_new_ship
+from graphics.manual_ships import auto_complete_ships, manually_create_new_ship
+from graphics.text_cache import text_cache
+from instrumentation import WAIT_PHASE, profiler
+from network.client import Connection, apply_shot, parse_address
+from network.protocol import fleet_cells
 
-pygame.init()
+# Milliseconds between clicks of AutoPlayer in the demo mode
+DEMO_CLICK_DELAY = 250
 
 
-def main():
+class AutoPlayer:
     """
-    The main function of the game where the following things happen:
-    - decision how to create human ships (auto or manual)
-    - optional manual creation of human ships
-    - game loop
-    - exit from the game
+    Plays for human by posting mouse clicks to pygame's event queue, so that its games go through
+    the same event handling and drawing as human's ones: it clicks AUTO, shoots at random blocks of the computer grid
+    that have not been shot at or marked and clicks PLAY AGAIN (a demo mode and soak runs, see benchmarks.soak)
+    ----------
+    Attributes:
+        delay (int): milliseconds to wait before every click
+    ----------
+    Methods:
+        click(pos): Posts a click at a point of the screen
+        shoot(state): Posts a click at a block of the computer grid
+    """
+
+    def __init__(self, seed: Optional[int] = None, delay: int = 0) -> None:
+        self.delay = delay
+        self.__rng = random.Random(seed)
+
+    def click(self, pos: tuple) -> None:
+        if self.delay:
+            pygame.time.wait(self.delay)
+        pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=pos, button=1))
+
+    def shoot(self, state: GameState) -> None:
+        rules = state.rules
+        blocks = [
+            (x, y)
+            for x in range(1, rules.grid_size + 1)
+            for y in range(1, rules.grid_size + 1)
+            if (x, y) not in state.dotted_set and (x, y) not in state.hit_blocks
+        ]
+        x, y = self.__rng.choice(blocks)
+        cell_size = rules.cell_size
+        self.click(
+            (LEFT_MARGIN + (x - 1) * cell_size + cell_size // 2, UPPER_MARGIN + (y - 1) * cell_size + cell_size // 2)
+        )
+
+
+def draw_changed_blocks(state: GameState) -> list:
+    """
+    Draws dots and 'X's only in the blocks that changed since they were last drawn
+    Returns:
+        list: rectangles of the screen that were drawn on
+    """
+    blocks = state.blocks_to_draw
+    cell_size = state.rules.cell_size
+    rects = draw_from_dotted_set((block for block in blocks if block in state.dotted_set), cell_size=cell_size)
+    rects += draw_hit_blocks((block for block in blocks if block in state.hit_blocks), cell_size=cell_size)
+    blocks.clear()
+    return rects
+
+
+def draw_whole_game(state: GameState, grids: tuple, human_ships: list, font: pygame.font.Font) -> None:
+    """
+    Draws grids, human ships, dots, 'X's, destroyed computer ships and their counters from scratch
+    (e.g. after a game's state was restored), clearing the messages
+    """
+    screen = get_screen()
+    cell_size = state.rules.cell_size
+    screen.fill(WHITE, RECT_FOR_GRIDS)
+    screen.fill(WHITE, MESSAGE_RECT_COMPUTER)
+    screen.fill(WHITE, MESSAGE_RECT_HUMAN)
+    for grid in grids:
+        grid.draw()
+    draw_ships(human_ships, cell_size=cell_size)
+    draw_from_dotted_set(state.dotted_set, cell_size=cell_size)
+    draw_hit_blocks(state.hit_blocks, cell_size=cell_size)
+    draw_ships(state.destroyed_computer_ships, cell_size=cell_size)
+    draw_destroyed_ships_counts(state, font)
+    state.blocks_to_draw.clear()
+
+
+def draw_destroyed_ships_counts(state: GameState, font: pygame.font.Font) -> list:
+    """
+    Redraws the panels with numbers of destroyed ships of both sides
+    Returns:
+        list: rectangles of the screen that were drawn on
+    """
+    screen = get_screen()
+    rects = [screen.fill(WHITE, RECT_FOR_HUMAN_SHIPS_COUNT), screen.fill(WHITE, RECT_FOR_COMPUTER_SHIPS_COUNT)]
+    rects += print_destroyed_ships_count(
+        X_OFFSET_FOR_HUMAN_SHIPS_COUNT, Y_OFFSET_FOR_SHIPS_COUNT, state.human_destroyed_ships_count, font
+    )
+    rects += print_destroyed_ships_count(
+        X_OFFSET_FOR_COMPUTER_SHIPS_COUNT, Y_OFFSET_FOR_SHIPS_COUNT, state.computer_destroyed_ships_count, font
+    )
+    return rects
+
+
+def get_events(clock: pygame.time.Clock, idle: bool, fps: int = FPS) -> list:
+    """
+    Limits the frame rate and returns new events
+    Args:
+        clock (pygame Clock): clock of the loop
+        idle (bool): if nothing changes on the screen by itself, blocks until there is an event
+        fps (int, optional): maximum frames per second. Defaults to FPS.
+    Returns:
+        list: pygame events
+    """
+    profiler.end_frame()
+    with profiler.phase(WAIT_PHASE):
+        clock.tick(fps)
+    text_cache.new_frame()
+    if not idle:
+        return pygame.event.get()
+    with profiler.phase(WAIT_PHASE):
+        events = [pygame.event.wait()]
+    events += pygame.event.get()
+    return events
+
+
+def create_human_ships(
+    *,
+    rules: Rules,
+    rng: random.Random,
+    grids: tuple,
+    clock: pygame.time.Clock,
+    fps: int = FPS,
+    autoplayer: Optional[AutoPlayer] = None,
+) -> tuple:
+    """
+    Lets human decide how to create ships (AUTO or MANUAL button) and draw them with the mouse in the latter case
+    (AUTO-COMPLETE places the ships that are not drawn yet)
+    Args:
+        rules (Rules): size of the grids and the fleet
+        rng (Random): random number generator of automatically created ships
+        grids (tuple of Grids): grids to redraw while a ship is being drawn
+        clock (pygame Clock): clock of the loops
+        fps (int, optional): maximum frames per second. Defaults to FPS.
+        autoplayer (AutoPlayer, optional): clicks AUTO for human. Defaults to None.
+    Returns:
+        tuple: human ships (list of lists of blocks) and the set of all their blocks
     """
     ships_creation_not_decided = True
     ships_not_created = True
     drawing = False
-    game_over = False
-    computer_turn = False
     start = (0, 0)
     ship_size = (0, 0)
+    ship_frame_rect = pygame.Rect(start, ship_size)
 
     human_ships_to_draw = []
     human_ships_set = set()
     used_blocks_for_manual_drawing = set()
-    num_ships_list = [0, 0, 0, 0]
+    num_ships_list = [0] * rules.fleet[0]
+    cell_size = rules.cell_size
+    screen = get_screen()
+    font = get_font()
 
     # Create AUTO and MANUAL buttons and explanatory message for them
     auto_button = Button(AUTO_BUTTON_PLACE, "AUTO", HOW_TO_CREATE_SHIPS_MESSAGE, font)
@@ -87,64 +220,77 @@ def main():
 
     # Create UNDO message and button
     undo_button = Button(UNDO_BUTTON_PLACE, "UNDO LAST SHIP", "", font)
-
-    # Create PLAY AGAIN and QUIT buttons and message for them
-    play_again_button = Button(PLAY_AGAIN_BUTTON_PLACE, "PLAY AGAIN", PLAY_AGAIN_MESSAGE, font)
-    quit_game_button = Button(MANUAL_BUTTON_PLACE, "QUIT", PLAY_AGAIN_MESSAGE, font)
-
-    screen.fill(WHITE)
-    Grid(title="COMPUTER", offset=0, font=font, letters=LETTERS, line_color=BLACK, text_color=BLACK)  # type: ignore
-    Grid(title="HUMAN", offset=15, font=font, letters=LETTERS, line_color=BLACK, text_color=BLACK)  # type: ignore
-    # Create computer ships
-    computer = AutoShips(0)
-    computer_ships_working = copy.deepcopy(computer.ships)
+    auto_complete_button = Button(AUTO_COMPLETE_BUTTON_PLACE, "AUTO-COMPLETE", "", font)
 
     while ships_creation_not_decided:
-        auto_button.draw()
-        manual_button.draw()
-        auto_button.change_color_on_hover()
-        manual_button.change_color_on_hover()
-        auto_button.print_message()
-
-        mouse = pygame.mouse.get_pos()
-        for event in pygame.event.get():
+        with profiler.phase("drawing"):
+            auto_button.draw()
+            manual_button.draw()
+            auto_button.change_color_on_hover()
+            manual_button.change_color_on_hover()
+            auto_button.print_message()
+        with profiler.phase("display"):
+            pygame.display.update()
+
+        if autoplayer:
+            autoplayer.click(auto_button.rect.center)
+        for event in get_events(clock, idle=True, fps=fps):
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
             # If AUTO button is pressed - create human ships automatically
-            elif event.type == pygame.MOUSEBUTTONDOWN and auto_button.rect.collidepoint(mouse):
-                human = AutoShips(15)
+            elif event.type == pygame.MOUSEBUTTONDOWN and auto_button.rect.collidepoint(event.pos):
+                human = AutoShips(rules.human_offset, rng=rng, rules=rules)
                 human_ships_to_draw = human.ships
-                human_ships_working = copy.deepcopy(human.ships)
                 human_ships_set = human.ships_set
                 ships_creation_not_decided = False
                 ships_not_created = False
-            elif event.type == pygame.MOUSEBUTTONDOWN and manual_button.rect.collidepoint(mouse):
+            elif event.type == pygame.MOUSEBUTTONDOWN and manual_button.rect.collidepoint(event.pos):
                 ships_creation_not_decided = False
 
-        pygame.display.update()
         screen.fill(WHITE, RECT_FOR_MESSAGES_AND_BUTTONS)
 
     while ships_not_created:
-        screen.fill(WHITE, RECT_FOR_GRIDS)
-        Grid(title="COMPUTER", offset=0, font=font, letters=LETTERS, line_color=BLACK, text_color=BLACK)  # type: ignore
-        Grid(title="HUMAN", offset=15, font=font, letters=LETTERS, line_color=BLACK, text_color=BLACK)
-        undo_button.draw()
-        undo_button.print_message()
-        undo_button.change_color_on_hover()
-        mouse = pygame.mouse.get_pos()
-        if not human_ships_to_draw:
-            undo_button.draw(LIGHT_GRAY)
-        for event in pygame.event.get():
+        # Grids cover everything but the frame of a ship being drawn, which can stick out of them
+        with profiler.phase("drawing"):
+            screen.fill(WHITE, ship_frame_rect)
+            for grid in grids:
+                grid.draw()
+            undo_button.draw()
+            undo_button.print_message()
+            undo_button.change_color_on_hover()
+            if not human_ships_to_draw:
+                undo_button.draw(LIGHT_GRAY)
+            auto_complete_button.draw()
+            auto_complete_button.change_color_on_hover()
+            ship_frame_rect = pygame.draw.rect(screen, BLACK, (start, ship_size), 3)
+            draw_ships(human_ships_to_draw, cell_size=cell_size)
+        with profiler.phase("display"):
+            pygame.display.update()
+
+        for event in get_events(clock, idle=True, fps=fps):
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
-            elif undo_button.rect.collidepoint(mouse) and event.type == pygame.MOUSEBUTTONDOWN:
+            elif event.type == pygame.MOUSEBUTTONDOWN and undo_button.rect.collidepoint(event.pos):
                 if human_ships_to_draw:
                     screen.fill(WHITE, RECT_FOR_MESSAGES_AND_BUTTONS)
                     deleted_ship = human_ships_to_draw.pop()
                     num_ships_list[len(deleted_ship) - 1] -= 1
-                    update_used_blocks(ship=deleted_ship, method=used_blocks_for_manual_drawing.discard)
+                    human_ships_set.difference_update(deleted_ship)
+                    # Blocks around the deleted ship may be around other ships too
+                    used_blocks_for_manual_drawing.clear()
+                    for ship in human_ships_to_draw:
+                        update_used_blocks(ship=ship, method=used_blocks_for_manual_drawing.add)
+            elif event.type == pygame.MOUSEBUTTONDOWN and auto_complete_button.rect.collidepoint(event.pos):
+                auto_complete_ships(
+                    human_ships_to_draw=human_ships_to_draw,
+                    human_ships_set=human_ships_set,
+                    used_blocks_for_manual_drawing=used_blocks_for_manual_drawing,
+                    num_ships_list=num_ships_list,
+                    rng=rng,
+                    rules=rules,
+                )
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 drawing = True
                 x_start, y_start = event.pos
@@ -166,113 +312,437 @@ def main():
                     y_start=y_start,
                     x_end=x_end,
                     y_end=y_end,
+                    rules=rules,
                 )
-            if len(human_ships_to_draw) == 10:
+            if len(human_ships_to_draw) == len(rules.fleet):
                 ships_not_created = False
-                human_ships_working = copy.deepcopy(human_ships_to_draw)
                 screen.fill(WHITE, RECT_FOR_MESSAGES_AND_BUTTONS)
-        pygame.draw.rect(screen, BLACK, (start, ship_size), 3)
-        draw_ships(human_ships_to_draw)
-        pygame.display.update()
+
+    return human_ships_to_draw, human_ships_set
+
+
+def play_one_game(
+    computer_strategy: Callable = computer_shoots,
+    fps: int = FPS,
+    rules: Rules = CLASSIC_RULES,
+    recorder: Optional[GameRecorder] = None,
+    autoplayer: Optional[AutoPlayer] = None,
+    move_deadline: float = MOVE_DEADLINE,
+) -> bool:
+    """
+    Plays one game where the following things happen:
+    - creation of human ships (see create_human_ships)
+    - game loop
+    - choice between playing again and quitting
+    Everything the game creates (its state, fleets, grids and buttons) is dropped when it returns.
+    Args:
+        computer_strategy (callable, optional): how computer chooses blocks to shoot at. Defaults to computer_shoots.
+        fps (int, optional): maximum frames per second. Defaults to FPS.
+        rules (Rules, optional): size of the grids and the fleet. Defaults to CLASSIC_RULES.
+        recorder (GameRecorder, optional): records the game (human is the first player). Defaults to None.
+        autoplayer (AutoPlayer, optional): plays for human. Defaults to None.
+        move_deadline (float, optional): seconds computer may think about a move (see MoveWorker).
+            Defaults to MOVE_DEADLINE.
+    Returns:
+        bool: True if PLAY AGAIN was clicked, False if QUIT was
+    """
+    game_over = False
+    computer_turn = False
+    # The seed is chosen here to be recorded with the game
+    state = GameState(random.getrandbits(64), rules)
+    cell_size = rules.cell_size
+    grid_width = rules.grid_size * cell_size
+    clock = pygame.time.Clock()
+    worker = MoveWorker(computer_strategy, move_deadline)
+    screen = get_screen()
+    font = get_font()
+    game_over_font = get_font(GAME_OVER_FONT_SIZE)
+
+    # Create TAKE BACK button
+    take_back_button = Button(TAKE_BACK_BUTTON_PLACE, "TAKE BACK", "", font)
+
+    # Create PLAY AGAIN and QUIT buttons and message for them
+    play_again_button = Button(PLAY_AGAIN_BUTTON_PLACE, "PLAY AGAIN", PLAY_AGAIN_MESSAGE, font)
+    quit_game_button = Button(MANUAL_BUTTON_PLACE, "QUIT", PLAY_AGAIN_MESSAGE, font)
+
+    screen.fill(WHITE)
+    computer_grid = Grid(title="COMPUTER", offset=0, font=font, rules=rules, line_color=BLACK, text_color=BLACK)
+    human_grid = Grid(
+        title="HUMAN", offset=rules.human_offset, font=font, rules=rules, line_color=BLACK, text_color=BLACK
+    )
+    computer_grid.draw()
+    human_grid.draw()
+    # Create computer ships
+    computer = AutoShips(0, rng=state.rng, rules=rules)
+
+    human_ships_to_draw, human_ships_set = create_human_ships(
+        rules=rules, rng=state.rng, grids=(computer_grid, human_grid), clock=clock, fps=fps, autoplayer=autoplayer
+    )
+
+    # The whole field is drawn once, after that only blocks and panels that changed are redrawn
+    draw_ships(human_ships_to_draw, cell_size=cell_size)
+    show_message_at_rect_center("GAME STARTED! YOUR MOVE!", MESSAGE_RECT_COMPUTER)
+    pygame.display.update()
+    dirty_rects = []
+    drawn_destroyed_ships = 0
+    drawn_ships_counts = None
+    # Snapshots of the game before every human shot and numbers of shots fired before it, to take shots back
+    history = []
+    shots = 0
+    if recorder:
+        recorder.start_game(
+            state.seed,
+            (
+                fleet_placements(human_ships_to_draw, rules.human_offset, rules),
+                fleet_placements(computer.ships, 0, rules),
+            ),
+            rules,
+            humans=(0,),
+        )
 
     while not game_over:
-        screen.fill(WHITE, RECT_FOR_HUMAN_SHIPS_COUNT)
-        screen.fill(WHITE, RECT_FOR_COMPUTER_SHIPS_COUNT)
-        if not dotted_set | hit_blocks:
-            show_message_at_rect_center("GAME STARTED! YOUR MOVE!", MESSAGE_RECT_COMPUTER)
-        for event in pygame.event.get():
+        if autoplayer and not computer_turn:
+            autoplayer.shoot(state)
+        # Computer shoots without waiting for human's input
+        for event in get_events(clock, idle=not computer_turn, fps=fps):
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
-            elif not computer_turn and event.type == pygame.MOUSEBUTTONDOWN:
+            # Clicks after the last computer ship is destroyed (in the same frame) are not shots
+            elif not computer_turn and computer.ships_set and event.type == pygame.MOUSEBUTTONDOWN:
                 x, y = event.pos
-                if (LEFT_MARGIN < x < LEFT_MARGIN + 10 * BLOCK_SIZE) and (
-                    UPPER_MARGIN < y < UPPER_MARGIN + 10 * BLOCK_SIZE
-                ):
-                    fired_block = ((x - LEFT_MARGIN) // BLOCK_SIZE + 1, (y - UPPER_MARGIN) // BLOCK_SIZE + 1)
-                    computer_turn = not check_hit_or_miss(
-                        fired_block=fired_block,
-                        opponents_ships_list=computer_ships_working,
-                        computer_turn=False,
-                        opponents_ships_list_original_copy=computer.ships,
-                        opponents_ships_set=computer.ships_set,
-                        computer=computer,
-                    )
+                if take_back_button.rect.collidepoint(event.pos):
+                    if not history:
+                        continue
+                    # Human's last shot and computer's shots after it
+                    snapshot, shots_before = history.pop()
+                    with profiler.phase("logic"):
+                        state.restore(snapshot)
+                        for ships, ships_set in (
+                            (human_ships_to_draw, human_ships_set),
+                            (computer.ships, computer.ships_set),
+                        ):
+                            ships_set.clear()
+                            ships_set.update(block for ship in ships for block in ship if block not in state.hit_blocks)
+                    if recorder:
+                        recorder.take_back(shots - shots_before)
+                    shots = shots_before
+                    with profiler.phase("drawing"):
+                        draw_whole_game(state, (computer_grid, human_grid), human_ships_to_draw, font)
+                        show_message_at_rect_center("SHOT TAKEN BACK! YOUR MOVE!", MESSAGE_RECT_COMPUTER)
+                    drawn_destroyed_ships = len(state.destroyed_computer_ships)
+                    drawn_ships_counts = None
+                    with profiler.phase("display"):
+                        pygame.display.update()
+                elif (LEFT_MARGIN < x < LEFT_MARGIN + grid_width) and (UPPER_MARGIN < y < UPPER_MARGIN + grid_width):
+                    fired_block = ((x - LEFT_MARGIN) // cell_size + 1, (y - UPPER_MARGIN) // cell_size + 1)
+                    history.append((state.snapshot(), shots))
+                    shots += 1
+                    with profiler.phase("logic"):
+                        computer_turn = not check_hit_or_miss(
+                            state=state,
+                            fired_block=fired_block,
+                            computer_turn=False,
+                            opponents_ships_list_original_copy=computer.ships,
+                            opponents_ships_set=computer.ships_set,
+                        )
+                    if recorder:
+                        recorder.add_shot(block_to_index(fired_block, 0, rules.grid_size))
 
-                    draw_from_dotted_set(dotted_set)
-                    draw_hit_blocks(hit_blocks)
-                    screen.fill(WHITE, MESSAGE_RECT_COMPUTER)
-                    show_message_at_rect_center(
-                        f"Your last shot: {LETTERS[fired_block[0]-1] + str(fired_block[1])}",
-                        MESSAGE_RECT_COMPUTER,
+                    dirty_rects.append(screen.fill(WHITE, MESSAGE_RECT_COMPUTER))
+                    dirty_rects.append(
+                        show_message_at_rect_center(
+                            f"Your last shot: {rules.block_name(fired_block, 0)}",
+                            MESSAGE_RECT_COMPUTER,
+                        )
                     )
                 else:
-                    show_message_at_rect_center("Your shot is outside of grid! Try again", MESSAGE_RECT_COMPUTER)
+                    dirty_rects.append(
+                        show_message_at_rect_center("Your shot is outside of grid! Try again", MESSAGE_RECT_COMPUTER)
+                    )
         if computer_turn:
-            fired_block = computer_shoots()
-            computer_turn = check_hit_or_miss(
-                fired_block=fired_block,
-                opponents_ships_list=human_ships_working,
-                computer_turn=True,
-                opponents_ships_list_original_copy=human_ships_to_draw,
-                opponents_ships_set=human_ships_set,
-                computer=computer,
-            )
+            with profiler.phase("ai"):
+                # The strategy thinks in another thread, frames go on until its move is ready
+                worker.start(state)
+            with profiler.phase(WAIT_PHASE):
+                # Without a frame rate limit frames would only take time from the strategy
+                fired_block = worker.poll(state, wait=0.0 if fps else worker.deadline)
+            if fired_block is not None:
+                with profiler.phase("logic"):
+                    computer_turn = check_hit_or_miss(
+                        state=state,
+                        fired_block=fired_block,
+                        computer_turn=True,
+                        opponents_ships_list_original_copy=human_ships_to_draw,
+                        opponents_ships_set=human_ships_set,
+                    )
+                shots += 1
+                if recorder:
+                    recorder.add_shot(block_to_index(fired_block, rules.human_offset, rules.grid_size))
+
+                with profiler.phase("drawing"):
+                    dirty_rects.append(screen.fill(WHITE, MESSAGE_RECT_HUMAN))
+                    dirty_rects.append(
+                        show_message_at_rect_center(
+                            f"Computer's last shot: {rules.block_name(fired_block, rules.human_offset)}",
+                            MESSAGE_RECT_HUMAN,
+                        )
+                    )
+        with profiler.phase("drawing"):
+            dirty_rects += draw_changed_blocks(state)
+            if len(state.destroyed_computer_ships) > drawn_destroyed_ships:
+                dirty_rects += draw_ships(state.destroyed_computer_ships[drawn_destroyed_ships:], cell_size=cell_size)
+                drawn_destroyed_ships = len(state.destroyed_computer_ships)
 
-            draw_from_dotted_set(dotted_set)
-            draw_hit_blocks(hit_blocks)
-            screen.fill(WHITE, MESSAGE_RECT_HUMAN)
-            show_message_at_rect_center(
-                f"Computer's last shot: {LETTERS[fired_block[0] - 16] + str(fired_block[1])}",
-                MESSAGE_RECT_HUMAN,
+            ships_counts = (
+                tuple(state.human_destroyed_ships_count.values()),
+                tuple(state.computer_destroyed_ships_count.values()),
             )
-        draw_ships(destroyed_computer_ships)
-        draw_ships(human_ships_to_draw)
-
-        if not computer.ships_set:
-            show_message_at_rect_center("YOU WIN!", (0, 0, SIZE[0], SIZE[1]), game_over_font)
-            game_over = True
-        if not human_ships_set:
-            show_message_at_rect_center("YOU LOSE!", (0, 0, SIZE[0], SIZE[1]), game_over_font)
-            game_over = True
-
-        print_destroyed_ships_count(
-            X_OFFSET_FOR_HUMAN_SHIPS_COUNT, Y_OFFSET_FOR_SHIPS_COUNT, human_destroyed_ships_count, font
-        )
-        print_destroyed_ships_count(
-            X_OFFSET_FOR_COMPUTER_SHIPS_COUNT, Y_OFFSET_FOR_SHIPS_COUNT, computer_destroyed_ships_count, font
-        )
-        pygame.display.update()
+            if ships_counts != drawn_ships_counts:
+                drawn_ships_counts = ships_counts
+                dirty_rects += draw_destroyed_ships_counts(state, font)
+
+            take_back_button.draw()
+            take_back_button.change_color_on_hover()
+            if computer_turn or not history:
+                take_back_button.draw(LIGHT_GRAY)
+            dirty_rects.append(take_back_button.rect)
+
+            if not computer.ships_set:
+                dirty_rects.append(show_message_at_rect_center("YOU WIN!", (0, 0, SIZE[0], SIZE[1]), game_over_font))
+                game_over = True
+                if recorder:
+                    recorder.end_game(0)
+            if not human_ships_set:
+                dirty_rects.append(show_message_at_rect_center("YOU LOSE!", (0, 0, SIZE[0], SIZE[1]), game_over_font))
+                game_over = True
+                if recorder:
+                    recorder.end_game(1)
+            overlay_rect = profiler.draw_overlay(screen, font)
+            if overlay_rect:
+                dirty_rects.append(overlay_rect)
+
+        if dirty_rects:
+            with profiler.phase("display"):
+                pygame.display.update(dirty_rects)
+            dirty_rects.clear()
 
     while game_over:
-        screen.fill(WHITE, RECT_FOR_MESSAGES_AND_BUTTONS)
-        play_again_button.draw()
-        play_again_button.print_message()
-        play_again_button.change_color_on_hover()
-        quit_game_button.draw()
-        quit_game_button.change_color_on_hover()
-
-        mouse = pygame.mouse.get_pos()
-        for event in pygame.event.get():
+        with profiler.phase("drawing"):
+            screen.fill(WHITE, RECT_FOR_MESSAGES_AND_BUTTONS)
+            play_again_button.draw()
+            play_again_button.print_message()
+            play_again_button.change_color_on_hover()
+            quit_game_button.draw()
+            quit_game_button.change_color_on_hover()
+        with profiler.phase("display"):
+            pygame.display.update()
+
+        if autoplayer:
+            autoplayer.click(play_again_button.rect.center)
+        for event in get_events(clock, idle=True, fps=fps):
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
-            elif event.type == pygame.MOUSEBUTTONDOWN and play_again_button.rect.collidepoint(mouse):
-                around_last_computer_hit_set.clear()
-                dotted_set_for_computer_not_to_shoot.clear()
-                hit_blocks_for_computer_not_to_shoot.clear()
-                last_hits_list.clear()
-                hit_blocks.clear()
-                dotted_set.clear()
-                destroyed_computer_ships.clear()
-                dotted_set.clear()
-                hit_blocks.clear()
-                main()
-            elif event.type == pygame.MOUSEBUTTONDOWN and quit_game_button.rect.collidepoint(mouse):
+            elif event.type == pygame.MOUSEBUTTONDOWN and play_again_button.rect.collidepoint(event.pos):
+                return True
+            elif event.type == pygame.MOUSEBUTTONDOWN and quit_game_button.rect.collidepoint(event.pos):
+                return False
+    return False
+
+
+def main(
+    computer_strategy: Callable = computer_shoots,
+    fps: int = FPS,
+    rules: Rules = CLASSIC_RULES,
+    recorder: Optional[GameRecorder] = None,
+    autoplayer: Optional[AutoPlayer] = None,
+    move_deadline: float = MOVE_DEADLINE,
+) -> None:
+    """
+    The main function of the game: plays games one after another (see play_one_game) until QUIT is clicked.
+    Games are played in a loop rather than by calling main again from PLAY AGAIN, so that a session can run
+    for days without piling up finished games.
+    Args:
+        computer_strategy (callable, optional): how computer chooses blocks to shoot at. Defaults to computer_shoots.
+        fps (int, optional): maximum frames per second. Defaults to FPS.
+        rules (Rules, optional): size of the grids and the fleet. Defaults to CLASSIC_RULES.
+        recorder (GameRecorder, optional): records the games (human is the first player). Defaults to None.
+        autoplayer (AutoPlayer, optional): plays for human (demo mode). Defaults to None.
+        move_deadline (float, optional): seconds computer may think about a move. Defaults to MOVE_DEADLINE.
+    """
+    while play_one_game(computer_strategy, fps, rules, recorder, autoplayer, move_deadline):
+        pass
+    pygame.quit()
+
+
+def play_online(connection: Connection, fps: int = FPS) -> None:
+    """
+    Plays a game against another human through a game server (see network.server):
+    - creation of human ships (see create_human_ships)
+    - waiting for an opponent
+    - game loop: shots are sent to the server, both grids show the results it sends back
+    - exit from the game
+    Args:
+        connection (Connection): connection to the server (its rules are used)
+        fps (int, optional): maximum frames per second. Defaults to FPS.
+    """
+    rules = connection.rules
+    state = GameState(rules=rules)
+    cell_size = rules.cell_size
+    grid_width = rules.grid_size * cell_size
+    clock = pygame.time.Clock()
+    screen = get_screen()
+    font = get_font()
+    game_over_font = get_font(GAME_OVER_FONT_SIZE)
+    quit_game_button = Button(MANUAL_BUTTON_PLACE, "QUIT", "", font)
+
+    screen.fill(WHITE)
+    opponent_grid = Grid(title="OPPONENT", offset=0, font=font, rules=rules, line_color=BLACK, text_color=BLACK)
+    human_grid = Grid(
+        title="YOU", offset=rules.human_offset, font=font, rules=rules, line_color=BLACK, text_color=BLACK
+    )
+    opponent_grid.draw()
+    human_grid.draw()
+    human_ships_to_draw, _ = create_human_ships(
+        rules=rules, rng=state.rng, grids=(opponent_grid, human_grid), clock=clock, fps=fps
+    )
+    connection.send({"type": "join", "fleet": fleet_cells(human_ships_to_draw, rules.human_offset, rules)})
+
+    draw_ships(human_ships_to_draw, cell_size=cell_size)
+    show_message_at_rect_center("WAITING FOR AN OPPONENT...", MESSAGE_RECT_COMPUTER)
+    pygame.display.update()
+    dirty_rects = []
+    drawn_destroyed_ships = 0
+    drawn_ships_counts = None
+    player = None
+    my_turn = False
+    game_over_message = None
+
+    while game_over_message is None:
+        # Not idle: the connection is polled every frame
+        for event in get_events(clock, idle=False, fps=fps):
+            if event.type == pygame.QUIT:
+                connection.close()
+                pygame.quit()
+                sys.exit()
+            elif my_turn and event.type == pygame.MOUSEBUTTONDOWN:
+                x, y = event.pos
+                if (LEFT_MARGIN < x < LEFT_MARGIN + grid_width) and (UPPER_MARGIN < y < UPPER_MARGIN + grid_width):
+                    fired_block = ((x - LEFT_MARGIN) // cell_size + 1, (y - UPPER_MARGIN) // cell_size + 1)
+                    connection.send({"type": "shot", "index": block_to_index(fired_block, 0, rules.grid_size)})
+                    # Until the server answers
+                    my_turn = False
+                else:
+                    dirty_rects.append(
+                        show_message_at_rect_center("Your shot is outside of grid! Try again", MESSAGE_RECT_COMPUTER)
+                    )
+
+        try:
+            messages = connection.receive()
+        except ConnectionError:
+            messages = []
+            game_over_message = "CONNECTION LOST!"
+        for message in messages:
+            if message["type"] == "start":
+                player = message["player"]
+                my_turn = player == 0
+                dirty_rects.append(screen.fill(WHITE, MESSAGE_RECT_COMPUTER))
+                dirty_rects.append(
+                    show_message_at_rect_center(
+                        "GAME STARTED! YOUR MOVE!" if my_turn else "GAME STARTED! OPPONENT'S MOVE!",
+                        MESSAGE_RECT_COMPUTER,
+                    )
+                )
+            elif message["type"] == "shot":
+                with profiler.phase("logic"):
+                    fired_block = apply_shot(state=state, message=message, player=player)
+                my_turn = message["turn"] == player
+                if message["player"] == player:
+                    rect, text = MESSAGE_RECT_COMPUTER, f"Your last shot: {rules.block_name(fired_block, 0)}"
+                else:
+                    rect = MESSAGE_RECT_HUMAN
+                    text = f"Opponent's last shot: {rules.block_name(fired_block, rules.human_offset)}"
+                dirty_rects.append(screen.fill(WHITE, rect))
+                dirty_rects.append(show_message_at_rect_center(text, rect))
+            elif message["type"] == "over":
+                game_over_message = "YOU WIN!" if message["winner"] == player else "YOU LOSE!"
+                if message["reason"] == "disconnect":
+                    game_over_message = "OPPONENT LEFT!"
+            elif message["type"] == "error":
+                # Only shots can be rejected (e.g. sent right after the turn passed)
+                my_turn = player is not None
+                dirty_rects.append(screen.fill(WHITE, MESSAGE_RECT_COMPUTER))
+                dirty_rects.append(show_message_at_rect_center(message["message"], MESSAGE_RECT_COMPUTER))
+
+        with profiler.phase("drawing"):
+            dirty_rects += draw_changed_blocks(state)
+            if len(state.destroyed_computer_ships) > drawn_destroyed_ships:
+                dirty_rects += draw_ships(state.destroyed_computer_ships[drawn_destroyed_ships:], cell_size=cell_size)
+                drawn_destroyed_ships = len(state.destroyed_computer_ships)
+            ships_counts = (
+                tuple(state.human_destroyed_ships_count.values()),
+                tuple(state.computer_destroyed_ships_count.values()),
+            )
+            if ships_counts != drawn_ships_counts:
+                drawn_ships_counts = ships_counts
+                dirty_rects += draw_destroyed_ships_counts(state, font)
+            if game_over_message:
+                dirty_rects.append(
+                    show_message_at_rect_center(game_over_message, (0, 0, SIZE[0], SIZE[1]), game_over_font)
+                )
+            overlay_rect = profiler.draw_overlay(screen, font)
+            if overlay_rect:
+                dirty_rects.append(overlay_rect)
+
+        if dirty_rects:
+            with profiler.phase("display"):
+                pygame.display.update(dirty_rects)
+            dirty_rects.clear()
+
+    connection.close()
+    while True:
+        with profiler.phase("drawing"):
+            screen.fill(WHITE, RECT_FOR_MESSAGES_AND_BUTTONS)
+            quit_game_button.draw()
+            quit_game_button.change_color_on_hover()
+        with profiler.phase("display"):
+            pygame.display.update()
+
+        for event in get_events(clock, idle=True, fps=fps):
+            if event.type == pygame.QUIT or (
+                event.type == pygame.MOUSEBUTTONDOWN and quit_game_button.rect.collidepoint(event.pos)
+            ):
                 pygame.quit()
                 sys.exit()
-        pygame.display.update()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(
+        description="Battleship game for a human playing against computer or another human"
+    )
+    parser.add_argument("--ai", choices=sorted(STRATEGIES), default="random", help="computer's strategy")
+    parser.add_argument("--fps", type=int, default=FPS, help="maximum frames per second")
+    parser.add_argument("--grid-size", type=int, default=GRID_SIZE, help="with the classic fleet scaled to it")
+    parser.add_argument("--record", help="file to append recordings of the games to (see replay.py)")
+    parser.add_argument(
+        "--connect", metavar="HOST[:PORT]", help="play against another human through a game server (its grid size)"
+    )
+    parser.add_argument("--headless", action="store_true", help="run without a window (SDL dummy video driver)")
+    parser.add_argument("--demo", action="store_true", help="computer plays for human too, game after game")
+    parser.add_argument(
+        "--move-deadline", type=float, default=MOVE_DEADLINE, help="seconds computer may think about a move"
+    )
+    args = parser.parse_args()
+    if args.headless:
+        os.environ[HEADLESS_ENV_VAR] = "1"
+    recorder = None
+    if args.record:
+        recorder = GameRecorder(args.record)
+        # Unfinished games are recorded as such when the window is closed
+        atexit.register(recorder.close)
+    if args.connect:
+        play_online(Connection(*parse_address(args.connect)), args.fps)
+    else:
+        autoplayer = AutoPlayer(delay=DEMO_CLICK_DELAY) if args.demo else None
+        main(STRATEGIES[args.ai], args.fps, Rules.scaled(args.grid_size), recorder, autoplayer, args.move_deadline)
@@ -0,0 +1 @@
+"""Human-vs-human games over the network: an asyncio server hosting many matches and its clients."""
@@ -0,0 +1,68 @@
+"""
+Scripted bots that play whole games on the game server over asyncio, used to test and load the server
+over loopback (see benchmarks.server_load).
+"""
+
+import asyncio
+import time
+from random import Random
+from typing import Optional
+
+from elements.autoships import AutoShips
+from elements.rules import Rules
+from network.protocol import MAX_LINE, decode, encode, fleet_cells
+
+
+async def play_bot(host: str, port: int, seed: int, latencies: Optional[list] = None) -> Optional[bool]:
+    """
+    Plays one game as a scripted bot: places an AutoShips fleet and shoots at random cells
+    that are not known to be empty yet
+    Args:
+        seed (int): seed of the fleet and of the shots
+        latencies (list, optional): seconds from sending every shot to receiving its result are appended to it
+    Returns:
+        bool: True if the bot won, False if it lost, None if the opponent disconnected
+    """
+    reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE)
+    try:
+        welcome = decode(await reader.readline())
+        rules = Rules.scaled(welcome["grid_size"])
+        rng = Random(seed)
+        fleet = AutoShips(0, rng=rng, rules=rules)
+        writer.write(encode({"type": "join", "fleet": fleet_cells(fleet.ships, 0, rules)}))
+        targets = list(range(rules.cells))
+        rng.shuffle(targets)
+        known = set()
+        player = None
+        sent = 0.0
+
+        def shoot() -> None:
+            nonlocal sent
+            while targets[-1] in known:
+                targets.pop()
+            sent = time.perf_counter()
+            writer.write(encode({"type": "shot", "index": targets.pop()}))
+
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError("The server has closed the connection")
+            message = decode(line)
+            if message["type"] == "start":
+                player = message["player"]
+                if player == 0:
+                    shoot()
+            elif message["type"] == "shot":
+                if message["player"] == player:
+                    if latencies is not None:
+                        latencies.append(time.perf_counter() - sent)
+                    known.update(message["dotted"])
+                    known.add(message["index"])
+                if message["turn"] == player:
+                    shoot()
+            elif message["type"] == "over":
+                return message["winner"] == player if message["reason"] == "fleet" else None
+            elif message["type"] == "error":
+                raise ValueError(f"The server rejected a message: {message['message']}")
+    finally:
+        writer.close()
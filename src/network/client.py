@@ -0,0 +1,108 @@
+"""
+Client side of network games for the pygame frontend: a connection to the game server (see network.protocol)
+that is polled every frame and updates of the frontend's game state from the server's messages.
+"""
+
+import select
+import socket
+
+from elements.bitboard import index_to_block
+from elements.game_state import GameState
+from elements.rules import Rules
+from game_logic import count_destroyed_ship
+from network.protocol import (
+    DEFAULT_PORT,
+    PROTOCOL_VERSION,
+    decode,
+    encode,
+)
+
+# Seconds to wait for the server to accept a connection and greet it
+CONNECT_TIMEOUT = 5.0
+RECEIVE_SIZE = 64 * 1024
+
+
+def parse_address(address: str) -> tuple:
+    """
+    Splits "host:port" (or just "host") into a host and a port
+    """
+    host, _, port = address.rpartition(":")
+    if not host:
+        return port, DEFAULT_PORT
+    return host, int(port)
+
+
+class Connection:
+    """
+    Connection to a game server that never blocks a frame once the server has greeted it
+    ----------
+    Attributes:
+        rules (Rules): rules of the server's games (the classic fleet scaled to its grid)
+    ----------
+    Methods:
+        send(message): Sends a message
+        receive(): Returns messages that have arrived, without waiting
+        close(): Closes the connection
+    """
+
+    def __init__(self, host: str, port: int = DEFAULT_PORT, timeout: float = CONNECT_TIMEOUT) -> None:
+        self.__socket = socket.create_connection((host, port), timeout=timeout)
+        self.__socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.__buffer = b""
+        while b"\n" not in self.__buffer:
+            self.__read()
+        welcome = self.receive()[0]
+        if welcome["type"] != "welcome" or welcome.get("version") != PROTOCOL_VERSION:
+            raise ConnectionError(f"{host}:{port} is not a compatible game server")
+        self.rules = Rules.scaled(welcome["grid_size"])
+        self.__socket.settimeout(None)
+
+    def send(self, message: dict) -> None:
+        self.__socket.sendall(encode(message))
+
+    def receive(self) -> list:
+        """
+        Returns messages that have arrived since the last call (an empty list if none have).
+        Raises ConnectionError if the server has closed the connection.
+        """
+        while select.select([self.__socket], [], [], 0)[0]:
+            self.__read()
+        *lines, self.__buffer = self.__buffer.split(b"\n")
+        return [decode(line) for line in lines]
+
+    def close(self) -> None:
+        self.__socket.close()
+
+    def __read(self) -> None:
+        data = self.__socket.recv(RECEIVE_SIZE)
+        if not data:
+            raise ConnectionError("The server has closed the connection")
+        self.__buffer += data
+
+
+def apply_shot(*, state: GameState, message: dict, player: int) -> tuple:
+    """
+    Updates the dots, 'X's, destroyed ships and their counters of a game's state from a shot message
+    of the server (as check_hit_or_miss does in games against computer), so that the frontend draws them.
+    The player's own fleet is on the human grid, the opponent's one on the computer grid.
+    Returns:
+        tuple: the block that was shot at
+    """
+    rules = state.rules
+    computer_turn = message["player"] != player
+    offset = rules.human_offset * computer_turn
+    fired_block = index_to_block(message["index"], offset, rules.grid_size)
+    dotted_blocks = [index_to_block(cell, offset, rules.grid_size) for cell in message["dotted"]]
+    state.dotted_set.update(dotted_blocks)
+    state.blocks_to_draw.extend(dotted_blocks)
+    if message["result"] == "miss":
+        return fired_block
+    state.hit_blocks.add(fired_block)
+    state.blocks_to_draw.append(fired_block)
+    if message["result"] == "sunk":
+        ship = [index_to_block(cell, offset, rules.grid_size) for cell in message["ship"]]
+        count_destroyed_ship(state=state, ship_length=len(ship), computer_turn=computer_turn)
+        if not computer_turn:
+            # Opponent's ships are hidden until destroyed
+            state.destroyed_computer_ships.append(ship)
+    return fired_block
@@ -0,0 +1,106 @@
+"""A game between two players who take turns shooting at each other's fleets."""
+
+from typing import Optional
+
+from elements.bitboard import HIT, MISS, SUNK, block_to_index, index_to_block
+from elements.game_state import GameState
+from elements.rules import Rules
+from game_logic import check_hit_or_miss
+
+
+class Match:
+    """
+    A game between two players resolved by check_hit_or_miss, like human-vs-computer games:
+    the first player's fleet is on the human grid, the second one's on the computer grid,
+    the first player shoots first and a player keeps shooting after every hit
+    ----------
+    Attributes:
+        rules (Rules): size of the grids and the fleet
+        state (GameState): state of the game
+        fleets (tuple of lists): ships of both players as lists of (x, y) blocks
+        ships_sets (list of sets): blocks of both fleets that are not hit yet
+        seed (int): seed of the game's state
+        turn (int): player who shoots next (0 or 1)
+        winner (int): player who destroyed the opponent's fleet, None while the game goes on
+        history (list of ints): cells shot at, in order (who shot follows from the turns)
+    ----------
+    Methods:
+        shoot(player, index): Resolves a player's shot at the opponent's grid
+    """
+
+    def __init__(self, rules: Rules, seed: int, fleets: tuple) -> None:
+        """
+        Parameters:
+        rules (Rules): size of the grids and the fleet
+        seed (int): seed of the game's state
+        fleets (tuple): cells of every ship of the first and of the second player (see protocol.validate_fleet)
+        """
+        self.rules = rules
+        self.seed = seed
+        self.state = GameState(seed, rules)
+        self.fleets = tuple(
+            [[index_to_block(cell, self.__offset(player), rules.grid_size) for cell in ship] for ship in fleet]
+            for player, fleet in enumerate(fleets)
+        )
+        self.ships_sets = [{block for ship in fleet for block in ship} for fleet in self.fleets]
+        self.turn = 0
+        self.winner: Optional[int] = None
+        self.history = []
+
+    def shoot(self, player: int, index: int) -> tuple:
+        """
+        Resolves a player's shot at a cell of the opponent's grid (a shot at a block that was already
+        shot at is a miss, as in human-vs-computer games)
+        Returns:
+            tuple: MISS, HIT or SUNK, cells that got dots and cells of the ship if it was sunk (None otherwise)
+        Raises:
+            ValueError: if it is not the player's turn or the cell is outside of the grid
+        """
+        if self.winner is not None:
+            raise ValueError("The game is over")
+        if player != self.turn:
+            raise ValueError("It is not your turn")
+        if not 0 <= index < self.rules.cells:
+            raise ValueError(f"Cell {index} is outside of the grid")
+        state = self.state
+        opponent = 1 - player
+        offset = self.__offset(opponent)
+        computer_turn = opponent == 0
+        destroyed_count = state.human_destroyed_ships_count if computer_turn else state.computer_destroyed_ships_count
+        destroyed = destroyed_count["#"]
+        hit = check_hit_or_miss(
+            state=state,
+            fired_block=index_to_block(index, offset, self.rules.grid_size),
+            computer_turn=computer_turn,
+            opponents_ships_list_original_copy=self.fleets[opponent],
+            opponents_ships_set=self.ships_sets[opponent],
+        )
+        self.history.append(index)
+        dotted = [
+            block_to_index(block, offset, self.rules.grid_size)
+            for block in state.blocks_to_draw
+            if block in state.dotted_set
+        ]
+        state.blocks_to_draw.clear()
+        ship = None
+        if not hit:
+            result = MISS
+            self.turn = opponent
+        elif destroyed_count["#"] > destroyed:
+            result = SUNK
+            board = state.boards[computer_turn]
+            ship = [
+                block_to_index(block, offset, self.rules.grid_size)
+                for block in self.fleets[opponent][board.ship_at(index)]
+            ]
+        else:
+            result = HIT
+        if not self.ships_sets[opponent]:
+            self.winner = player
+        return result, dotted, ship
+
+    def __offset(self, player: int) -> int:
+        """
+        Returns where the grid of a player's fleet starts
+        """
+        return self.rules.human_offset if player == 0 else 0
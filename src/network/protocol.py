@@ -0,0 +1,80 @@
+"""
+Protocol of network games: JSON objects, one per line, each with a "type".
+Cells are indexes of blocks on the grid that is shot at, row by row from the top left corner (0-99 on 10x10).
+Every connection plays one game.
+Client -> server:
+    {"type": "join", "fleet": [[cell, ...], ...]}  fleet of the player (the fleet of Rules.scaled(grid_size))
+    {"type": "shot", "index": cell}  shot at the opponent's grid
+Server -> client:
+    {"type": "welcome", "version": 1, "grid_size": 10}  right after connecting
+    {"type": "waiting"}  the fleet is accepted, waiting for an opponent
+    {"type": "start", "game": number, "player": 0 or 1}  an opponent is found, player 0 shoots first
+    {"type": "shot", "player": p, "index": cell, "result": "miss", "hit" or "sunk", "dotted": [cell, ...],
+        "ship": [cell, ...] (only if sunk), "turn": p or null}  a shot of either player (sent to both),
+        dotted are new dots on the grid shot at, turn is the player who shoots next (null once the game is over)
+    {"type": "over", "winner": p, "reason": "fleet" or "disconnect"}
+    {"type": "error", "message": text}  the last message was rejected, the connection stays open
+"""
+
+import json
+
+from elements.bitboard import HIT, MISS, SUNK, block_to_index, get_tables
+from elements.rules import Rules
+
+PROTOCOL_VERSION = 1
+DEFAULT_PORT = 5150
+# Longest line accepted (a fleet on a 100x100 grid takes about 10 KB)
+MAX_LINE = 64 * 1024
+RESULT_NAMES = {MISS: "miss", HIT: "hit", SUNK: "sunk"}
+# Made once: json.dumps makes an encoder on every call with other than default arguments
+_encoder = json.JSONEncoder(separators=(",", ":"))
+_decoder = json.JSONDecoder()
+
+
+def encode(message: dict) -> bytes:
+    return _encoder.encode(message).encode() + b"\n"
+
+
+def decode(line: bytes) -> dict:
+    """
+    Decodes a line (UTF-8) into a message. Raises ValueError if it is not a JSON object with a type.
+    """
+    message = _decoder.decode(line.decode())
+    if not isinstance(message, dict) or not isinstance(message.get("type"), str):
+        raise ValueError("A message must be a JSON object with a type")
+    return message
+
+
+def fleet_cells(ships: list, offset: int, rules: Rules) -> list:
+    """
+    Converts ships as lists of (x, y) blocks on a grid starting at offset to lists of cells
+    """
+    return [[block_to_index(block, offset, rules.grid_size) for block in ship] for ship in ships]
+
+
+def validate_fleet(fleet, rules: Rules) -> list:
+    """
+    Checks that a fleet received from a client follows the rules: the right ships, each a straight line
+    of blocks on the grid, none touching another one.
+    Returns:
+        list of tuples: cells of every ship, in order
+    Raises:
+        ValueError: if the fleet breaks the rules
+    """
+    if not isinstance(fleet, list) or not all(
+        isinstance(ship, list) and all(type(cell) is int and 0 <= cell < rules.cells for cell in ship) for ship in fleet
+    ):
+        raise ValueError("A fleet must be a list of ships, each a list of cells of the grid")
+    if sorted((len(ship) for ship in fleet), reverse=True) != list(rules.fleet):
+        raise ValueError(f"A fleet must have ships of lengths {rules.fleet}")
+    tables = get_tables(rules)
+    blocked = 0
+    ships = []
+    for ship in fleet:
+        length = len(ship)
+        placement = tables.placement_index(ship)
+        if tables.placement_masks[length][placement] & blocked:
+            raise ValueError(f"Ship {sorted(ship)} touches another ship")
+        blocked |= tables.placement_blocking_masks[length][placement]
+        ships.append(tables.placement_cells[length][placement])
+    return ships
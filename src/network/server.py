@@ -0,0 +1,277 @@
+"""
+Asyncio server that hosts human-vs-human games: players connect, send their fleets and are matched
+in the order they join, then take turns shooting (see network.protocol).
+Run from the src directory: python -m network.server --port 5150 [--grid-size 10 --record games.bin]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Optional
+
+from elements.constants import GRID_SIZE
+from elements.fleet_corpus import fleet_placements
+from elements.game_record import (
+    GameRecorder,
+    pack_game_end,
+    pack_game_start,
+    shot_format,
+)
+from elements.rules import CLASSIC_RULES, Rules
+from network.match import Match
+from network.protocol import (
+    DEFAULT_PORT,
+    MAX_LINE,
+    PROTOCOL_VERSION,
+    RESULT_NAMES,
+    decode,
+    encode,
+    validate_fleet,
+)
+
+# Connections waiting to be accepted (thousands of players can connect at once)
+BACKLOG = 4096
+# Server-side handling times of this many last shots are kept for statistics
+MOVE_TIMES_WINDOW = 100_000
+
+
+class Player(asyncio.Protocol):
+    """
+    A connected player: the protocol of the player's connection. Received bytes are split into lines
+    that the server handles right away, messages to the player are queued and written once per received chunk
+    ----------
+    Attributes:
+        server (GameServer): server the player is connected to
+        transport (asyncio.Transport): connection to the player, None until it is made
+        fleet (list of tuples): cells of the player's ships, None until the player joins
+        match (Match): game the player plays, None until an opponent is found
+        number (int): 0 or 1 in the match
+        opponent (Player): the other player of the match
+    """
+
+    def __init__(self, server: "GameServer") -> None:
+        self.server = server
+        self.transport: Optional[asyncio.Transport] = None
+        self.fleet = None
+        self.match: Optional[Match] = None
+        self.number = 0
+        self.opponent: Optional["Player"] = None
+        self.__buffer = b""
+        # Encoded messages not written yet (None - written as soon as they are queued)
+        self.__output: Optional[list] = None
+
+    def connection_made(self, transport: asyncio.Transport) -> None:
+        self.transport = transport
+        self.server.connect(self)
+
+    def data_received(self, data: bytes) -> None:
+        *lines, self.__buffer = (self.__buffer + data).split(b"\n")
+        if len(self.__buffer) > MAX_LINE or any(len(line) > MAX_LINE for line in lines):
+            self.transport.close()
+            return
+        # Messages to both players of a match are written once all lines are handled
+        players = (self, self.opponent)
+        for player in players:
+            if player is not None and player.__output is None:
+                player.__output = []
+        try:
+            for line in lines:
+                self.server.handle_line(self, line)
+        finally:
+            for player in players:
+                if player is not None:
+                    player.flush()
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.server.disconnect(self)
+
+    def pause_writing(self) -> None:
+        # The player does not read as fast as it sends, its messages wait until it catches up
+        self.transport.pause_reading()
+
+    def resume_writing(self) -> None:
+        self.transport.resume_reading()
+
+    def send(self, message: dict) -> None:
+        self.write(encode(message))
+
+    def write(self, data: bytes) -> None:
+        """
+        Queues encoded messages (the transport sends them as soon as the socket accepts them)
+        """
+        if self.__output is not None:
+            self.__output.append(data)
+        elif not self.transport.is_closing():
+            self.transport.write(data)
+
+    def flush(self) -> None:
+        """
+        Writes the queued messages in one piece
+        """
+        output, self.__output = self.__output, None
+        if output and not self.transport.is_closing():
+            self.transport.write(b"".join(output))
+
+
+class GameServer:
+    """
+    Matches players and resolves their shots. All games live in one event loop: handling a shot
+    is a few dictionary and bitmask operations and two buffered writes, it never waits
+    ----------
+    Attributes:
+        rules (Rules): size of the grids and the fleet of every game
+        recorder (GameRecorder): records finished games, None if games are not recorded
+        games (int): number of games started
+        active (int): number of games being played
+        move_times (deque of floats): seconds spent handling the last MOVE_TIMES_WINDOW shots
+    ----------
+    Methods:
+        connect(player): Greets a new connection (see Player)
+        handle_line(player, line): Handles a line received from a player
+        disconnect(player): Ends the game of a player whose connection is lost
+        serve(host, port): Starts the server
+    """
+
+    def __init__(
+        self, rules: Rules = CLASSIC_RULES, recorder: Optional[GameRecorder] = None, seed: Optional[int] = None
+    ) -> None:
+        self.rules = rules
+        self.recorder = recorder
+        self.games = 0
+        self.active = 0
+        self.move_times = deque(maxlen=MOVE_TIMES_WINDOW)
+        self.__rng = random.Random(seed)
+        self.__waiting: Optional[Player] = None
+
+    async def serve(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> asyncio.AbstractServer:
+        return await asyncio.get_running_loop().create_server(lambda: Player(self), host, port, backlog=BACKLOG)
+
+    def connect(self, player: Player) -> None:
+        player.send({"type": "welcome", "version": PROTOCOL_VERSION, "grid_size": self.rules.grid_size})
+
+    def handle_line(self, player: Player, line: bytes) -> None:
+        try:
+            self.__handle_message(player, decode(line))
+        except ValueError as error:
+            player.send({"type": "error", "message": str(error)})
+
+    def __handle_message(self, player: Player, message: dict) -> None:
+        """
+        Handles one message of a player. Raises ValueError if the message is not valid at this point.
+        """
+        if message["type"] == "shot":
+            if player.match is None:
+                raise ValueError("You are not playing a game")
+            self.__shoot(player, message.get("index"))
+        elif message["type"] == "join":
+            if player.fleet is not None:
+                raise ValueError("You have already joined")
+            player.fleet = validate_fleet(message.get("fleet"), self.rules)
+            self.__join(player)
+        else:
+            raise ValueError(f"Unknown message type {message['type']!r}")
+
+    def __join(self, player: Player) -> None:
+        opponent = self.__waiting
+        if opponent is None:
+            self.__waiting = player
+            player.send({"type": "waiting"})
+            return
+        self.__waiting = None
+        seed = self.__rng.getrandbits(64)
+        match = Match(self.rules, seed, (opponent.fleet, player.fleet))
+        self.games += 1
+        self.active += 1
+        for number, (first, second) in enumerate(((opponent, player), (player, opponent))):
+            first.match, first.number, first.opponent = match, number, second
+            first.send({"type": "start", "game": self.games, "player": number})
+
+    def __shoot(self, player: Player, index) -> None:
+        start = time.perf_counter()
+        if type(index) is not int:
+            raise ValueError("A shot must have an index of a cell")
+        match = player.match
+        result, dotted, ship = match.shoot(player.number, index)
+        message = {
+            "type": "shot",
+            "player": player.number,
+            "index": index,
+            "result": RESULT_NAMES[result],
+            "dotted": dotted,
+            "turn": match.turn if match.winner is None else None,
+        }
+        if ship is not None:
+            message["ship"] = ship
+        # Both players get the same message, it is encoded once
+        data = encode(message)
+        player.write(data)
+        player.opponent.write(data)
+        if match.winner is not None:
+            self.__end_match(player, "fleet")
+        self.move_times.append(time.perf_counter() - start)
+
+    def __end_match(self, winner: Player, reason: str) -> None:
+        data = encode({"type": "over", "winner": winner.number, "reason": reason})
+        winner.write(data)
+        winner.opponent.write(data)
+        self.active -= 1
+        if self.recorder:
+            self.__record(winner.match, winner.match.winner)
+        for player in (winner, winner.opponent):
+            player.match = player.opponent = None
+
+    def __record(self, match: Match, winner: Optional[int]) -> None:
+        """
+        Appends a game to the recording in one piece, since games that are played at the same time interleave
+        """
+        rules = self.rules
+        placements = (
+            fleet_placements(match.fleets[0], rules.human_offset, rules),
+            fleet_placements(match.fleets[1], 0, rules),
+        )
+        pack_shot = shot_format(rules).pack
+        self.recorder.add_games(
+            pack_game_start(rules, match.seed, placements, humans=(0, 1))
+            + b"".join(pack_shot(index) for index in match.history)
+            + pack_game_end(rules, winner)
+        )
+
+    def disconnect(self, player: Player) -> None:
+        if self.__waiting is player:
+            self.__waiting = None
+        elif player.match is not None:
+            self.__end_match(player.opponent, "disconnect")
+
+
+async def run_server(server: GameServer, host: str, port: int) -> None:
+    listener = await server.serve(host, port)
+    address = listener.sockets[0].getsockname()
+    print(f"Serving {server.rules.grid_size}x{server.rules.grid_size} games on {address[0]}:{address[1]}")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (0.0.0.0 for all interfaces)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--grid-size", type=int, default=GRID_SIZE, help="with the classic fleet scaled to it")
+    parser.add_argument("--record", help="file to append recordings of the games to (see replay.py)")
+    args = parser.parse_args()
+
+    recorder = GameRecorder(args.record) if args.record else None
+    server = GameServer(Rules.scaled(args.grid_size), recorder)
+    try:
+        asyncio.run(run_server(server, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if recorder:
+            recorder.close()
+        print(f"{server.games} games started")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Replays recorded games (see elements.game_record) through game_logic: headlessly at maximum speed
+to verify them, or drawn in a window at any number of shots per second.
+Run from the src directory: python replay.py games.bin [--render --speed 20 --game 3]
+"""
+
+import argparse
+import sys
+import time
+from typing import Callable, Optional
+
+import pygame
+
+from elements.bitboard import index_to_block
+from elements.constants import BLACK, MESSAGE_RECT_COMPUTER, WHITE
+from elements.fleet_corpus import unpack_fleet
+from elements.game_record import UNFINISHED, RecordedGame, read_games
+from elements.game_state import GameState
+from game_logic import check_hit_or_miss
+from graphics import Grid
+from graphics.drawing import (
+    draw_ships,
+    get_font,
+    get_screen,
+    show_message_at_rect_center,
+)
+from main import draw_changed_blocks
+
+# Milliseconds to show a finished game for before drawing the next one
+PAUSE_BETWEEN_GAMES = 1000
+
+
+def replay_game(game: RecordedGame, on_shot: Optional[Callable] = None) -> int:
+    """
+    Plays a recorded game through check_hit_or_miss. The first player shoots at the computer grid
+    (as human does) and the second one at the human grid, a player keeps shooting after a hit.
+    Args:
+        game (RecordedGame): game to replay
+        on_shot (callable, optional): called with the game's state and the number of the shot after every shot
+    Returns:
+        int: winner of the replayed game (0 or 1, UNFINISHED if no fleet was destroyed)
+    Raises:
+        ValueError: if the recording does not match the rules of the game (a shot outside of the grid,
+            shots after a fleet is destroyed or a different winner)
+    """
+    rules = game.rules
+    state = GameState(game.seed, rules)
+    # The first player's fleet is on the human grid, the second player's one on the computer grid
+    fleets = (unpack_fleet(game.placements[0], rules.human_offset, rules), unpack_fleet(game.placements[1], 0, rules))
+    ships_sets = [{block for ship in fleet for block in ship} for fleet in fleets]
+    player = 0
+    for number, index in enumerate(game.shots, 1):
+        if not all(ships_sets):
+            raise ValueError(f"Shot {number} is after the end of the game")
+        if index >= rules.cells:
+            raise ValueError(f"Shot {number} is outside of the grid")
+        computer_turn = player == 1
+        opponent = 0 if computer_turn else 1
+        hit = check_hit_or_miss(
+            state=state,
+            fired_block=index_to_block(index, rules.human_offset if computer_turn else 0, rules.grid_size),
+            computer_turn=computer_turn,
+            opponents_ships_list_original_copy=fleets[opponent],
+            opponents_ships_set=ships_sets[opponent],
+        )
+        if not hit:
+            player = 1 - player
+        if on_shot is not None:
+            on_shot(state, number)
+    winner = UNFINISHED
+    if not ships_sets[1]:
+        winner = 0
+    elif not ships_sets[0]:
+        winner = 1
+    if winner != game.winner:
+        raise ValueError(f"The recording says the winner is {game.winner}, the replay says {winner}")
+    return winner
+
+
+def verify(path: str) -> bool:
+    """
+    Replays every game of a recording headlessly and prints a summary
+    Returns:
+        bool: True if every game replayed as recorded
+    """
+    games = shots = broken = 0
+    wins = [0, 0]
+    start = time.perf_counter()
+    try:
+        for number, game in enumerate(read_games(path)):
+            games += 1
+            shots += len(game.shots)
+            try:
+                winner = replay_game(game)
+            except ValueError as error:
+                broken += 1
+                print(f"game {number}: {error}")
+                continue
+            if winner != UNFINISHED:
+                wins[winner] += 1
+    except ValueError as error:
+        broken += 1
+        print(error)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{games} games ({wins[0]} won by the first player, {wins[1]} by the second one, "
+        f"{games - sum(wins) - broken} unfinished, {broken} broken), "
+        f"{shots} shots replayed in {elapsed:.2f}s ({shots / max(elapsed, 1e-9):.0f} shots/s)"
+    )
+    return not broken
+
+
+def render(path: str, speed: float, game_number: Optional[int] = None) -> None:
+    """
+    Draws recorded games (all of them or only game_number) shot by shot with both fleets visible
+    Args:
+        speed (float): shots per second, 0 for as fast as possible
+    """
+    screen = get_screen()
+    font = get_font()
+    clock = pygame.time.Clock()
+
+    def on_shot(state: GameState, number: int) -> None:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+        rects = draw_changed_blocks(state)
+        rects.append(screen.fill(WHITE, MESSAGE_RECT_COMPUTER))
+        rects.append(show_message_at_rect_center(f"Shot {number}", MESSAGE_RECT_COMPUTER))
+        pygame.display.update(rects)
+        if speed:
+            clock.tick(speed)
+
+    for number, game in enumerate(read_games(path)):
+        if game_number is not None and number != game_number:
+            continue
+        rules = game.rules
+        screen.fill(WHITE)
+        for title, offset, placements in (
+            ("PLAYER 2", 0, game.placements[1]),
+            ("PLAYER 1", rules.human_offset, game.placements[0]),
+        ):
+            Grid(title=title, offset=offset, font=font, rules=rules, line_color=BLACK, text_color=BLACK).draw()
+            draw_ships(unpack_fleet(placements, offset, rules), cell_size=rules.cell_size)
+        pygame.display.update()
+        replay_game(game, on_shot)
+        pygame.time.wait(PAUSE_BETWEEN_GAMES)
+    while pygame.event.wait().type != pygame.QUIT:
+        pass
+    pygame.quit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("path", help="recording of games")
+    parser.add_argument("--render", action="store_true", help="draw games instead of verifying them")
+    parser.add_argument("--speed", type=float, default=10.0, help="shots per second when drawing (0 - no limit)")
+    parser.add_argument("--game", type=int, default=None, help="draw only this game (counting from 0)")
+    args = parser.parse_args()
+
+    if args.render:
+        render(args.path, args.speed, args.game)
+    elif not verify(args.path):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Loopback tests of the game server: clients play over real connections and check every message they get.
+Run from the src directory: python -m pytest tests
+"""
+
+import asyncio
+from random import Random
+
+from elements.autoships import AutoShips
+from elements.rules import CLASSIC_RULES
+from network.bots import play_bot
+from network.protocol import MAX_LINE, PROTOCOL_VERSION, decode, encode, fleet_cells
+from network.server import GameServer
+
+# Seconds to wait for a message before a test fails
+TIMEOUT = 5.0
+
+
+class Client:
+    """
+    A scripted player that sends messages and reads the server's replies one at a time
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+
+    def send(self, message: dict) -> None:
+        self.writer.write(encode(message))
+
+    async def receive(self) -> dict:
+        line = await asyncio.wait_for(self.reader.readline(), TIMEOUT)
+        assert line, "The server has closed the connection"
+        return decode(line)
+
+
+async def connect(port: int) -> Client:
+    client = Client(*await asyncio.open_connection("127.0.0.1", port))
+    assert await client.receive() == {"type": "welcome", "version": PROTOCOL_VERSION, "grid_size": 10}
+    return client
+
+
+def make_fleet(seed: int) -> list:
+    return fleet_cells(AutoShips(0, rng=Random(seed), rules=CLASSIC_RULES).ships, 0, CLASSIC_RULES)
+
+
+async def start_match() -> tuple:
+    """
+    Connects two players and matches them.
+    Returns:
+        tuple: the listening server, both clients and their fleets
+    """
+    server = GameServer(seed=0)
+    listener = await server.serve("127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    fleets = [make_fleet(1), make_fleet(2)]
+    first = await connect(port)
+    first.send({"type": "join", "fleet": fleets[0]})
+    assert await first.receive() == {"type": "waiting"}
+    second = await connect(port)
+    second.send({"type": "join", "fleet": fleets[1]})
+    assert await first.receive() == {"type": "start", "game": 1, "player": 0}
+    assert await second.receive() == {"type": "start", "game": 1, "player": 1}
+    return server, listener, (first, second), fleets
+
+
+async def shoot(players: tuple, player: int, index: int) -> dict:
+    """
+    Fires a shot and checks that both players get the same message about it
+    """
+    players[player].send({"type": "shot", "index": index})
+    message = await players[player].receive()
+    assert await players[1 - player].receive() == message
+    assert message["type"] == "shot" and message["player"] == player and message["index"] == index
+    return message
+
+
+def test_shots_and_game_over() -> None:
+    async def play() -> None:
+        server, listener, players, fleets = await start_match()
+        ship_cells = [{cell for ship in fleet for cell in ship} for fleet in fleets]
+        misses = [cell for cell in range(CLASSIC_RULES.cells) if cell not in ship_cells[1]]
+        # A miss passes the turn
+        message = await shoot(players, 0, misses[0])
+        assert (message["result"], message["dotted"], message["turn"]) == ("miss", [misses[0]], 1)
+        assert "ship" not in message
+        # Shots out of turn are rejected, the connection stays open
+        players[0].send({"type": "shot", "index": misses[1]})
+        assert await players[0].receive() == {"type": "error", "message": "It is not your turn"}
+        players[1].send({"type": "bomb"})
+        assert (await players[1].receive())["type"] == "error"
+        miss = min(cell for cell in range(CLASSIC_RULES.cells) if cell not in ship_cells[0])
+        message = await shoot(players, 1, miss)
+        assert (message["result"], message["turn"]) == ("miss", 0)
+        # Hits keep the turn, the last block of a ship sinks it
+        for number, ship in enumerate(fleets[1]):
+            for cell in ship[:-1]:
+                message = await shoot(players, 0, cell)
+                assert (message["result"], message["turn"]) == ("hit", 0)
+            message = await shoot(players, 0, ship[-1])
+            assert message["result"] == "sunk"
+            assert sorted(message["ship"]) == sorted(ship)
+            assert not set(message["dotted"]) & ship_cells[1]
+            if number < len(fleets[1]) - 1:
+                assert message["turn"] == 0
+        # The last ship ends the game
+        assert message["turn"] is None
+        for player in players:
+            assert await player.receive() == {"type": "over", "winner": 0, "reason": "fleet"}
+        assert (server.games, server.active, len(server.move_times)) == (1, 0, 22)
+        for player in players:
+            player.writer.close()
+        listener.close()
+
+    asyncio.run(play())
+
+
+def test_disconnect_ends_the_game() -> None:
+    async def play() -> None:
+        server, listener, players, _ = await start_match()
+        players[1].writer.close()
+        assert await players[0].receive() == {"type": "over", "winner": 0, "reason": "disconnect"}
+        assert server.active == 0
+        players[0].writer.close()
+        listener.close()
+
+    asyncio.run(play())
+
+
+def test_long_line_closes_the_connection() -> None:
+    async def play() -> None:
+        server = GameServer()
+        listener = await server.serve("127.0.0.1", 0)
+        client = await connect(listener.sockets[0].getsockname()[1])
+        client.writer.write(b" " * (MAX_LINE + 1))
+        assert await asyncio.wait_for(client.reader.read(), TIMEOUT) == b""
+        client.writer.close()
+        listener.close()
+
+    asyncio.run(play())
+
+
+def test_bots_finish_their_games() -> None:
+    async def play() -> None:
+        server = GameServer(seed=0)
+        listener = await server.serve("127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        results = await asyncio.gather(*(play_bot("127.0.0.1", port, seed) for seed in range(20)))
+        assert sorted(results) == [False] * 10 + [True] * 10
+        assert (server.games, server.active) == (10, 0)
+        listener.close()
+
+    asyncio.run(play())
@@ -0,0 +1,373 @@
+"""
+Headless computer-vs-computer tournament: plays AutoShips-placed games between computer strategies
+across a process pool and streams aggregate statistics (no per-game objects are kept).
+Run from the src directory: python tournament.py random random --games 1000000 --checkpoint run.json
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from multiprocessing import Pool
+from typing import Callable, Optional
+
+from ai import STRATEGIES
+from elements.autoships import AutoShips
+from elements.bitboard import block_to_index
+from elements.constants import GRID_SIZE
+from elements.fleet_corpus import FleetCorpus, fleet_placements
+from elements.game_record import (
+    GameRecorder,
+    pack_game_end,
+    pack_game_start,
+    shot_format,
+)
+from elements.game_state import GameState
+from elements.rules import CLASSIC_RULES, Rules
+from game_logic import check_hit_or_miss
+
+# Fleet corpora opened by this process, keyed by path
+_corpora = {}
+
+
+class TournamentStats:
+    """
+    Aggregate results of a tournament between two strategies
+    ----------
+    Attributes:
+        names (tuple of str): names of both strategies (the same name can play itself)
+        games (int): number of finished games
+        wins (list of ints): number of games won by each side
+        shots (list of Counters): shots-to-sink-the-fleet distribution of each side
+    ----------
+    Methods:
+        add_game(shots, winner): Adds one game's result
+        merge(other): Adds results of other stats (e.g. of a finished chunk of games)
+        mean(side), percentile(side, percent): Statistics of the shots distribution
+        to_dict(), from_dict(data): (De)serialization for checkpoints
+    """
+
+    def __init__(self, names: tuple) -> None:
+        self.names = tuple(names)
+        self.games = 0
+        self.wins = [0, 0]
+        self.shots = [Counter(), Counter()]
+
+    def add_game(self, shots: tuple, winner: int) -> None:
+        """
+        Adds one game's result: shots each side needed to sink the opponent's fleet and the winner (0 or 1)
+        """
+        self.games += 1
+        self.wins[winner] += 1
+        for side in range(2):
+            self.shots[side][shots[side]] += 1
+
+    def merge(self, other: "TournamentStats") -> None:
+        """
+        Adds results of other stats to these ones
+        """
+        self.games += other.games
+        for side in range(2):
+            self.wins[side] += other.wins[side]
+            self.shots[side].update(other.shots[side])
+
+    def mean(self, side: int) -> float:
+        """
+        Mean number of shots a side needs to sink the whole fleet
+        """
+        if not self.games:
+            return 0.0
+        return sum(shots * count for shots, count in self.shots[side].items()) / self.games
+
+    def percentile(self, side: int, percent: float) -> int:
+        """
+        Number of shots within which a side sinks the whole fleet in percent of games
+        """
+        threshold = self.games * percent / 100
+        cumulative = 0
+        for shots in sorted(self.shots[side]):
+            cumulative += self.shots[side][shots]
+            if cumulative >= threshold:
+                return shots
+        return 0
+
+    def summary(self) -> str:
+        """
+        One line per side with win rate, mean and percentiles of shots to win
+        """
+        lines = [f"games: {self.games}"]
+        for side, name in enumerate(self.names):
+            win_rate = self.wins[side] / self.games if self.games else 0.0
+            percentiles = " ".join(f"p{p}={self.percentile(side, p)}" for p in (5, 25, 50, 75, 95, 99))
+            lines.append(
+                f"  side {side} {name:>10}: win rate {win_rate:7.2%}  mean shots {self.mean(side):6.2f}  {percentiles}"
+            )
+        return "\n".join(lines)
+
+    def to_dict(self) -> dict:
+        return {
+            "names": list(self.names),
+            "games": self.games,
+            "wins": self.wins,
+            "shots": [{str(shots): count for shots, count in sorted(counter.items())} for counter in self.shots],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TournamentStats":
+        stats = cls(data["names"])
+        stats.games = data["games"]
+        stats.wins = list(data["wins"])
+        stats.shots = [Counter({int(shots): count for shots, count in side.items()}) for side in data["shots"]]
+        return stats
+
+
+def get_corpus(path: Optional[str]) -> Optional[FleetCorpus]:
+    """
+    Returns a fleet corpus opened once per process (None if path is None)
+    """
+    if path is None:
+        return None
+    if path not in _corpora:
+        _corpora[path] = FleetCorpus(path)
+    return _corpora[path]
+
+
+def sink_fleet(strategy: Callable, state: GameState, fleet: AutoShips, shot_log: Optional[list] = None) -> tuple:
+    """
+    Lets a strategy shoot at an AutoShips fleet (on the human grid) until the whole fleet is destroyed.
+    Args:
+        strategy (callable): computer strategy, e.g. computer_shoots
+        state (GameState): state of the game whose rng drives the strategy
+        fleet (AutoShips): fleet to shoot at
+        shot_log (list, optional): gets the block index and whether it was a hit appended for every shot
+    Returns:
+        tuple: number of shots and number of misses it took
+    """
+    rules = state.rules
+    ships_set = set(fleet.ships_set)
+    shots = misses = 0
+    while ships_set:
+        fired_block = strategy(state=state)
+        shots += 1
+        hit = check_hit_or_miss(
+            state=state,
+            fired_block=fired_block,
+            computer_turn=True,
+            opponents_ships_list_original_copy=fleet.ships,
+            opponents_ships_set=ships_set,
+        )
+        if not hit:
+            misses += 1
+        if shot_log is not None:
+            shot_log.append((block_to_index(fired_block, rules.human_offset, rules.grid_size), hit))
+    return shots, misses
+
+
+def play_game(
+    names: tuple,
+    seed: int,
+    corpus: Optional[FleetCorpus] = None,
+    rules: Rules = CLASSIC_RULES,
+    recording: Optional[bytearray] = None,
+) -> tuple:
+    """
+    Plays one game between two strategies. Players take turns and a hit gives another shot,
+    so the side that sinks the opponent's fleet with fewer misses wins. Sides alternate the first move.
+    Every side shoots at a fleet placed by the rng of its own GameState (seeded with 2 * seed + side).
+    Args:
+        recording (bytearray, optional): gets the game appended to it (see elements.game_record)
+    Returns:
+        tuple: shots each side needed to sink the opponent's fleet and the winner (0 or 1)
+    """
+    results, fleets, shot_logs = [], [], []
+    for side, name in enumerate(names):
+        state = GameState(2 * seed + side, rules)
+        fleets.append(AutoShips(rules.human_offset, rng=state.rng, corpus=corpus, rules=rules))
+        shot_logs.append([] if recording is not None else None)
+        results.append(sink_fleet(STRATEGIES[name], state, fleets[side], shot_logs[side]))
+    (shots_0, misses_0), (shots_1, misses_1) = results
+    if seed % 2:
+        winner = 1 if misses_1 <= misses_0 else 0
+    else:
+        winner = 0 if misses_0 <= misses_1 else 1
+    if recording is not None:
+        recording += record_game(seed, fleets, shot_logs, rules)
+    return (shots_0, shots_1), winner
+
+
+def record_game(seed: int, fleets: list, shot_logs: list, rules: Rules) -> bytes:
+    """
+    Packs a game whose sides shot independently as a game of alternating turns: the side that
+    moves first (side 1 in games with odd seeds) shoots until it misses, then the other one does,
+    until one of the fleets is destroyed.
+    Args:
+        fleets (list): the fleet every side shot at
+        shot_logs (list): block indexes and hits of every side's shots
+    Returns:
+        bytes: the game packed as in elements.game_record (the first player is the side that moved first)
+    """
+    first = seed % 2
+    order = (first, 1 - first)
+    # The first player's own fleet is the one the second player shoots at
+    placements = tuple(fleet_placements(fleets[1 - side].ships, rules.human_offset, rules) for side in order)
+    pack_shot = shot_format(rules).pack
+    packed = bytearray(pack_game_start(rules, seed % 2**64, placements))
+    moves = [iter(shot_logs[side]) for side in order]
+    player = 0
+    while True:
+        shot = next(moves[player], None)
+        if shot is None:
+            # The player has no shots left: the opponent's fleet was destroyed by its last one
+            packed += pack_game_end(rules, player)
+            return bytes(packed)
+        index, hit = shot
+        packed += pack_shot(index)
+        if not hit:
+            player = 1 - player
+
+
+def play_chunk(args: tuple) -> tuple:
+    """
+    Plays a chunk of games in a worker process.
+    Args:
+        args (tuple): names of strategies, chunk index, chunk size, seed of the whole run,
+            path to a fleet corpus (or None), grid size (the classic fleet is scaled to it)
+            and whether to record the games
+    Returns:
+        tuple: chunk index, its TournamentStats as a dict and its recorded games (empty if not recorded)
+    """
+    names, chunk, chunk_size, seed, corpus_path, grid_size, record = args
+    stats = TournamentStats(names)
+    corpus = get_corpus(corpus_path)
+    rules = Rules.scaled(grid_size)
+    recording = bytearray() if record else None
+    first_game = seed + chunk * chunk_size
+    for game_seed in range(first_game, first_game + chunk_size):
+        stats.add_game(*play_game(names, game_seed, corpus, rules, recording))
+    return chunk, stats.to_dict(), bytes(recording or b"")
+
+
+def load_checkpoint(path: str, config: dict) -> tuple:
+    """
+    Loads finished chunks and aggregate stats of a partially completed run.
+    Raises ValueError if the checkpoint belongs to a run with a different configuration.
+    """
+    with open(path, encoding="utf-8") as checkpoint_file:
+        data = json.load(checkpoint_file)
+    if data["config"] != config:
+        raise ValueError(f"{path} was written by a different run: {data['config']}")
+    return set(data["done_chunks"]), TournamentStats.from_dict(data["stats"])
+
+
+def save_checkpoint(path: str, config: dict, done_chunks: set, stats: TournamentStats) -> None:
+    """
+    Atomically writes finished chunks and aggregate stats so that the run can be resumed.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as checkpoint_file:
+        json.dump({"config": config, "done_chunks": sorted(done_chunks), "stats": stats.to_dict()}, checkpoint_file)
+    os.replace(tmp_path, path)
+
+
+def run_tournament(
+    names: tuple,
+    games: int,
+    *,
+    workers: Optional[int] = None,
+    chunk_size: int = 1000,
+    seed: int = 0,
+    checkpoint: Optional[str] = None,
+    report_every: float = 10.0,
+    corpus: Optional[str] = None,
+    grid_size: int = GRID_SIZE,
+    record: Optional[str] = None,
+) -> TournamentStats:
+    """
+    Plays games between two strategies across a process pool, resuming from a checkpoint if it exists.
+    Grids are grid_size blocks wide with the classic fleet scaled to them (see Rules.scaled).
+    Fleets are drawn from a fleet corpus file if one is given.
+    Games played by this call are appended to a recording file if one is given (see elements.game_record).
+    Prints aggregate stats every report_every seconds and returns the final ones.
+    """
+    config = {
+        "names": list(names),
+        "games": games,
+        "chunk_size": chunk_size,
+        "seed": seed,
+        "corpus": corpus,
+        "grid_size": grid_size,
+    }
+    rules = Rules.scaled(grid_size)
+    if corpus and get_corpus(corpus).rules != rules:
+        raise ValueError(f"{corpus} has fleets of {get_corpus(corpus).rules}, not of {rules}")
+    done_chunks, stats = set(), TournamentStats(names)
+    if checkpoint and os.path.exists(checkpoint):
+        done_chunks, stats = load_checkpoint(checkpoint, config)
+        print(f"Resuming {checkpoint}: {stats.games} games already played")
+
+    chunks = (games + chunk_size - 1) // chunk_size
+    pending = [
+        (tuple(names), chunk, min(chunk_size, games - chunk * chunk_size), seed, corpus, grid_size, bool(record))
+        for chunk in range(chunks)
+        if chunk not in done_chunks
+    ]
+    started = last_report = time.perf_counter()
+    played_now = 0
+    recorder = GameRecorder(record) if record else None
+    with Pool(workers) as pool:
+        for chunk, chunk_stats, recording in pool.imap_unordered(play_chunk, pending):
+            if recorder:
+                recorder.add_games(recording)
+            chunk_stats = TournamentStats.from_dict(chunk_stats)
+            stats.merge(chunk_stats)
+            played_now += chunk_stats.games
+            done_chunks.add(chunk)
+            if checkpoint:
+                # Games of finished chunks are on disk before the chunks are saved as done
+                if recorder:
+                    recorder.flush()
+                save_checkpoint(checkpoint, config, done_chunks, stats)
+            if time.perf_counter() - last_report >= report_every:
+                last_report = time.perf_counter()
+                print(f"{played_now / (last_report - started):.0f} games/s")
+                print(stats.summary())
+    if recorder:
+        recorder.close()
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("strategies", nargs=2, choices=sorted(STRATEGIES), help="strategies of both sides")
+    parser.add_argument("--games", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=None, help="number of processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="games per task sent to a worker")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--checkpoint", help="JSON file to save progress to and to resume from")
+    parser.add_argument("--corpus", help="file with pre-generated fleets (see elements.fleet_corpus)")
+    parser.add_argument("--grid-size", type=int, default=GRID_SIZE, help="with the classic fleet scaled to it")
+    parser.add_argument("--record", help="file to append recordings of the games to (see elements.game_record)")
+    parser.add_argument("--report-every", type=float, default=10.0, help="seconds between progress reports")
+    args = parser.parse_args()
+
+    try:
+        stats = run_tournament(
+            tuple(args.strategies),
+            args.games,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            seed=args.seed,
+            checkpoint=args.checkpoint,
+            report_every=args.report_every,
+            corpus=args.corpus,
+            grid_size=args.grid_size,
+            record=args.record,
+        )
+    except ValueError as error:
+        parser.error(str(error))
+    print(stats.summary())
+
+
+if __name__ == "__main__":
+    main()